@@ -0,0 +1,43 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ...utils.sidewind_bench import default_cases, run_benchmark
+
+
+class Command(BaseCommand):
+    help = 'Sidewind（assign_rooms）のベンチマークを実行し、JSONレポートを出力する'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='レポートの出力先（省略時は標準出力）')
+        parser.add_argument('--repeats', type=int, default=5, help='ケースごとの計測日数')
+        parser.add_argument('--seed', type=int, default=0, help='日の生成に使う最初のシード')
+        parser.add_argument('--cases', nargs='*', help='実行するケース名（前方一致）。省略時は全ケース')
+        parser.add_argument('--max-attempts', type=int, help='assign_rooms の試行数')
+        parser.add_argument('--workers', type=int, default=1)
+        parser.add_argument('--time-limit', type=float)
+        parser.add_argument('--local-search-iterations', type=int, default=0)
+
+    def handle(self, *args, **options):
+        cases = default_cases(settings.BASE_DIR / 'static' / 'csv' / 'room_info.csv')
+        if options['cases']:
+            cases = [c for c in cases if any(c[0].startswith(prefix) for prefix in options['cases'])]
+
+        search_options = {
+            'workers': options['workers'],
+            'time_limit': options['time_limit'],
+            'local_search_iterations': options['local_search_iterations'],
+        }
+        if options['max_attempts'] is not None:
+            search_options['max_attempts'] = options['max_attempts']
+
+        report = run_benchmark(cases, repeats=options['repeats'], seed=options['seed'],
+                               log=self.stderr.write, **search_options)
+        payload = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(payload)
+            self.stderr.write(f"report written to {options['output']}")
+        else:
+            self.stdout.write(payload)
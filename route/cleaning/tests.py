@@ -1,3 +1,793 @@
-from django.test import TestCase
+import importlib.util
+import random
+import tempfile
+import os
+import shutil
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import numpy as np
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+
+from .utils.sidewind_core import (
+    _RoomAllocator, _IncrementalScorer, assign_rooms, assign_rooms_with_stats, reassign_rooms
+)
+from .utils.sidewind_exact import solve_exact
+from .utils.sidewind_cache import AllocationCache, assign_rooms_cached, make_cache_key
+from .utils.sidewind_bench import make_day, run_case, synthetic_property
+from .utils.sidewind_flow import rebalance_units
+from .utils import preview_util
+from .utils.preview_util import RoomIndex, bucket_rooms_by_person, calc_room
+from .utils.master_data import MASTER_FILES, get_master_data, invalidate_master_data
+from .utils.label_catalog import LABEL_FILES, PAGE_LABEL_KEYS, get_label_catalog, invalidate_label_catalog
+from .utils.translation_memory import TranslationMemory
+from .utils.translation_health import CircuitBreaker
+from .utils.phrase_table import PhraseTable
+from .utils.sidewind_jobs import DONE, FAILED, JobRegistry, submit_allocation
+
+
+def _make_day(seed):
+    """2F〜10F（各15室、末尾が偶数の部屋はツイン）から無作為な1日分の入力を作る"""
+    rng = random.Random(seed)
+    all_rooms = [floor * 100 + i for floor in range(2, 11) for i in range(1, 16)]
+    twin_rooms = [r for r in all_rooms if r % 2 == 0]
+    selected = sorted(rng.sample(all_rooms, rng.randint(50, len(all_rooms))))
+    eco_rooms = sorted(rng.sample(selected, len(selected) // 6))
+    rest = [r for r in selected if r not in eco_rooms]
+    eco_out_rooms = sorted(rng.sample(rest, 3))
+    normal = [r for r in rest if r not in eco_out_rooms]
+
+    n_hk = rng.randint(4, 10)
+    base, extra = divmod(len(normal), n_hk)
+    housekeepers = [
+        {'id': i + 1, 'room_quota': base + (1 if i < extra else 0), 'twin_quota': -1, 'has_bath': i == 0}
+        for i in range(n_hk)
+    ]
+    housekeepers[-1]['twin_quota'] = 2
+    return normal, eco_rooms, eco_out_rooms, twin_rooms, housekeepers
+
+
+class LocalSearchTests(SimpleTestCase):
+    def test_improve_never_worsens_score(self):
+        for seed in range(3):
+            normal, eco_rooms, eco_out_rooms, twin_rooms, housekeepers = _make_day(seed)
+            allocator = _RoomAllocator(normal, eco_rooms, eco_out_rooms, twin_rooms, housekeepers)
+            hk_to_rooms = allocator.allocate(strategy=seed)
+            before, _ = allocator.evaluate_solution(hk_to_rooms)
+            improved, score, errors = allocator.improve(hk_to_rooms, iterations=2000, seed=seed)
+            self.assertEqual((score, errors), allocator.evaluate_solution(improved))
+            self.assertGreaterEqual(score, before)
+
+    def test_eco_only_day(self):
+        housekeepers = [{'id': 1, 'room_quota': 0, 'twin_quota': -1, 'has_bath': False},
+                        {'id': 2, 'room_quota': 0, 'twin_quota': -1, 'has_bath': False}]
+        allocation, stats = assign_rooms_with_stats({}, [201, 202, 305], [], [201], [], housekeepers, 24, 28, 5, 50,
+                                                    local_search_iterations=100)
+        self.assertEqual(sorted(allocation), [201, 202, 305])
+        self.assertEqual(stats['local_search']['iterations'], 100)
+
+    def test_local_search_stats(self):
+        normal, eco_rooms, eco_out_rooms, twin_rooms, housekeepers = _make_day(0)
+        args = ({r: None for r in normal}, eco_rooms, eco_out_rooms, twin_rooms, [], housekeepers, 24, 28, 5, 50)
+        _, greedy = assign_rooms_with_stats(*args, max_attempts=10)
+        _, stats = assign_rooms_with_stats(*args, max_attempts=10, local_search_iterations=2000)
+        self.assertEqual(stats['local_search']['iterations'], 2000)
+        self.assertEqual(stats['local_search']['score_before'], greedy['best_score'])
+        self.assertEqual(stats['best_score'], stats['local_search']['score_after'])
+        self.assertGreaterEqual(stats['best_score'], greedy['best_score'])
+
+
+class IncrementalScorerTests(SimpleTestCase):
+    def _allocator(self, seed):
+        normal, eco_rooms, eco_out_rooms, twin_rooms, housekeepers = _make_day(seed)
+        return _RoomAllocator(normal, eco_rooms, eco_out_rooms, twin_rooms, housekeepers)
+
+    def test_initial_score_matches_evaluate_solution(self):
+        for seed in range(5):
+            allocator = self._allocator(seed)
+            hk_to_rooms = allocator.allocate(strategy=seed)
+            scorer = _IncrementalScorer(allocator, hk_to_rooms)
+            self.assertEqual(scorer.score(), allocator.evaluate_solution(hk_to_rooms))
+
+    def test_moves_and_swaps_match_evaluate_solution(self):
+        for seed in range(5):
+            allocator = self._allocator(seed)
+            hk_to_rooms = {h: list(rooms) for h, rooms in allocator.allocate(strategy=seed).items()}
+            scorer = _IncrementalScorer(allocator, hk_to_rooms)
+            owner = {r: h for h, rooms in hk_to_rooms.items() for r in rooms}
+            rng = random.Random(seed)
+
+            for _ in range(300):
+                room1 = rng.choice(sorted(owner))
+                hk1 = owner[room1]
+                hk2 = rng.choice([h for h in allocator.hk_ids if h != hk1])
+
+                if rng.random() < 0.5 or not hk_to_rooms[hk2]:
+                    predicted = scorer.score_if_move(room1, hk1, hk2)
+                    hk_to_rooms[hk1].remove(room1)
+                    hk_to_rooms[hk2].append(room1)
+                    owner[room1] = hk2
+                    scorer.apply_move(room1, hk1, hk2)
+                else:
+                    room2 = rng.choice(hk_to_rooms[hk2])
+                    predicted = scorer.score_if_swap(room1, hk1, room2, hk2)
+                    hk_to_rooms[hk1].remove(room1)
+                    hk_to_rooms[hk2].remove(room2)
+                    hk_to_rooms[hk1].append(room2)
+                    hk_to_rooms[hk2].append(room1)
+                    owner[room1], owner[room2] = hk2, hk1
+                    scorer.apply_swap(room1, hk1, room2, hk2)
+
+                expected = allocator.evaluate_solution(hk_to_rooms)
+                self.assertEqual(predicted, expected)
+                self.assertEqual(scorer.score(), expected)
+
+
+class EvaluateBatchTests(SimpleTestCase):
+    def test_batch_scores_match_single_evaluation(self):
+        for seed in range(3):
+            normal, eco_rooms, eco_out_rooms, twin_rooms, housekeepers = _make_day(seed)
+            allocator = _RoomAllocator(normal, eco_rooms, eco_out_rooms, twin_rooms, housekeepers)
+            candidates = [allocator.allocate(strategy=attempt) for attempt in range(25)]
+            owners = np.stack([allocator.model.owner_vector(c) for c in candidates])
+
+            scores, errors = allocator.evaluate_solution(owners)
+            for i, hk_to_rooms in enumerate(candidates):
+                self.assertEqual((scores[i], errors[i]), allocator.evaluate_solution(hk_to_rooms))
+
+    def test_target_stop_counts_only_scored_attempts(self):
+        normal, eco_rooms, eco_out_rooms, twin_rooms, housekeepers = _make_day(0)
+        args = ({r: None for r in normal}, eco_rooms, eco_out_rooms, twin_rooms, [], housekeepers, 24, 28, 5, 50)
+        _, stats = assign_rooms_with_stats(*args, max_attempts=40, target_score=-10 ** 12)
+        self.assertEqual(stats['stopped_by'], 'target')
+        self.assertEqual(stats['attempts'], 1)
+
+
+class ParallelSearchTests(SimpleTestCase):
+    def test_process_pool_matches_serial(self):
+        for seed in range(2):
+            normal, eco_rooms, eco_out_rooms, twin_rooms, housekeepers = _make_day(seed)
+            args = ({r: None for r in normal}, eco_rooms, eco_out_rooms, twin_rooms, [], housekeepers, 24, 28, 5, 50)
+            serial = assign_rooms(*args, workers=1, seed=7)
+            pooled = assign_rooms(*args, workers=2, seed=7)
+            self.assertEqual(pooled, serial)
+
+
+class ExactEngineTests(SimpleTestCase):
+    def _day(self):
+        rooms = [201, 202, 203, 204, 301, 302, 303, 304]
+        housekeepers = [{'id': 1, 'room_quota': 4, 'twin_quota': -1, 'has_bath': False},
+                        {'id': 2, 'room_quota': 4, 'twin_quota': -1, 'has_bath': False}]
+        return rooms, [], [], [202, 204, 302, 304], housekeepers
+
+    @skipUnless(importlib.util.find_spec('ortools'), 'ortools is not installed')
+    def test_small_case_is_solved_optimally(self):
+        rooms, eco_rooms, eco_out_rooms, twin_rooms, housekeepers = self._day()
+        allocator = _RoomAllocator(rooms, eco_rooms, eco_out_rooms, twin_rooms, housekeepers)
+        hk_to_rooms, status = solve_exact(allocator, time_limit=10)
+        self.assertEqual(status, 'optimal')
+        self.assertEqual(sorted(r for assigned in hk_to_rooms.values() for r in assigned), rooms)
+        self.assertEqual(allocator.evaluate_solution(hk_to_rooms), (0, 0))
+
+    def test_falls_back_to_heuristic_without_ortools(self):
+        rooms, eco_rooms, eco_out_rooms, twin_rooms, housekeepers = self._day()
+        args = ({r: None for r in rooms}, eco_rooms, eco_out_rooms, twin_rooms, [], housekeepers, 24, 28, 5, 50)
+        with mock.patch.dict(sys.modules, {'ortools': None, 'ortools.sat': None, 'ortools.sat.python': None}):
+            allocation, stats = assign_rooms_with_stats(*args, max_attempts=5, engine='exact')
+        self.assertEqual(stats['exact_status'], 'unavailable')
+        self.assertEqual(stats['engine'], 'heuristic')
+        self.assertEqual(sorted(allocation), rooms)
+
+
+class SearchBudgetTests(SimpleTestCase):
+    def _args(self, seed):
+        normal, eco_rooms, eco_out_rooms, twin_rooms, housekeepers = _make_day(seed)
+        return ({r: None for r in normal}, eco_rooms, eco_out_rooms, twin_rooms, [], housekeepers, 24, 28, 5, 50)
+
+    def test_time_limit_runs_one_attempt(self):
+        _, stats = assign_rooms_with_stats(*self._args(0), max_attempts=40, time_limit=0)
+        self.assertEqual(stats['stopped_by'], 'time_limit')
+        self.assertEqual(stats['attempts'], 1)
+
+    def test_target_score_stops_at_first_match(self):
+        _, full = assign_rooms_with_stats(*self._args(0), max_attempts=40)
+        self.assertEqual(full['stopped_by'], 'exhausted')
+        self.assertEqual(full['attempts'], 40)
+
+        _, stats = assign_rooms_with_stats(*self._args(0), max_attempts=40, target_score=full['best_score'])
+        self.assertEqual(stats['stopped_by'], 'target')
+        self.assertEqual(stats['attempts'], full['best_attempt'] + 1)
+        self.assertEqual(stats['best_score'], full['best_score'])
+
+    def test_stop_on_zero_errors(self):
+        args = self._args(4)
+        allocator = _RoomAllocator(list(args[0]), args[1], args[2], args[3], args[5])
+        first_zero = next(attempt for attempt in range(40)
+                          if allocator.evaluate_solution(allocator.allocate(attempt, attempt))[1] == 0)
+
+        _, stats = assign_rooms_with_stats(*args, max_attempts=40, stop_on_zero_errors=True)
+        self.assertEqual(stats['stopped_by'], 'target')
+        self.assertEqual(stats['attempts'], first_zero + 1)
+        self.assertEqual(stats['best_errors'], 0)
+
+
+class AllocationCacheTests(SimpleTestCase):
+    def test_key_ignores_order_and_duplicates(self):
+        normal, eco_rooms, eco_out_rooms, twin_rooms, housekeepers = _make_day(0)
+        key = make_cache_key(normal, eco_rooms, eco_out_rooms, twin_rooms, housekeepers)
+        shuffled = make_cache_key(list(reversed(normal)), eco_rooms + eco_rooms[:1], eco_out_rooms,
+                                  twin_rooms, list(reversed(housekeepers)))
+        self.assertEqual(key, shuffled)
+        housekeepers[0] = dict(housekeepers[0], room_quota=housekeepers[0]['room_quota'] + 1)
+        self.assertNotEqual(key, make_cache_key(normal, eco_rooms, eco_out_rooms, twin_rooms, housekeepers))
+
+    def test_memory_and_disk_tiers(self):
+        normal, eco_rooms, eco_out_rooms, twin_rooms, housekeepers = _make_day(1)
+        args = ({r: None for r in normal}, eco_rooms, eco_out_rooms, twin_rooms, [], housekeepers, 24, 28, 5, 50)
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = AllocationCache(max_entries=4, cache_dir=cache_dir)
+            allocation, stats = assign_rooms_cached(*args, cache=cache, max_attempts=10)
+            self.assertEqual(stats['cache'], 'miss')
+
+            again, stats = assign_rooms_cached(*args, cache=cache, max_attempts=10)
+            self.assertEqual(stats['cache'], 'memory')
+            self.assertEqual(again, allocation)
+
+            cache.clear()
+            from_disk, stats = assign_rooms_cached(*args, cache=cache, max_attempts=10)
+            self.assertEqual(stats['cache'], 'disk')
+            self.assertEqual(from_disk, allocation)
+
+    def test_time_limited_exact_result_is_not_cached(self):
+        normal, eco_rooms, eco_out_rooms, twin_rooms, housekeepers = _make_day(1)
+        args = ({r: None for r in normal}, eco_rooms, eco_out_rooms, twin_rooms, [], housekeepers, 24, 28, 5, 50)
+        cache = AllocationCache(max_entries=4)
+        with mock.patch('cleaning.utils.sidewind_exact.solve_exact', return_value=(None, 'feasible')):
+            _, stats = assign_rooms_cached(*args, cache=cache, max_attempts=10, engine='exact')
+            self.assertEqual(stats['exact_status'], 'feasible')
+            _, stats = assign_rooms_cached(*args, cache=cache, max_attempts=10, engine='exact')
+        self.assertEqual(stats['cache'], 'miss')
+
+    def test_time_limited_result_is_not_cached(self):
+        normal, eco_rooms, eco_out_rooms, twin_rooms, housekeepers = _make_day(1)
+        args = ({r: None for r in normal}, eco_rooms, eco_out_rooms, twin_rooms, [], housekeepers, 24, 28, 5, 50)
+        cache = AllocationCache(max_entries=4)
+        _, stats = assign_rooms_cached(*args, cache=cache, max_attempts=10, time_limit=0)
+        self.assertEqual(stats['stopped_by'], 'time_limit')
+        _, stats = assign_rooms_cached(*args, cache=cache, max_attempts=10, time_limit=0)
+        self.assertEqual(stats['cache'], 'miss')
+
+
+class ReassignRoomsTests(SimpleTestCase):
+    def test_repairs_previous_allocation_with_few_moves(self):
+        for seed in range(3):
+            normal, eco_rooms, eco_out_rooms, twin_rooms, housekeepers = _make_day(seed)
+            previous, stats = assign_rooms_with_stats({r: None for r in normal}, eco_rooms, eco_out_rooms,
+                                                      twin_rooms, [], housekeepers, 24, 28, 5, 50, max_attempts=20)
+            hk_id_map = dict(stats['hk_id_map'])
+            labeled = [dict(h, id=hk_id_map[h['id']]) for h in housekeepers]
+
+            # 2室を除外・2室を追加（quota合計は変わらない）
+            rng = random.Random(seed)
+            removed = rng.sample(normal, 2)
+            added = rng.sample([r for r in range(201, 216) if r not in previous], 2)
+            allocation, repair_stats = reassign_rooms(previous, added, removed, [], eco_rooms, eco_out_rooms,
+                                                      twin_rooms, labeled)
+
+            expected_rooms = (set(previous) - set(removed)) | set(added)
+            self.assertEqual(set(allocation), expected_rooms)
+            self.assertLessEqual(set(allocation.values()), set(hk_id_map.values()))
+            kept = [r for r in allocation if r in previous and allocation[r] == previous[r]]
+            self.assertGreaterEqual(len(kept), len(previous) - 2 - 10)
+            self.assertEqual(repair_stats['moved'], len(previous) - 2 - len(kept))
+
+
+class SeededAttemptTests(SimpleTestCase):
+    def test_allocate_leaves_global_random_untouched(self):
+        normal, eco_rooms, eco_out_rooms, twin_rooms, housekeepers = _make_day(2)
+        allocator = _RoomAllocator(normal, eco_rooms, eco_out_rooms, twin_rooms, housekeepers)
+        random.seed(123)
+        expected = random.random()
+        random.seed(123)
+        allocator.allocate(strategy=7, seed=99)
+        self.assertEqual(random.random(), expected)
+
+    def test_best_attempt_can_be_replayed_from_stats(self):
+        normal, eco_rooms, eco_out_rooms, twin_rooms, housekeepers = _make_day(3)
+        args = ({r: None for r in normal}, eco_rooms, eco_out_rooms, twin_rooms, [], housekeepers, 24, 28, 5, 50)
+        first, stats = assign_rooms_with_stats(*args, max_attempts=30, seed=5)
+        again, _ = assign_rooms_with_stats(*args, max_attempts=30, seed=5)
+        self.assertEqual(first, again)
+
+        allocator = _RoomAllocator(normal, eco_rooms, eco_out_rooms, twin_rooms, housekeepers)
+        replayed = allocator.allocate(stats['best_attempt'], stats['best_seed'])
+        self.assertEqual(allocator.evaluate_solution(replayed), (stats['best_score'], stats['best_errors']))
+
+
+class SidewindBenchTests(SimpleTestCase):
+    def test_generated_day_matches_quotas(self):
+        all_rooms, twin_rooms = synthetic_property(500)
+        self.assertEqual(len(all_rooms), 500)
+        day = make_day(all_rooms, twin_rooms, 0, occupancy=0.6, eco_ratio=0.2, eco_out_ratio=0.05,
+                       twin_quota_hks=2, bath_staff=1)
+        self.assertEqual(sum(h['room_quota'] for h in day['housekeepers']), len(day['rooms']))
+        self.assertTrue(set(day['eco_rooms']).isdisjoint(day['rooms']))
+        self.assertEqual(sum(1 for h in day['housekeepers'] if h['twin_quota'] >= 0), 2)
+
+    def test_run_case_reports_latency_and_scores(self):
+        result = run_case('tiny', synthetic_property(60), {'occupancy': 0.8, 'eco_ratio': 0.1, 'eco_out_ratio': 0.0},
+                          repeats=2, max_attempts=5)
+        self.assertEqual(result['repeats'], 2)
+        self.assertLessEqual(result['latency']['p50'], result['latency']['max'])
+        self.assertGreater(result['attempts_per_sec'], 0)
+        self.assertGreater(result['peak_memory_bytes'], 0)
+        self.assertLessEqual(result['score']['min'], result['score']['max'])
+
+
+class PhaseProfileTests(SimpleTestCase):
+    def test_profile_records_phases_per_attempt(self):
+        normal, eco_rooms, eco_out_rooms, twin_rooms, housekeepers = _make_day(4)
+        args = ({r: None for r in normal}, eco_rooms, eco_out_rooms, twin_rooms, [], housekeepers, 24, 28, 5, 50)
+        with self.assertLogs('django', level='INFO') as logs:
+            allocation, stats = assign_rooms_with_stats(*args, max_attempts=12, profile=True)
+        self.assertEqual(allocation, assign_rooms_with_stats(*args, max_attempts=12)[0])
+
+        profile = stats['profile']
+        self.assertEqual(profile['phases']['_adjust_twin_balance']['calls'], 12)
+        self.assertEqual(profile['phases']['_allocate_hk']['calls'], 12 * len(housekeepers))
+        self.assertEqual([row[0] for row in profile['attempts']], list(range(12)))
+        self.assertGreater(profile['counts']['_can_add_floor'], 0)
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('sidewind_profile', logs.output[0])
+
+    def test_assign_rooms_returns_allocation_when_profiling(self):
+        normal, eco_rooms, eco_out_rooms, twin_rooms, housekeepers = _make_day(4)
+        args = ({r: None for r in normal}, eco_rooms, eco_out_rooms, twin_rooms, [], housekeepers, 24, 28, 5, 50)
+        with self.assertLogs('django', level='INFO') as logs:
+            allocation = assign_rooms(*args, profile=True)
+        self.assertEqual(allocation, assign_rooms(*args))
+        self.assertIn('sidewind_profile', logs.output[0])
+
+
+class TwinBalanceTests(SimpleTestCase):
+    def test_no_direct_swap_left_between_extremes(self):
+        for seed in range(8):
+            normal, eco_rooms, eco_out_rooms, twin_rooms, housekeepers = _make_day(seed)
+            allocator = _RoomAllocator(normal, [], [], twin_rooms, housekeepers)
+            hk_to_rooms = allocator.allocate(strategy=seed)
+            counts = {h: allocator._count_twins(h) for h in allocator.hk_ids}
+            for h in allocator.hk_ids:
+                self.assertEqual(allocator._count_normal(h), len(hk_to_rooms[h]))
+            if max(counts.values()) - min(counts.values()) <= 1:
+                continue
+
+            # 最多・最少のHK間に実行可能な直接交換が残っていないこと
+            max_hks = [h for h in counts if counts[h] == max(counts.values())]
+            min_hks = [h for h in counts if counts[h] == min(counts.values())]
+            for max_hk in max_hks:
+                for min_hk in min_hks:
+                    for twin in [r for r in hk_to_rooms[max_hk] if r in allocator.twin_rooms]:
+                        for single in [r for r in hk_to_rooms[min_hk] if r not in allocator.twin_rooms]:
+                            self.assertFalse(allocator._can_swap(max_hk, min_hk, twin, single))
+
+    def test_broken_chain_is_rolled_back(self):
+        for seed in range(8):
+            normal, eco_rooms, eco_out_rooms, twin_rooms, housekeepers = _make_day(seed)
+            allocator = _RoomAllocator(normal, [], [], twin_rooms, housekeepers)
+            allocator.allocate(strategy=seed)
+            index = allocator._build_twin_index()
+            edge = next(((giver, edge) for giver in allocator.hk_ids
+                         for edge in allocator._twin_swap_edges(index, giver)), None)
+            if edge is None:
+                continue
+            giver, (sink, twin_floor, single_floor) = edge
+            source = next(h for h in allocator.hk_ids if h not in (giver, sink))
+            before = {h: sorted(rooms) for h, rooms in allocator.allocation.items()}
+            twin_counts = dict(allocator.twin_counts)
+
+            # 2段目は存在しないフロアを指すため交換できない
+            parent = {sink: (giver, twin_floor, single_floor), giver: (source, 0, 0), source: None}
+            self.assertFalse(allocator._apply_twin_chain(index, parent, sink))
+            self.assertEqual({h: sorted(rooms) for h, rooms in allocator.allocation.items()}, before)
+            self.assertEqual(allocator.twin_counts, twin_counts)
+            self.assertEqual(index, allocator._build_twin_index())
+            return
+        self.fail('no twin swap edge found')
+
+
+class RebalanceUnitsTests(SimpleTestCase):
+    def _totals(self, holdings):
+        return {h: sum(floors.values()) for h, floors in holdings.items()}
+
+    def test_chain_through_shared_floors(self):
+        # 1 と 3 は共通のフロアが無いが、2 を経由して受け渡せる
+        holdings = {1: {2: 4}, 2: {2: 0, 3: 1}, 3: {3: 0}}
+        capacity = {1: {2: 10}, 2: {2: 10, 3: 10}, 3: {3: 10}}
+        moves = rebalance_units(holdings, capacity, lambda h, k: k * k)
+        self.assertEqual(sorted(self._totals(holdings).values()), [1, 2, 2])
+        self.assertIn((2, 3, 3), moves)
+
+    def test_respects_capacity_and_floors(self):
+        holdings = {1: {2: 5}, 2: {4: 0}, 3: {2: 0}}
+        capacity = {1: {2: 10}, 2: {4: 10}, 3: {2: 1}}
+        rebalance_units(holdings, capacity, lambda h, k: k * k)
+        self.assertEqual(self._totals(holdings), {1: 4, 2: 0, 3: 1})
+
+
+class SidewindJobTests(SimpleTestCase):
+    def _wait(self, job):
+        deadline = time.time() + 30
+        while job.finished is None and time.time() < deadline:
+            time.sleep(0.01)
+        return job
+
+    def test_duplicate_submission_attaches_to_running_job(self):
+        registry = JobRegistry()
+        release = threading.Event()
+
+        def search(on_progress, cancel):
+            on_progress({'attempts': 1, 'max_attempts': 2, 'best_score': -5, 'best_errors': 0})
+            release.wait(5)
+            return {101: 1}, {'best_score': -5, 'best_errors': 0}
+
+        job, created = registry.submit('key', search)
+        again, created_again = registry.submit('key', search)
+        self.assertTrue(created)
+        self.assertFalse(created_again)
+        self.assertIs(job, again)
+
+        release.set()
+        data = self._wait(job).as_dict()
+        self.assertEqual(data['status'], DONE)
+        self.assertEqual(data['progress']['attempts'], 1)
+        self.assertEqual(data['allocation'], {'101': 1})
+
+    def test_failed_job_reports_error_and_can_be_resubmitted(self):
+        registry = JobRegistry()
+
+        def broken(on_progress, cancel):
+            raise RuntimeError('quota mismatch')
+
+        job, _ = registry.submit('key', broken)
+        self._wait(job)
+        self.assertEqual(job.status, FAILED)
+        self.assertEqual(job.as_dict()['error'], 'quota mismatch')
+        _, created = registry.submit('key', broken)
+        self.assertTrue(created)
+
+    def test_allocation_job_reports_progress(self):
+        registry = JobRegistry()
+        day = make_day(*synthetic_property(120), seed=1, occupancy=0.8, eco_ratio=0.15, eco_out_ratio=0.03)
+        job, _ = submit_allocation(**day, registry=registry, max_attempts=40, cache=AllocationCache())
+        self._wait(job)
+        self.assertEqual(job.status, DONE)
+        self.assertEqual(job.progress['attempts'], 40)
+        self.assertEqual(job.progress['best_score'], job.stats['best_score'])
+
+    def test_non_result_options_share_job(self):
+        registry = JobRegistry()
+        day = make_day(*synthetic_property(120), seed=1, occupancy=0.8, eco_ratio=0.15, eco_out_ratio=0.03)
+        job, _ = submit_allocation(**day, registry=registry, max_attempts=20, cache=AllocationCache())
+        again, created = submit_allocation(**day, registry=registry, max_attempts=20, cache=AllocationCache(),
+                                           workers=2)
+        self.assertFalse(created)
+        self.assertIs(job, again)
+        self._wait(job)
+
+    def test_cancel_stops_remaining_attempts(self):
+        day = make_day(*synthetic_property(120), seed=2, occupancy=0.8, eco_ratio=0.15, eco_out_ratio=0.03)
+        cancel = threading.Event()
+        reports = []
+
+        def on_progress(progress):
+            reports.append(progress)
+            cancel.set()
+
+        allocation, stats = assign_rooms_with_stats(**day, on_progress=on_progress, cancel=cancel,
+                                                    local_search_iterations=100)
+        self.assertEqual(stats['stopped_by'], 'cancelled')
+        self.assertEqual(stats['attempts'], 20)
+        self.assertNotIn('local_search', stats)
+        # 最初の報告には最終結果と同じ番号付けの暫定解が入る
+        self.assertEqual(reports[0]['allocation'], allocation)
+
+    def test_stream_reports_allocations_then_done(self):
+        registry = JobRegistry()
+        day = make_day(*synthetic_property(120), seed=1, occupancy=0.8, eco_ratio=0.15, eco_out_ratio=0.03)
+        job, _ = submit_allocation(**day, registry=registry, max_attempts=60, cache=AllocationCache())
+        events = [event[0] for event in job.stream(keepalive=1) if event is not None]
+        self.assertEqual(events[-1], DONE)
+        self.assertNotIn(FAILED, events)
+        self.assertEqual(job.as_dict()['best_score'], job.stats['best_score'])
+
+
+class _StaticCsvTestCase(SimpleTestCase):
+    """static/csv の files を一時ディレクトリへ複製し、BASE_DIR をそこへ向ける（前後で invalidate を呼ぶ）"""
+    files = ()
+    invalidate = staticmethod(lambda: None)
+
+    def setUp(self):
+        self.base_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.base_dir)
+        self.csv_dir = self.base_dir / 'static' / 'csv'
+        self.csv_dir.mkdir(parents=True)
+        for name in self.files:
+            shutil.copy(Path(settings.BASE_DIR) / 'static' / 'csv' / name, self.csv_dir / name)
+        override = override_settings(BASE_DIR=self.base_dir)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(self.invalidate)
+        self.invalidate()
+
+    def touch(self, path, text):
+        """内容を書き換え、更新日時を確実に進める"""
+        path.write_text(text, encoding='utf-8')
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+class MasterDataTests(_StaticCsvTestCase):
+    files = MASTER_FILES
+    invalidate = staticmethod(invalidate_master_data)
+
+    def test_parsed_structures_match_csv_rows(self):
+        master = get_master_data()
+        room_info_data, times_by_time_data, _ = master.raw()
+        self.assertEqual([room for floor in master.room_num_table for room in floor],
+                         sorted((room for room, _ in room_info_data), key=lambda r: (-(int(r) // 100), r)))
+        self.assertEqual(master.single_rooms, tuple(room for room, t in room_info_data if t == 'S'))
+        self.assertEqual(master.twin_rooms, tuple(room for room, t in room_info_data if t == 'T'))
+        self.assertEqual(sum(len(rooms) for rooms in master.rooms_by_type.values()), len(room_info_data))
+        codes = [row[0] for row in times_by_time_data if row[0] not in ('bath', 'eco')]
+        self.assertEqual([rt['code'] for rt in master.room_type_list()], codes)
+        self.assertIs(get_master_data(), master)
+
+    def test_shared_structures_are_read_only(self):
+        master = get_master_data()
+        with self.assertRaises(TypeError):
+            master.room_types['999'] = 'S'
+        with self.assertRaises(AttributeError):
+            master.single_rooms.append('999')
+        master.rooms_by_type['S'] = ()
+        self.assertNotEqual(get_master_data().rooms_by_type.get('S'), ())
+
+    def test_reloads_when_file_changes(self):
+        master = get_master_data()
+        self.touch(self.csv_dir / 'times_by_type.csv', 'type,time,label\nS,30,シングル\neco,7,エコ\n')
+        reloaded = get_master_data()
+        self.assertIsNot(reloaded, master)
+        self.assertEqual(reloaded.type_times, {'S': 30})
+        self.assertEqual(reloaded.eco_time, 7)
+
+        invalidate_master_data()
+        self.assertIsNot(get_master_data(), reloaded)
+
+
+class LabelCatalogTests(_StaticCsvTestCase):
+    files = LABEL_FILES
+    invalidate = staticmethod(invalidate_label_catalog)
+
+    def test_labels_merge_weekly_and_pages_are_shared(self):
+        catalog = get_label_catalog()
+        weekly = preview_util.get_csv_weekly()
+        self.assertEqual(preview_util.language('Monday', 'en', None), weekly['Monday']['en'])
+        self.assertEqual(preview_util.language('charge', 'ja', None), '担当')
+        self.assertEqual(preview_util.language('no_such_label', 'en', None), 'no_such_label')
+        page = catalog.page_labels('en')
+        self.assertEqual(set(page), set(PAGE_LABEL_KEYS))
+        self.assertEqual(page['charge'], preview_util.language('charge', 'en', None))
+        self.assertIs(get_label_catalog().page_labels('en'), page)
+
+    def test_reloads_when_file_changes(self):
+        catalog = get_label_catalog()
+        self.touch(self.csv_dir / 'preview_labels.csv', 'key,ja,en\ncharge,係,In charge\n')
+        self.assertIsNot(get_label_catalog(), catalog)
+        self.assertEqual(preview_util.language('charge', 'en', None), 'In charge')
+        self.assertEqual(get_label_catalog().page_labels('ja')['charge'], '係')
+
+    def test_missing_weekly_file_is_empty(self):
+        (self.csv_dir / 'weekly.csv').unlink()
+        catalog = get_label_catalog()
+        self.assertEqual(catalog.weekly_data, {})
+        self.assertEqual(catalog.label('charge', 'ja'), '担当')
+
+
+class PhraseTableTests(SimpleTestCase):
+    def setUp(self):
+        self.table = PhraseTable([('タオル', 'Towel'), ('タオル交換', 'Change towels'), ('補充', 'refill'), ('枕', 'Pillow')])
+
+    def test_longest_match_and_offline_coverage(self):
+        self.assertEqual(self.table.segment('タオル交換、枕補充'),
+                         [(True, 'Change towels'), (False, '、'), (True, 'Pillow'), (True, 'refill')])
+        self.assertEqual(self.table.translate('タオル交換、枕補充'), 'Change towels, Pillow refill')
+        self.assertTrue(self.table.covers('201 タオル補充'))
+        self.assertFalse(self.table.covers('タオル多めに'))
+        self.assertEqual(self.table.translate('照明'), '照明')
+
+    def test_only_residue_goes_online(self):
+        calls = []
+
+        def online(text):
+            calls.append(text)
+            return 'extra'
+
+        self.assertEqual(self.table.translate('タオル多めに補充', online=online), 'Towel extra refill')
+        self.assertEqual(self.table.translate('照明', online=online), 'extra')
+        self.assertEqual(calls, ['多めに', '照明'])
+
+    def test_translate_skips_network_when_glossary_covers(self):
+        with mock.patch.object(preview_util, '_translation_reachable') as probe, \
+                mock.patch.object(preview_util, 'TRANSLATION_BACKENDS', []):
+            self.assertEqual(preview_util.translate('エコ外'), 'Eco-Outside')
+            self.assertEqual(preview_util.translate_all(['タオル交換']), {'タオル交換': 'Change towels'})
+        probe.assert_not_called()
+
+
+class CalcRoomTests(SimpleTestCase):
+    def _calc(self, person, remarks, spots=(), index=False):
+        room_inputs = {'201': '1', '202': '1', '203': '2', '301': '1'}
+        args = (['201', '301'], ['202'], ['301'], remarks, ['201', '203', '301'], ['202'], [], [], list(spots))
+        kwargs = {}
+        if index:
+            kwargs['index'] = RoomIndex(*args)
+        eco_rooms, duvet_rooms, ame_rooms, remarks, single_rooms, twin_rooms, multiple_rooms, outins, spots = args
+        return calc_room(room_inputs, eco_rooms, duvet_rooms, ame_rooms, remarks, person, single_rooms, twin_rooms,
+                         multiple_rooms, outins, spots, 'ja', **kwargs)
+
+    def test_remarks_and_markers(self):
+        remarks = [{'room': '999', 'comment': '先'}, {'room': '201,202', 'comment': '備考'}, {'room': '301', 'comment': '後'}]
+        rooms, floors = self._calc(1, remarks, spots=[{'room': '201', 'content': 'スポット'}])
+        by_room = {r['room_num']: r for r in rooms}
+        # 1件目の備考の後に区分が付き、該当する備考・スポットが後ろに続く
+        self.assertEqual(by_room['201']['remark'], 'エコ　　備考　スポット')
+        self.assertEqual(by_room['201']['spot_content'], 'スポット')
+        self.assertEqual(by_room['202']['remark'], '備考')
+        self.assertEqual(by_room['301']['remark'], 'エコ外　　後')
+        self.assertEqual(by_room['202']['room_type'], 'T')
+        self.assertTrue(by_room['202']['multiple'])
+        self.assertEqual(floors, ['2', '3'])
+
+    def test_buckets_match_exact_person_number(self):
+        room_inputs = {'305': '1', '201': '12', '202': '1', '203': '0', '204': '21'}
+        buckets = bucket_rooms_by_person(room_inputs)
+        self.assertEqual(buckets['1'], ['305', '202'])
+        rooms, _ = calc_room(room_inputs, [], [], [], [], 1, [], [], [], [], [], 'ja', buckets=buckets)
+        self.assertEqual([r['room_num'] for r in rooms], ['202', '305'])
+
+    def test_shared_index_gives_same_result(self):
+        remarks = [{'room': '201', 'comment': 'エコ済み'}, {'room': '20', 'comment': '階'}]
+        for person in (1, 2):
+            self.assertEqual(self._calc(person, remarks), self._calc(person, remarks, index=True))
+
+
+class TranslationMemoryTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = Path(self.tmp.name) / 'tm.sqlite3'
+
+    def test_evicted_entries_survive_in_sqlite(self):
+        memory = TranslationMemory(self.path, max_entries=1)
+        memory.store('エコ外', 'ja', 'en', 'googletrans', 'Eco-Outside')
+        memory.store('タオル補充', 'ja', 'en', 'cloud', 'Towel refill')
+        self.assertEqual(memory.lookup('エコ外', 'ja', 'en'), 'Eco-Outside')
+        self.assertEqual(TranslationMemory(self.path).lookup('タオル補充', 'ja', 'en'), 'Towel refill')
+
+    def test_language_pair_is_part_of_the_key(self):
+        memory = TranslationMemory(self.path)
+        memory.store('エコ外', 'ja', 'en', 'googletrans', 'Eco-Outside')
+        self.assertIsNone(memory.lookup('エコ外', 'ja', 'fr'))
+
+    def test_failed_translation_is_not_stored(self):
+        memory = TranslationMemory(self.path)
+        memory.store('清掃', 'ja', 'en', 'googletrans', '清掃')
+        self.assertIsNone(memory.lookup('清掃', 'ja', 'en'))
+
+    def test_translate_uses_memory_before_backends(self):
+        memory = TranslationMemory(self.path)
+        calls = []
+
+        def backend(text):
+            calls.append(text)
+            return 'Extension'
+
+        with mock.patch.object(preview_util, 'get_default_memory', return_value=memory), \
+                mock.patch.object(preview_util, 'TRANSLATION_BACKENDS', [('fake', backend)]):
+            self.assertEqual(preview_util.google_translate_ja_to_en('内線'), 'Extension')
+            self.assertEqual(preview_util.translate('内線'), 'Extension')
+        self.assertEqual(calls, ['内線'])
+
+    def test_translate_all_dedupes_and_respects_deadline(self):
+        memory = TranslationMemory()
+        memory.store('内線', 'ja', 'en', 'googletrans', 'Extension')
+        calls = []
+        release = threading.Event()
+
+        def backend(text):
+            calls.append(text)
+            if text == '遅い':
+                release.wait(5)
+            return text + '-en'
+
+        with mock.patch.object(preview_util, 'get_default_memory', return_value=memory), \
+                mock.patch.object(preview_util, 'TRANSLATION_BACKENDS', [('fake', backend)]), \
+                mock.patch.object(preview_util, '_translation_reachable', return_value=True) as probe:
+            results = preview_util.translate_all(['内線', '備品', '備品', '', '遅い'], deadline=0.5, max_workers=4)
+        release.set()
+        self.assertEqual(results, {'内線': 'Extension', '備品': '備品-en', '遅い': '遅い'})
+        self.assertEqual(sorted(calls), ['備品', '遅い'])
+        probe.assert_called_once()
+
+
+class _FakeTranslateHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.hits += 1
+        self.send_response(self.server.status)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class TranslationHealthTests(SimpleTestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _FakeTranslateHandler)
+        self.server.hits = 0
+        self.server.status = 200
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.now = 0.0
+        self.breaker = CircuitBreaker(ttl=60, backoff=5, max_backoff=20, clock=lambda: self.now)
+        patcher = mock.patch.object(preview_util, 'get_default_breaker', return_value=self.breaker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        url = 'http://127.0.0.1:%d/' % self.server.server_address[1]
+        settings_override = override_settings(TRANSLATION_PROBE_URL=url)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_probe_is_reused_and_backs_off_when_offline(self):
+        self.assertTrue(preview_util._translation_reachable())
+        self.assertTrue(preview_util._translation_reachable())
+        self.assertEqual(self.server.hits, 1)
+
+        # TTL切れ後にオフライン → 待ち時間中は確認しない
+        self.server.status = 503
+        self.now = 61
+        self.assertFalse(preview_util._translation_reachable())
+        self.assertFalse(preview_util._translation_reachable())
+        self.assertEqual(self.server.hits, 2)
+        self.assertEqual(preview_util.translate('内線'), '内線')
+        self.assertEqual(self.server.hits, 2)
+
+        # 待ち時間が過ぎたら再確認し、復帰する
+        self.server.status = 200
+        self.now = 67
+        self.assertTrue(preview_util._translation_reachable())
+        self.assertEqual(self.server.hits, 3)
+
+    def test_failing_backend_is_skipped_until_retry(self):
+        calls = []
+
+        def broken(text):
+            calls.append('broken')
+            raise ConnectionError('offline')
+
+        def working(text):
+            calls.append('working')
+            return 'Light'
+
+        with mock.patch.object(preview_util, 'get_default_memory', return_value=TranslationMemory()), \
+                mock.patch.object(preview_util, 'TRANSLATION_BACKENDS', [('broken', broken), ('working', working)]):
+            self.assertEqual(preview_util.google_translate_ja_to_en('内線'), 'Light')
+            self.assertEqual(preview_util.google_translate_ja_to_en('照明'), 'Light')
+            self.now = 6
+            preview_util.google_translate_ja_to_en('窓')
+        self.assertEqual(calls, ['broken', 'working', 'working', 'broken', 'working'])
+        self.assertEqual(self.breaker.status()['broken']['failures'], 2)
@@ -0,0 +1,53 @@
+"""
+ファイルから組み立てる解析結果のプロセス内キャッシュ
+- 元ファイルの (更新日時, サイズ) が変わった時、または invalidate() の後に読み直す
+- master_data / label_catalog が共有する
+"""
+
+import os
+import threading
+
+
+def file_signature(directory, names):
+    """各ファイルの (更新日時, サイズ)。無いファイルは None"""
+    signature = []
+    for name in names:
+        try:
+            stat = os.stat(directory / name)
+        except FileNotFoundError:
+            signature.append(None)
+            continue
+        signature.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+class FileSignatureCache:
+    """
+    directory() 配下の names から load(directory) で組み立てた値を1つだけ保持する
+    - directory: 読み込み元のディレクトリ（Path）を返す関数（settings を呼び出し時に参照するため）
+    - load: directory を受け取って解析結果を返す関数
+    """
+
+    def __init__(self, directory, names, load):
+        self._directory = directory
+        self._names = tuple(names)
+        self._load = load
+        self._value = None
+        self._signature = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """解析結果を返す（ファイルが変わっていれば読み直す）"""
+        directory = self._directory()
+        signature = file_signature(directory, self._names)
+        with self._lock:
+            if self._value is None or self._signature != signature:
+                self._value = self._load(directory)
+                self._signature = signature
+            return self._value
+
+    def invalidate(self):
+        """次回の get() で必ず読み直す"""
+        with self._lock:
+            self._value = None
+            self._signature = None
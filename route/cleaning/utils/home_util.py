@@ -1,65 +1,3 @@
-import csv
-from collections import defaultdict
-
-def read_csv():
-    with open('static/csv/room_info.csv', 'r',encoding="utf-8") as f:
-        reader = csv.reader(f)
-        room_info_raw_data = [row for row in reader]
-    with open('static/csv/times_by_type.csv', 'r',encoding="utf-8") as f:
-        reader = csv.reader(f)
-        times_by_time_raw_data = [row for row in reader]
-    with open('static/csv/master_key.csv', 'r',encoding="utf-8") as f:
-        reader = csv.reader(f)
-        master_key_raw_data = [row for row in reader]
-    room_info_data = room_info_raw_data[1:]
-    times_by_time_data = times_by_time_raw_data[1:]
-    master_key_data = master_key_raw_data[1:]
-    return room_info_data, times_by_time_data, master_key_data
-
-
-def processing_list(room_info_data):
-    floors = defaultdict(list)
-    for room, _ in room_info_data:
-        floor = int(room) // 100  # 例: '201' → 2階
-        floors[floor].append(room)
-    room_num_table = [floors[f] for f in sorted(floors, reverse=True)]
-    return room_num_table
-
-def dist_room(room_info_data):
-    single_room_list = []
-    twin_room_list = []
-    for room, room_type in room_info_data:
-        if room_type == 'S':
-            single_room_list.append(room)
-        elif room_type == 'T':
-            twin_room_list.append(room)
-    return single_room_list, twin_room_list
-
-
-def parse_room_types(times_by_time_data):
-    """CSV→構造化データ。bath/ecoを除外した部屋タイプリストを返す"""
-    room_types = []
-    bath_time = 50
-    eco_time = 5
-    for row in times_by_time_data:
-        code = row[0]
-        time_val = int(row[1])
-        label = row[2] if len(row) > 2 else code
-        if code == 'bath':
-            bath_time = time_val
-        elif code == 'eco':
-            eco_time = time_val
-        else:
-            room_types.append({'code': code, 'time': time_val, 'label': label})
-    return room_types, bath_time, eco_time
-
-def dist_room_by_type(room_info_data):
-    """部屋をタイプ別に辞書化 → {'S': ['201','202'...], 'T': [...]}"""
-    rooms_by_type = defaultdict(list)
-    for room, room_type in room_info_data:
-        rooms_by_type[room_type].append(room)
-    return dict(rooms_by_type)
-
 def room_person(room_num_table, room_inputs):
     room_person = []
     for floor in room_num_table:
@@ -0,0 +1,125 @@
+"""
+印刷用ラベル（static/csv の preview_labels.csv / weekly.csv / glossary.csv）
+- 1度だけ読み込み、曜日ごとの週次作業をラベル辞書へマージした形で保持する
+- 用語集（glossary.csv）はオフライン翻訳の PhraseTable として持つ
+- ファイルの更新日時・サイズが変わった時に読み直す（file_cache）。無いファイルは空として扱う
+- 清掃表1ページ分のラベルは言語ごとに1度だけ組み立てて共有する（呼び出し側は読み取り専用として扱う）
+"""
+
+import csv
+import threading
+from pathlib import Path
+
+from .file_cache import FileSignatureCache
+from .phrase_table import PhraseTable
+
+
+PREVIEW_LABELS_FILE = 'preview_labels.csv'
+WEEKLY_FILE = 'weekly.csv'
+GLOSSARY_FILE = 'glossary.csv'
+LABEL_FILES = (PREVIEW_LABELS_FILE, WEEKLY_FILE, GLOSSARY_FILE)
+
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# 清掃表（パーソンごとのページ）で使うラベル
+PAGE_LABEL_KEYS = (
+    'charge', 'title', 'consecutive_nights', 'eco', 'duvet', 'remark', 'cleaned', 'inspection',
+    'public_bath_cleaning', 'public_bath_cleaning_please', 'master_key_number',
+    'target_completion_time_for_cleaning', 'cleaning_completion_time', 'spot_cleaning', 'meating',
+    'author', 'early_shift', 'inspection_charge', 'sign', 'notice', 'special_cleaning', 'line_first',
+    'airconditioner_filter_cleaning', 'units', 'line_second', 'line_third', 'room_number', 'forget',
+    'hotel_name', 'declaration', 'signature',
+)
+
+
+class LabelCatalog:
+    """解析済みのラベル（1回分の読み込み結果）"""
+
+    def __init__(self, preview_labels, weekly_data, glossary=None):
+        # get_csv_preview_labels() / get_csv_weekly() と同じ形
+        self.preview_labels = preview_labels
+        self.weekly_data = weekly_data
+        self.glossary = glossary if glossary is not None else PhraseTable()
+
+        # weekly.csvのデータをラベル辞書にマージ
+        self.labels = {lang: dict(values) for lang, values in preview_labels.items()}
+        for day in WEEKDAYS:
+            if day in weekly_data:
+                self.labels['ja'][day] = weekly_data[day]['jp']
+                self.labels['en'][day] = weekly_data[day]['en']
+
+        self._pages = {}
+        self._lock = threading.Lock()
+
+    def label(self, str_id, lang_id):
+        return self.labels[lang_id].get(str_id, str_id)
+
+    def page_labels(self, lang_id):
+        """清掃表1ページ分の {キー: ラベル}（言語ごとに共有）"""
+        with self._lock:
+            page = self._pages.get(lang_id)
+            if page is None:
+                labels = self.labels.get(lang_id, {})
+                page = self._pages[lang_id] = {key: labels.get(key, key) for key in PAGE_LABEL_KEYS}
+            return page
+
+
+def _read_preview_labels(path):
+    labels = {'ja': {}, 'en': {}}
+    try:
+        with open(path, newline='', encoding='utf-8') as csvfile:
+            reader = csv.DictReader(csvfile)
+            for row in reader:
+                key = row['key'].strip()
+                labels['ja'][key] = row.get('ja', '')
+                labels['en'][key] = row.get('en', '')
+    except (FileNotFoundError, KeyError):
+        pass
+    return labels
+
+
+def _read_weekly(path):
+    """weekly.csv（week,jp,en）。無ければ週次作業なし"""
+    weekly_data = {}
+    try:
+        with open(path, newline='', encoding='utf-8') as csvfile:
+            reader = csv.DictReader(csvfile)
+            for row in reader:
+                weekly_data[row['week']] = {'jp': row['jp'], 'en': row['en']}
+    except FileNotFoundError:
+        pass
+    return weekly_data
+
+
+def _read_glossary(path):
+    """glossary.csv（ja,en）。無ければ空の用語集"""
+    try:
+        with open(path, newline='', encoding='utf-8') as csvfile:
+            reader = csv.DictReader(csvfile)
+            return PhraseTable((row.get('ja') or '', row.get('en') or '') for row in reader)
+    except FileNotFoundError:
+        return PhraseTable()
+
+
+def _label_dir():
+    from django.conf import settings
+    return Path(settings.BASE_DIR) / 'static' / 'csv'
+
+
+def _load(directory):
+    return LabelCatalog(_read_preview_labels(directory / PREVIEW_LABELS_FILE),
+                        _read_weekly(directory / WEEKLY_FILE),
+                        _read_glossary(directory / GLOSSARY_FILE))
+
+
+_cache = FileSignatureCache(_label_dir, LABEL_FILES, _load)
+
+
+def get_label_catalog():
+    """解析済みのラベルを返す（ファイルが変わっていれば読み直す）"""
+    return _cache.get()
+
+
+def invalidate_label_catalog():
+    """次回の get_label_catalog() で必ず読み直す"""
+    _cache.invalidate()
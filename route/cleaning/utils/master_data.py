@@ -0,0 +1,107 @@
+"""
+マスタデータ（static/csv の room_info.csv / times_by_type.csv / master_key.csv）
+- 1度だけ読み込んで解析し、部屋 → タイプ、階別の部屋表、タイプ別の清掃時間などの形で保持する
+- ファイルの更新日時・サイズが変わった時、または管理画面で保存した時（invalidate_master_data）に読み直す
+- 共有されるため部屋の一覧は tuple・読み取り専用の mapping で持つ（プロセス全体のキャッシュを書き換えられない）
+"""
+
+import csv
+from collections import defaultdict
+from pathlib import Path
+from types import MappingProxyType
+
+from .file_cache import FileSignatureCache
+
+
+ROOM_INFO_FILE = 'room_info.csv'
+TIMES_BY_TYPE_FILE = 'times_by_type.csv'
+MASTER_KEY_FILE = 'master_key.csv'
+MASTER_FILES = (ROOM_INFO_FILE, TIMES_BY_TYPE_FILE, MASTER_KEY_FILE)
+
+# times_by_type.csv に bath / eco の行が無い場合の既定値（分）
+DEFAULT_BATH_TIME = 50
+DEFAULT_ECO_TIME = 5
+
+
+class MasterData:
+    """解析済みのマスタデータ（1回分の読み込み結果）"""
+
+    def __init__(self, room_info_data, times_by_time_data, master_key_data):
+        # CSVの行（ヘッダー除く）
+        self.room_info_data = room_info_data
+        self.times_by_time_data = times_by_time_data
+        self.master_key_data = master_key_data
+
+        # 部屋番号（文字列）→ タイプ / 階
+        self.room_types = MappingProxyType({room: room_type for room, room_type in room_info_data})
+        self.room_floors = MappingProxyType({room: int(room) // 100 for room, _ in room_info_data})
+        self.all_rooms = tuple(int(room) for room, _ in room_info_data)
+
+        rooms_by_type = defaultdict(list)
+        floors = defaultdict(list)
+        for room, room_type in room_info_data:
+            rooms_by_type[room_type].append(room)
+            floors[int(room) // 100].append(room)
+        self._rooms_by_type = {room_type: tuple(rooms) for room_type, rooms in rooms_by_type.items()}
+        self.single_rooms = self._rooms_by_type.get('S', ())
+        self.twin_rooms = self._rooms_by_type.get('T', ())
+        # 階別の部屋表（上の階から）
+        self.room_num_table = tuple(tuple(floors[f]) for f in sorted(floors, reverse=True))
+
+        # タイプ別の清掃時間（bath / eco は別枠）
+        self.type_times = {}
+        self.type_labels = {}
+        self.bath_time = DEFAULT_BATH_TIME
+        self.eco_time = DEFAULT_ECO_TIME
+        for row in times_by_time_data:
+            code, minutes = row[0], int(row[1])
+            if code == 'bath':
+                self.bath_time = minutes
+            elif code == 'eco':
+                self.eco_time = minutes
+            else:
+                self.type_times[code] = minutes
+                self.type_labels[code] = row[2] if len(row) > 2 else code
+
+    @property
+    def rooms_by_type(self):
+        """{タイプ: (部屋番号, ...)} の新しい dict（json.dumps にそのまま渡せる）"""
+        return dict(self._rooms_by_type)
+
+    def room_type_list(self):
+        """bath / eco を除いた [{'code', 'time', 'label'}, ...]（呼び出し側で変更してよい新しいリスト）"""
+        return [{'code': code, 'time': minutes, 'label': self.type_labels[code]}
+                for code, minutes in self.type_times.items()]
+
+    def raw(self):
+        """(room_info_data, times_by_time_data, master_key_data) の複製"""
+        return ([list(row) for row in self.room_info_data],
+                [list(row) for row in self.times_by_time_data],
+                [list(row) for row in self.master_key_data])
+
+
+def _read_rows(path):
+    with open(path, 'r', encoding="utf-8") as f:
+        return [row for row in csv.reader(f)][1:]
+
+
+def _master_dir():
+    from django.conf import settings
+    return Path(settings.BASE_DIR) / 'static' / 'csv'
+
+
+def _load(directory):
+    return MasterData(*(_read_rows(directory / name) for name in MASTER_FILES))
+
+
+_cache = FileSignatureCache(_master_dir, MASTER_FILES, _load)
+
+
+def get_master_data():
+    """解析済みのマスタデータを返す（ファイルが変わっていれば読み直す）"""
+    return _cache.get()
+
+
+def invalidate_master_data():
+    """次回の get_master_data() で必ず読み直す（管理画面でマスタを保存した時に呼ぶ）"""
+    _cache.invalidate()
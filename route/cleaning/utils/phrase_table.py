@@ -0,0 +1,74 @@
+"""
+オフラインの用語集翻訳（static/csv/glossary.csv）
+- 清掃の備考は限られた用語の組み合わせが多いので、ネットワークを使う前に用語集で訳す
+- 原文を先頭から最長一致で用語に分け、用語集に無い部分（残り）だけをオンラインの翻訳に回す
+- 残りが日本語を含まない（部屋番号・記号・英字だけ）なら翻訳しない
+"""
+
+import re
+
+
+# 日本語（ひらがな・カタカナ・漢字）を含むか
+_JAPANESE = re.compile(r'[぀-ヿ㐀-鿿豈-﫿]')
+
+# 訳文をつなぐときの記号の置き換え
+_PUNCTUATION = str.maketrans({'、': ',', '。': '.', '　': ' ', '・': '/', '（': '(', '）': ')', '：': ':'})
+
+
+class PhraseTable:
+    """日本語 → 英語 の用語集と最長一致の分割"""
+
+    def __init__(self, rows=()):
+        self.phrases = {}
+        for ja, en in rows:
+            ja, en = ja.strip(), en.strip()
+            if ja and en:
+                self.phrases[ja] = en
+        self.max_length = max((len(ja) for ja in self.phrases), default=0)
+
+    def segment(self, text):
+        """[(用語かどうか, 文字列), ...]。用語は訳文、それ以外は原文の残りのまま"""
+        segments = []
+        residue = ''
+        i = 0
+        while i < len(text):
+            for length in range(min(self.max_length, len(text) - i), 0, -1):
+                phrase = self.phrases.get(text[i:i + length])
+                if phrase is not None:
+                    break
+            else:
+                residue += text[i]
+                i += 1
+                continue
+            if residue:
+                segments.append((False, residue))
+                residue = ''
+            segments.append((True, phrase))
+            i += length
+        if residue:
+            segments.append((False, residue))
+        return segments
+
+    def covers(self, text):
+        """用語集だけで訳せるか（オンラインに回す残りが無いか）"""
+        return bool(text) and all(known or not _JAPANESE.search(part) for known, part in self.segment(text))
+
+    def translate(self, text, online=None):
+        """
+        用語集で訳し、残りは online(残り) で訳す（online が None なら原文のまま残す）。
+        用語が1つも無ければ全体を online に渡す（online が None なら原文をそのまま返す）
+        """
+        segments = self.segment(text)
+        if not any(known for known, _ in segments):
+            return online(text) if online is not None else text
+        words = []
+        for known, part in segments:
+            if not known:
+                if online is not None and _JAPANESE.search(part):
+                    part = online(part)
+                else:
+                    part = part.translate(_PUNCTUATION)
+            part = part.strip()
+            if part:
+                words.append(part)
+        return re.sub(r' ([,.:)])', r'\1', ' '.join(words))
@@ -1,40 +1,27 @@
 import datetime
 import itertools
-from ..utils.home_util import read_csv, dist_room, parse_room_types, dist_room_by_type
+from concurrent.futures import ThreadPoolExecutor, wait
+from django.conf import settings
+from .master_data import get_master_data
+from .label_catalog import get_label_catalog
+from .translation_memory import get_default_memory
+from .translation_health import get_default_breaker
 import requests
 from googletrans import Translator
 from typing import Optional
 from deep_translator import GoogleTranslator
 from google.cloud import translate_v2 as gct  
 from typing import Optional
-import csv
 
 def get_csv_weekly():
-    weekly_data = {}
-    with open('static/csv/weekly.csv', newline='', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-        weekly_data = {}
-        for row in reader:
-            week = row['week']
-            jp = row['jp']
-            en = row['en']
-            weekly_data[week] = {'jp': jp, 'en': en}
-    return weekly_data
+    weekly_data = get_label_catalog().weekly_data
+    return {week: dict(row) for week, row in weekly_data.items()}
 
 def get_csv_preview_labels():
     """preview_labels.csvからラベル辞書を読み込む。
     戻り値: {'ja': {key: value, ...}, 'en': {key: value, ...}}"""
-    labels = {'ja': {}, 'en': {}}
-    try:
-        with open('static/csv/preview_labels.csv', newline='', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                key = row['key'].strip()
-                labels['ja'][key] = row.get('ja', '')
-                labels['en'][key] = row.get('en', '')
-    except (FileNotFoundError, KeyError):
-        pass
-    return labels
+    labels = get_label_catalog().preview_labels
+    return {lang: dict(values) for lang, values in labels.items()}
 
 def get_room_type_times(request):
     """POSTからroom_type_time_S, room_type_time_T等を抽出 → {'S': 24, 'T': 28}を返す。
@@ -129,8 +116,8 @@ def catch_post(request):
     duvet_rooms = request.POST.getlist("duvet")
     soto_ame_rooms = request.POST.getlist("soto_ame")
 
-    room_info_data, times_by_time_data, master_key_data = read_csv()
-    single_rooms, twin_rooms = dist_room(room_info_data)
+    master = get_master_data()
+    single_rooms, twin_rooms = list(master.single_rooms), list(master.twin_rooms)
     return date, single_time, twin_time, bath_time, room_inputs, bath_person, remarks, house_data, eco_rooms, ame_rooms, duvet_rooms, single_rooms, twin_rooms, editor_name, contacts, spots, soto_ame_rooms
 
 def get_cover(request):
@@ -199,176 +186,137 @@ def weekly_cleaning(date):
     week = date.strftime('%A')
     return week
     
-def calc_room(room_inputs, eco_rooms, duvet_rooms, ame_rooms, remarks, person, single_rooms, twin_rooms, multiple_rooms, outins, spots, lang, rooms_by_type=None, soto_ame_rooms=None):
-    if soto_ame_rooms is None:
-        soto_ame_rooms = []
-    #ルームナンバーのリストを作成
-    room_nums = []
+class RoomIndex:
+    """
+    calc_room 用の部屋属性の索引（1リクエストで1度だけ作る）。
+    エコ・アメ・デュべ等の判定、部屋タイプ、備考・スポットの対象部屋を部屋番号から直接引けるようにする
+    """
+
+    def __init__(self, eco_rooms, duvet_rooms, ame_rooms, remarks, single_rooms, twin_rooms, multiple_rooms, outins, spots, rooms_by_type=None, soto_ame_rooms=None):
+        self.eco = set(eco_rooms)
+        self.ame = set(ame_rooms)
+        self.soto_ame = set(soto_ame_rooms or [])
+        self.duvet = set(duvet_rooms)
+        self.multiple = set(multiple_rooms or [])
+        self.outins = set(outins or [])
+        # 連泊扱い（連泊部屋に加えエコ・アメ・外アメ・デュべ）
+        self.stay_over = self.multiple | self.eco | self.ame | self.soto_ame | self.duvet
+
+        # 部屋タイプ（rooms_by_type があれば先に見つかったタイプを優先）
+        self.room_types = {}
+        if rooms_by_type:
+            for code, room_list in rooms_by_type.items():
+                for room in room_list:
+                    self.room_types.setdefault(room, code)
+        else:
+            for room in twin_rooms:
+                self.room_types[room] = 'T'
+            for room in single_rooms:
+                self.room_types[room] = 'S'
+
+        # 備考・スポットは「部屋番号が room 欄の部分文字列」で対象になるため、部分文字列ごとに索引する
+        self.has_remarks = len(remarks) != 0
+        self.remarks = _substring_index((remark['room'], remark['comment']) for remark in remarks)
+        self.first_remark_rooms = _substrings(remarks[0]['room']) if remarks else set()
+        self.spots = _substring_index((spot['room'], spot['content']) for spot in spots)
+
+
+def _substrings(text):
+    return {text[i:j] for i in range(len(text)) for j in range(i + 1, len(text) + 1)}
+
+
+def _substring_index(items):
+    """[(room 欄, 値), ...] → {部分文字列: [値, ...]}（元の順序を保つ）"""
+    index = {}
+    for room_field, value in items:
+        for key in _substrings(room_field):
+            index.setdefault(key, []).append(value)
+    return index
+
+
+def _remark_marker(lang, eco, ame, soto_ame):
+    """備考の先頭に付ける清掃区分（外アメ・エコ外・エコ）"""
+    if soto_ame:
+        return 'Outside-Amenity' if lang == 'en' else '外アメ'
+    if eco and ame:
+        return 'Eco-Outside' if lang == 'en' else 'エコ外'
+    if eco:
+        return 'Eco' if lang == 'en' else 'エコ'
+    return None
+
+
+def bucket_rooms_by_person(room_inputs):
+    """room_inputs を1度だけ走査し、入力値（パーソン番号）→ 部屋番号リスト（入力順）にまとめる"""
+    buckets = {}
     for key, value in room_inputs.items():
-        if str(person) in value:
-            value_str = str(value)
-            person_str = str(person)
-            if len(person_str) == len(value_str):
-                room_nums.append(key)
-    #ルームナンバーのリストをソート
+        buckets.setdefault(str(value), []).append(key)
+    return buckets
+
+
+def _translated(lang, text, translations=None):
+    """先にまとめて訳した結果（translate_all）があればそれを使う"""
+    if translations is not None and text in translations:
+        return translations[text]
+    return language(None, lang, text)
+
+def calc_room(room_inputs, eco_rooms, duvet_rooms, ame_rooms, remarks, person, single_rooms, twin_rooms, multiple_rooms, outins, spots, lang, rooms_by_type=None, soto_ame_rooms=None, index=None, buckets=None, translations=None):
+    if index is None:
+        index = RoomIndex(eco_rooms, duvet_rooms, ame_rooms, remarks, single_rooms, twin_rooms, multiple_rooms, outins, spots, rooms_by_type=rooms_by_type, soto_ame_rooms=soto_ame_rooms)
+    if buckets is None:
+        buckets = bucket_rooms_by_person(room_inputs)
+    #担当パーソンの部屋番号（番号順）
+    room_nums = sorted(buckets.get(str(person), []), key=lambda x: int(x))
     manage_rooms = []
-    room_nums.sort(key=lambda x: int(x))
     floor = []
     for room_num in room_nums:
-        eco = False
-        duvet = False
-        ame = False
-        soto_ame = False
-        remark_comment = ''
-        #eco_roomsのリストを作成
-        if room_num in eco_rooms:
-            eco = True
-        #ame_roomsのリスト作成
-        if room_num in ame_rooms:
-            ame = True
-        #soto_ame_roomsのリスト作成
-        if room_num in soto_ame_rooms:
-            soto_ame = True
-        #duvet_roomsのリストを作成
-        if room_num in duvet_rooms:
-            duvet = True
+        eco = room_num in index.eco
+        ame = room_num in index.ame
+        soto_ame = room_num in index.soto_ame
+        duvet = room_num in index.duvet
         #外アメの場合はエコ欄にマークをつけない
         if soto_ame:
             eco = False
-        #remarksのリストを作成
-        if lang == 'en':
-            if len(remarks) == 0:
-                if soto_ame == True:
-                    if 'Outside-Amenity' not in remark_comment:
-                        remark_comment = 'Outside-Amenity　' + remark_comment
-                elif eco == True and ame == True:
-                    if 'Eco-Outside' not in remark_comment:
-                        remark_comment = 'Eco-Outside　' + remark_comment
-                elif eco == True:
-                    if 'Eco' not in remark_comment:
-                        remark_comment = 'Eco　' + remark_comment
 
+        #備考: 1件目の備考の後に清掃区分を先頭へ付け、以降の該当備考は後ろへ連結する
+        comments = index.remarks.get(room_num, [])
+        if lang == 'en':
+            comments = [_translated(lang, comment, translations) for comment in comments]
+        remark_comment = ''
+        if index.has_remarks and room_num in index.first_remark_rooms:
+            remark_comment = comments[0]
+            comments = comments[1:]
+        marker = _remark_marker(lang, eco, ame, soto_ame)
+        if marker is not None and marker not in remark_comment:
+            remark_comment = marker + '　' + remark_comment
+        for comment in comments:
+            if len(remark_comment) != 0:
+                remark_comment = remark_comment + '　' + comment
             else:
-                for remark in remarks:
-                    if room_num in remark['room']:
-                        remark_tran = language(None, lang , remark['comment'])
-                        if len(remark_comment) != 0:
-                            remark_comment = remark_comment + '　' + remark_tran
-                        else:
-                            remark_comment = remark_tran
-                        if soto_ame == True:
-                            if 'Outside-Amenity' not in remark_comment:
-                                remark_comment = 'Outside-Amenity　' + remark_comment
-                        elif eco == True and ame == True:
-                            if 'Eco-Outside' not in remark_comment:
-                                remark_comment = 'Eco-Outside　' + remark_comment
-                        elif eco == True:
-                            if 'Eco' not in remark_comment:
-                                remark_comment = 'Eco　' + remark_comment
-                    else:
-                        if soto_ame == True:
-                            if 'Outside-Amenity' not in remark_comment:
-                                remark_comment = 'Outside-Amenity　' + remark_comment
-                        elif eco == True and ame == True:
-                            if 'Eco-Outside' not in remark_comment:
-                                remark_comment = 'Eco-Outside　' + remark_comment
-                        elif eco == True:
-                            if 'Eco' not in remark_comment:
-                                remark_comment = 'Eco　' + remark_comment
-
-        else:
-            if len(remarks) == 0:
-                if soto_ame == True:
-                    if '外アメ' not in remark_comment:
-                        remark_comment = '外アメ　' + remark_comment
-                elif eco == True and ame == True:
-                    if 'エコ外' not in remark_comment:
-                        remark_comment = 'エコ外　' + remark_comment
-                elif eco == True:
-                    if 'エコ' not in remark_comment:
-                        remark_comment = 'エコ　' + remark_comment
+                remark_comment = comment
 
-            else:
-                for remark in remarks:
-                    if room_num in remark['room']:
-                        if len(remark_comment) != 0:
-                            remark_comment = remark_comment + '　' + remark['comment']
-                        else:
-                            remark_comment = remark['comment']
-                        if soto_ame == True:
-                            if '外アメ' not in remark_comment:
-                                remark_comment = '外アメ　' + remark_comment
-                        elif eco == True and ame == True:
-                            if 'エコ外' not in remark_comment:
-                                remark_comment = 'エコ外　' + remark_comment
-                        elif eco == True:
-                            if 'エコ' not in remark_comment:
-                                remark_comment = 'エコ　' + remark_comment
-                    else:
-                        if soto_ame == True:
-                            if '外アメ' not in remark_comment:
-                                remark_comment = '外アメ　' + remark_comment
-                        elif eco == True and ame == True:
-                            if 'エコ外' not in remark_comment:
-                                remark_comment = 'エコ外　' + remark_comment
-                        elif eco == True:
-                            if 'エコ' not in remark_comment:
-                                remark_comment = 'エコ　' + remark_comment
-            
         #スポットのリストを作成
         spot_comment = ''
-        if len(spots) != 0:
-            for spot in spots:
-                if lang == 'en':
-                    if room_num in spot['room']:
-                        if len(remark_comment) != 0:
-                            remark_comment = remark_comment + '　' + language(None,lang, spot['content'])
-                            spot_comment = language(None,lang, spot['content'])
-                        else:
-                            remark_comment = language(None,lang, spot['content'])
-                            spot_comment = language(None,lang, spot['content'])
-                else:
-                    if room_num in spot['room']:
-                        if len(remark_comment) != 0:
-                            remark_comment = remark_comment + '　' + spot['content']
-                            spot_comment = spot['content']
-                        else:
-                            remark_comment = spot['content']
-                            spot_comment = spot['content']
-        
-        
+        for content in index.spots.get(room_num, []):
+            if lang == 'en':
+                content = _translated(lang, content, translations)
+            if len(remark_comment) != 0:
+                remark_comment = remark_comment + '　' + content
+            else:
+                remark_comment = content
+            spot_comment = content
+
         #部屋タイプ
-        room_type = 'E'
-        if rooms_by_type:
-            for code, room_list in rooms_by_type.items():
-                if room_num in room_list:
-                    room_type = code
-                    break
-        else:
-            if room_num in single_rooms:
-                room_type = 'S'
-            elif room_num in twin_rooms:
-                room_type = 'T'
-        
+        room_type = index.room_types.get(room_num, 'E')
+
         #フロア
         if len(room_num) <= 3:
             floor.append(int(room_num[0]))
         else:
             floor.append(int(room_num[:2]))
-            
-        #連泊部屋の処理
-        if multiple_rooms and room_num in multiple_rooms:
-            multiple = True
-        else:
-            if room_num in eco_rooms or room_num in ame_rooms or room_num in soto_ame_rooms or room_num in duvet_rooms:
-                multiple = True
-            else:
-                multiple = False
-                
-        #アウトイン部屋の連泊処理
-        if outins and room_num in outins:
-            multiple = True
-        
+
+        #連泊部屋の処理（アウトイン部屋も連泊扱い）
+        multiple = room_num in index.stay_over or room_num in index.outins
+
         room_info = {
             'room_num': room_num,
             'eco': eco,
@@ -696,69 +644,166 @@ def multiple_night_cleans(request):
     cleans = [clean.strip() for clean in cleans if clean.strip() != ""]
     return cleans
 
+def _googletrans_ja_to_en(text):
+    # 重要: 4.0.0-rc1 を使用し、service_urls を指定
+    from googletrans import Translator  # type: ignore
+    translator = Translator(
+        service_urls=[
+            "translate.google.co.jp", 
+            "translate.google.com",
+        ]
+    )
+    result = translator.translate(text, src="ja", dest="en")
+    if isinstance(result.text, str) and result.text.strip():
+        return result.text
+    return None
+
+def _deep_translator_ja_to_en(text):
+    return GoogleTranslator(source="ja", target="en").translate(text)
+
+def _cloud_ja_to_en(text):
+    client = gct.Client()
+    res = client.translate(text, source_language="ja", target_language="en")
+    tr = res.get("translatedText")
+    if isinstance(tr, str):
+        return tr
+    return None
+
+# 翻訳エンジン（上から順に試す）
+TRANSLATION_BACKENDS = [
+    ('googletrans', _googletrans_ja_to_en),
+    ('deep_translator', _deep_translator_ja_to_en),
+    ('cloud', _cloud_ja_to_en),
+]
+
 def google_translate_ja_to_en(text: Optional[str]) -> str:
     if not text:
         return ""
-    try:
-        # 重要: 4.0.0-rc1 を使用し、service_urls を指定
-        from googletrans import Translator  # type: ignore
-        translator = Translator(
-            service_urls=[
-                "translate.google.co.jp", 
-                "translate.google.com",
-            ]
-        )
-        result = translator.translate(text, src="ja", dest="en")
-        if isinstance(result.text, str) and result.text.strip():
-            return result.text
-    except Exception:
-        pass
-
-    try:
-        return GoogleTranslator(source="ja", target="en").translate(text)
-    except Exception:
-        pass
-
-    try:
-        client = gct.Client()
-        res = client.translate(text, source_language="ja", target_language="en")
-        tr = res.get("translatedText")
-        if isinstance(tr, str):
-            return tr
-    except Exception:
-        pass
+    #用語集で訳せる部分はネットワークを使わず、残りだけオンラインで訳す
+    return get_label_catalog().glossary.translate(text, online=_translate_online)
+
+def _translate_online(text):
+    memory = get_default_memory()
+    cached = memory.lookup(text, "ja", "en")
+    if cached is not None:
+        return cached
+
+    breaker = get_default_breaker()
+    for backend, func in TRANSLATION_BACKENDS:
+        #失敗が続いているエンジンは待ち時間が過ぎるまで飛ばす
+        if not breaker.allow(backend):
+            continue
+        try:
+            res = func(text)
+        except Exception:
+            breaker.failure(backend)
+            continue
+        breaker.success(backend)
+        if res is not None:
+            memory.store(text, "ja", "en", backend, res)
+            return res
     return text
 
 def google_trancelate(text: Optional[str]) -> str:
     return google_translate_ja_to_en(text)
 
-def translate(text):
-    #インターネット接続を確認
+TRANSLATION_PROBE = 'connectivity'
+
+def _translation_reachable():
+    #インターネット接続を確認（結果は共有のブレーカーで使い回す）
+    breaker = get_default_breaker()
+    if breaker.recently_ok(TRANSLATION_PROBE):
+        return True
+    if not breaker.allow(TRANSLATION_PROBE):
+        # 失敗後の待ち時間中は確認せずにオフライン扱い
+        return False
     try:
         # タイムアウト3秒でGoogle翻訳サイトにアクセスしてみる
-        response = requests.get("https://translate.google.com/", timeout=3)
-        if response.status_code == 200:
-            res = google_trancelate(text)
-        else:
-            res = text
+        url = getattr(settings, 'TRANSLATION_PROBE_URL', "https://translate.google.com/")
+        response = requests.get(url, timeout=3)
+        reachable = response.status_code == 200
     except requests.RequestException:
         # 接続エラーやタイムアウト時はこちらへ
-        res = text
+        reachable = False
+    if reachable:
+        breaker.success(TRANSLATION_PROBE)
+    else:
+        breaker.failure(TRANSLATION_PROBE)
+    return reachable
+
+def translate(text):
+    #用語集だけで訳せるもの・翻訳メモリにあるものは接続確認も不要
+    glossary = get_label_catalog().glossary
+    if glossary.covers(text):
+        return glossary.translate(text)
+    cached = get_default_memory().lookup(text, "ja", "en") if text else None
+    if cached is not None:
+        return cached
+    if _translation_reachable():
+        res = google_trancelate(text)
+    else:
+        #オフラインでも用語集にある部分は訳す
+        res = glossary.translate(text)
     return res
 
-def language(str_id, lang_id, text):
-    weekly_data = get_csv_weekly()
-    labels = get_csv_preview_labels()
+def translate_all(texts, deadline=None, max_workers=None):
+    """
+    印刷1回分の文字列をまとめて英訳し {原文: 訳文} を返す。
+    重複・空文字は除き、用語集・翻訳メモリで訳せないものだけ接続確認1回のあとスレッドで並行に訳す。
+    deadline 秒（全体）までに訳せなかったものは用語集の分だけ訳す（訳は後から翻訳メモリに入る）
+    """
+    if deadline is None:
+        deadline = getattr(settings, 'TRANSLATION_DEADLINE', 10)
+    if max_workers is None:
+        max_workers = getattr(settings, 'TRANSLATION_WORKERS', 8)
+    memory = get_default_memory()
+    glossary = get_label_catalog().glossary
+    results = {}
+    pending = []
+    for text in dict.fromkeys(t for t in texts if t):
+        if glossary.covers(text):
+            results[text] = glossary.translate(text)
+            continue
+        cached = memory.lookup(text, "ja", "en")
+        if cached is not None:
+            results[text] = cached
+        else:
+            pending.append(text)
+    if not pending:
+        return results
+    if not _translation_reachable():
+        results.update((text, glossary.translate(text)) for text in pending)
+        return results
 
-    # weekly.csvのデータをラベル辞書にマージ
-    for day in ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']:
-        if day in weekly_data:
-            labels['ja'][day] = weekly_data[day]['jp']
-            labels['en'][day] = weekly_data[day]['en']
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pending))), thread_name_prefix='translate')
+    futures = {executor.submit(google_trancelate, text): text for text in pending}
+    done, _ = wait(futures, timeout=deadline)
+    # 期限切れの分は待たない（実行中のものは終わり次第翻訳メモリに入る）
+    executor.shutdown(wait=False, cancel_futures=True)
+    for future, text in futures.items():
+        if future in done and future.exception() is None:
+            results[text] = future.result()
+        else:
+            results[text] = glossary.translate(text)
+    return results
+
+def translation_texts(persons, contacts, index, buckets):
+    """英語ページのパーソンが使う翻訳対象（備考・スポット・連絡事項）を重複なしで集める"""
+    texts = []
+    for person in persons:
+        for room_num in buckets.get(str(person), []):
+            texts.extend(index.remarks.get(room_num, []))
+            texts.extend(index.spots.get(room_num, []))
+        for item in contacts:
+            if item['person_number'] == str(person):
+                texts.append(item['contact'])
+                break
+    return list(dict.fromkeys(t for t in texts if t))
 
+def language(str_id, lang_id, text):
+    labels = get_label_catalog().labels
     if str_id is not None and lang_id in labels:
         return labels[lang_id].get(str_id, str_id)
     else:
         res = translate(text)
         return res
-
@@ -0,0 +1,190 @@
+"""
+Sidewind ベンチマーク
+- static/csv/room_info.csv の実際の部屋構成、または合成した大規模物件（500室・2000室など）から1日分の入力を生成
+- 稼働率・エコ/エコ外の比率・ツイン指定・大浴場担当を変えたケースごとに assign_rooms_with_stats を計測
+- レイテンシのパーセンタイル・試行数/秒・ピークメモリ・evaluate_solution のスコアを JSON レポートにまとめる
+"""
+
+import csv
+import datetime
+import math
+import platform
+import random
+import time
+import tracemalloc
+
+import numpy as np
+
+from .sidewind_core import assign_rooms_with_stats
+
+
+# 1人あたりの通常部屋数の目安（HK人数の決定に使う）
+ROOMS_PER_HK = 12
+# 合成物件の1フロアあたりの部屋数
+SYNTHETIC_ROOMS_PER_FLOOR = 20
+# 合成物件のツイン比率
+SYNTHETIC_TWIN_RATIO = 0.35
+
+# 清掃時間（分）。割り当て結果には影響しないが assign_rooms の引数として渡す
+SINGLE_TIME, TWIN_TIME, ECO_TIME, BATH_TIME = 24, 28, 5, 50
+
+
+def load_room_info(path):
+    """room_info.csv から (全部屋, ツイン部屋) を読む"""
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        rows = list(csv.reader(f))[1:]
+    all_rooms = [int(row[0]) for row in rows if row]
+    twin_rooms = [int(row[0]) for row in rows if row and row[1] == 'T']
+    return all_rooms, twin_rooms
+
+
+def synthetic_property(n_rooms, rooms_per_floor=SYNTHETIC_ROOMS_PER_FLOOR, twin_ratio=SYNTHETIC_TWIN_RATIO, seed=0):
+    """2Fから順に rooms_per_floor 室ずつ並べた n_rooms 室の物件を作る"""
+    rng = random.Random(seed)
+    all_rooms = [(2 + i // rooms_per_floor) * 100 + i % rooms_per_floor + 1 for i in range(n_rooms)]
+    twin_rooms = sorted(rng.sample(all_rooms, int(n_rooms * twin_ratio)))
+    return all_rooms, twin_rooms
+
+
+def make_day(all_rooms, twin_rooms, seed, occupancy, eco_ratio, eco_out_ratio, twin_quota_hks=0, bath_staff=0):
+    """
+    1日分の assign_rooms の引数を作る
+
+    Parameters
+    ----------
+    occupancy : float
+        清掃対象になる部屋の割合（0〜1）
+    eco_ratio, eco_out_ratio : float
+        清掃対象のうちエコ・エコ外にする割合
+    twin_quota_hks : int
+        ツイン数を指定するHKの人数（残りは自動配分）
+    bath_staff : int
+        大浴場担当の人数
+    """
+    rng = random.Random(seed)
+    selected = sorted(rng.sample(all_rooms, max(1, int(len(all_rooms) * occupancy))))
+    eco_rooms = sorted(rng.sample(selected, int(len(selected) * eco_ratio)))
+    rest = [r for r in selected if r not in set(eco_rooms)]
+    eco_out_rooms = sorted(rng.sample(rest, int(len(selected) * eco_out_ratio)))
+    normal = [r for r in rest if r not in set(eco_out_rooms)]
+
+    n_hk = max(1, math.ceil(len(normal) / ROOMS_PER_HK))
+    base, extra = divmod(len(normal), n_hk)
+    housekeepers = [
+        {'id': i + 1, 'room_quota': base + (1 if i < extra else 0), 'twin_quota': -1, 'has_bath': i < bath_staff}
+        for i in range(n_hk)
+    ]
+
+    # ツイン指定は平均的な本数で、全体のツイン数を超えない範囲で付ける
+    twin_set = set(twin_rooms)
+    normal_twins = sum(1 for r in normal if r in twin_set)
+    per_hk = normal_twins // n_hk
+    for hk in housekeepers[-twin_quota_hks:] if twin_quota_hks else []:
+        hk['twin_quota'] = per_hk
+
+    return {
+        'rooms': {r: None for r in normal},
+        'eco_rooms': eco_rooms,
+        'eco_out_rooms': eco_out_rooms,
+        'twin_rooms': list(twin_rooms),
+        'bath_rooms': [],
+        'housekeepers': housekeepers,
+        'single_time': SINGLE_TIME,
+        'twin_time': TWIN_TIME,
+        'eco_time': ECO_TIME,
+        'bath_time': BATH_TIME,
+    }
+
+
+def default_cases(room_info_path):
+    """
+    標準のケース一覧 [(名前, 物件, 日の設定), ...]
+    物件は (全部屋, ツイン部屋)、日の設定は make_day のキーワード引数
+    """
+    hotel = load_room_info(room_info_path)
+    cases = []
+    for occupancy in (0.3, 0.5, 0.7, 0.85, 1.0):
+        for eco_ratio, eco_out_ratio in ((0.0, 0.0), (0.15, 0.03), (0.3, 0.05)):
+            cases.append((
+                f'hotel_occ{int(occupancy * 100)}_eco{int(eco_ratio * 100)}',
+                hotel,
+                {'occupancy': occupancy, 'eco_ratio': eco_ratio, 'eco_out_ratio': eco_out_ratio,
+                 'twin_quota_hks': 0, 'bath_staff': 0},
+            ))
+    cases.append(('hotel_occ85_twin_quota', hotel,
+                  {'occupancy': 0.85, 'eco_ratio': 0.15, 'eco_out_ratio': 0.03, 'twin_quota_hks': 3, 'bath_staff': 0}))
+    cases.append(('hotel_occ85_bath', hotel,
+                  {'occupancy': 0.85, 'eco_ratio': 0.15, 'eco_out_ratio': 0.03, 'twin_quota_hks': 0, 'bath_staff': 2}))
+    for n_rooms in (500, 2000):
+        cases.append((f'synthetic_{n_rooms}', synthetic_property(n_rooms),
+                      {'occupancy': 0.8, 'eco_ratio': 0.15, 'eco_out_ratio': 0.03, 'twin_quota_hks': 0, 'bath_staff': 2}))
+    return cases
+
+
+def run_case(name, prop, day_options, repeats=5, seed=0, **options):
+    """
+    1ケースを repeats 日分（日ごとに別シード）計測して集計を返す。
+    ピークメモリは計測誤差を避けるため、tracemalloc を有効にした別の1回で測る
+    """
+    all_rooms, twin_rooms = prop
+    latencies = []
+    attempts = 0
+    scores = []
+    errors = []
+    for i in range(repeats):
+        day = make_day(all_rooms, twin_rooms, seed + i, **day_options)
+        started = time.perf_counter()
+        _, stats = assign_rooms_with_stats(**day, **options)
+        latencies.append(time.perf_counter() - started)
+        attempts += stats['attempts']
+        scores.append(stats['best_score'])
+        errors.append(stats['best_errors'])
+
+    day = make_day(all_rooms, twin_rooms, seed, **day_options)
+    tracemalloc.start()
+    try:
+        assign_rooms_with_stats(**day, **options)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    latency = np.array(latencies)
+    return {
+        'name': name,
+        'rooms': len(day['rooms']) + len(day['eco_rooms']) + len(day['eco_out_rooms']),
+        'housekeepers': len(day['housekeepers']),
+        'day_options': day_options,
+        'repeats': repeats,
+        'latency': {
+            'p50': float(np.percentile(latency, 50)),
+            'p90': float(np.percentile(latency, 90)),
+            'p99': float(np.percentile(latency, 99)),
+            'max': float(latency.max()),
+            'mean': float(latency.mean()),
+        },
+        'attempts_per_sec': attempts / float(latency.sum()) if latency.sum() > 0 else None,
+        'peak_memory_bytes': peak,
+        'score': {'mean': float(np.mean(scores)), 'min': min(scores), 'max': max(scores)},
+        'errors': {'mean': float(np.mean(errors)), 'max': max(errors)},
+    }
+
+
+def run_benchmark(cases, repeats=5, seed=0, log=None, **options):
+    """全ケースを計測してレポート（JSON化できる dict）を返す。options は assign_rooms_with_stats に渡す"""
+    results = []
+    for name, prop, day_options in cases:
+        result = run_case(name, prop, day_options, repeats=repeats, seed=seed, **options)
+        results.append(result)
+        if log is not None:
+            log(f"{name}: p50={result['latency']['p50']:.3f}s p90={result['latency']['p90']:.3f}s "
+                f"score={result['score']['mean']:.0f} errors={result['errors']['mean']:.1f}")
+    return {
+        'created_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'repeats': repeats,
+        'seed': seed,
+        'options': options,
+        'cases': results,
+    }
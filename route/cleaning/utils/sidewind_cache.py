@@ -0,0 +1,181 @@
+"""
+Sidewind 割り当て結果キャッシュ
+- 入力（部屋・エコ・エコ外・ツイン・ハウスキーパー設定・探索オプション）を正規化したハッシュをキーにする
+- メモリ上のLRUと、任意でディスク（MEDIA_ROOT 配下）の2段構成
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from .sidewind_core import assign_rooms_with_stats
+
+
+# アルゴリズムを変更して結果が変わる場合は上げる（古いディスクキャッシュを無効化）
+CACHE_VERSION = 4
+# キャッシュしてよい終了理由（試行をすべて実行 / target_score・stop_on_zero_errors は入力とキーで決まる）
+COMPLETED_STOPS = ('exhausted', 'target')
+# キャッシュしてよい厳密解の状態（None は engine='heuristic'。'feasible' / 'unknown' は制限時間次第で変わる）
+COMPLETED_EXACT_STATUSES = (None, 'optimal', 'unavailable')
+# ディスクに残すキャッシュファイル数の上限
+MAX_DISK_ENTRIES = 200
+
+
+# 結果に影響しないオプション（ワーカー数・進捗コールバック・中断フラグ・キャッシュ指定・計測）
+NON_RESULT_OPTIONS = ('workers', 'on_progress', 'cancel', 'cache', 'profile')
+
+
+def result_options(options):
+    """キャッシュキー・ジョブIDに使う、結果に影響するオプションだけを返す"""
+    return {k: v for k, v in options.items() if k not in NON_RESULT_OPTIONS}
+
+
+def make_cache_key(rooms, eco_rooms, eco_out_rooms, twin_rooms, housekeepers, **options):
+    """入力を正規化して SHA-256 のキーを返す（並び順や重複の違いは同一視）"""
+    normalized = {
+        'version': CACHE_VERSION,
+        'rooms': sorted(set(int(r) for r in rooms)),
+        'eco_rooms': sorted(set(int(r) for r in eco_rooms)),
+        'eco_out_rooms': sorted(set(int(r) for r in eco_out_rooms)),
+        'twin_rooms': sorted(set(int(r) for r in twin_rooms)),
+        'housekeepers': [
+            [hk['id'], hk['room_quota'], hk.get('twin_quota', -1), bool(hk.get('has_bath', False))]
+            for hk in sorted(housekeepers, key=lambda h: h['id'])
+        ],
+        'options': sorted(options.items()),
+    }
+    payload = json.dumps(normalized, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class AllocationCache:
+    """LRU（メモリ）+ 任意のディスク層を持つ割り当て結果キャッシュ"""
+
+    def __init__(self, max_entries=32, cache_dir=None):
+        self.max_entries = max_entries
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """(allocation, stats, 層名) を返す。見つからなければ None"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                allocation, stats = self._entries[key]
+                return dict(allocation), dict(stats), 'memory'
+
+        loaded = self._load_from_disk(key)
+        if loaded is None:
+            return None
+        allocation, stats = loaded
+        self._remember(key, allocation, stats)
+        return dict(allocation), dict(stats), 'disk'
+
+    def put(self, key, allocation, stats):
+        self._remember(key, allocation, stats)
+        self._save_to_disk(key, allocation, stats)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _remember(self, key, allocation, stats):
+        with self._lock:
+            self._entries[key] = (dict(allocation), dict(stats))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _path(self, key):
+        return self.cache_dir / f'{key}.json'
+
+    def _load_from_disk(self, key):
+        if self.cache_dir is None:
+            return None
+        path = self._path(key)
+        if not path.exists():
+            return None
+        try:
+            with path.open('r', encoding='utf-8') as f:
+                data = json.load(f)
+            allocation = {int(room): hk for room, hk in data['allocation'].items()}
+            return allocation, data.get('stats', {})
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _save_to_disk(self, key, allocation, stats):
+        if self.cache_dir is None:
+            return
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = self._path(key).with_suffix('.tmp')
+            with tmp_path.open('w', encoding='utf-8') as f:
+                json.dump({'allocation': {str(r): hk for r, hk in allocation.items()}, 'stats': stats},
+                          f, ensure_ascii=False, default=str)
+            tmp_path.replace(self._path(key))
+            self._prune_disk()
+        except OSError:
+            pass  # ディスクに書けなくてもメモリ層は有効
+
+    def _prune_disk(self):
+        files = sorted(self.cache_dir.glob('*.json'), key=lambda p: p.stat().st_mtime, reverse=True)
+        for path in files[MAX_DISK_ENTRIES:]:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache():
+    """settings（SIDEWIND_CACHE_SIZE / SIDEWIND_CACHE_DIR）から共有キャッシュを1度だけ作る"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            from django.conf import settings
+            _default_cache = AllocationCache(
+                max_entries=getattr(settings, 'SIDEWIND_CACHE_SIZE', 32),
+                cache_dir=getattr(settings, 'SIDEWIND_CACHE_DIR', None),
+            )
+        return _default_cache
+
+
+def assign_rooms_cached(rooms, eco_rooms, eco_out_rooms, twin_rooms, bath_rooms, housekeepers,
+                        single_time, twin_time, eco_time, bath_time, cache=None, **options):
+    """
+    assign_rooms_with_stats のキャッシュ付き版。戻り値は (allocation, stats)。
+    stats['cache'] に 'memory' / 'disk' / 'miss'（profile=True の場合は 'bypass'）を記録する。
+    cancel・time_limit・exact_time_limit で打ち切った結果はキャッシュしない
+    """
+    if options.get('profile'):
+        # 計測はその場の実行が対象のためキャッシュしない
+        allocation, stats = assign_rooms_with_stats(
+            rooms, eco_rooms, eco_out_rooms, twin_rooms, bath_rooms, housekeepers,
+            single_time, twin_time, eco_time, bath_time, **options
+        )
+        return allocation, dict(stats, cache='bypass')
+
+    cache = cache if cache is not None else get_default_cache()
+    key = make_cache_key(rooms, eco_rooms, eco_out_rooms, twin_rooms, housekeepers, **result_options(options))
+
+    cached = cache.get(key)
+    if cached is not None:
+        allocation, stats, tier = cached
+        stats['cache'] = tier
+        return allocation, stats
+
+    allocation, stats = assign_rooms_with_stats(
+        rooms, eco_rooms, eco_out_rooms, twin_rooms, bath_rooms, housekeepers,
+        single_time, twin_time, eco_time, bath_time, **options
+    )
+    if stats['stopped_by'] in COMPLETED_STOPS and stats.get('exact_status') in COMPLETED_EXACT_STATUSES:
+        # 途中で採用（中断）・時間切れ（厳密解の制限時間を含む）の結果は同じ入力の次回実行に使わない
+        cache.put(key, allocation, stats)
+    stats = dict(stats, cache='miss')
+    return allocation, stats
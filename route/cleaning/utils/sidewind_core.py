@@ -4,9 +4,31 @@
 - 3フロアは最小限（やむを得ない場合のみ、3フロア目はエコのみ）
 """
 
-from collections import defaultdict
-from typing import Dict, List, Set, Any
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+import json
+import logging
+import math
 import random
+import time
+
+import numpy as np
+
+from .sidewind_flow import rebalance_units
+
+
+logger = logging.getLogger('django')
+
+
+ATTEMPTS = 200
+# 並列実行時に1ラウンドで各ワーカーへ渡す戦略数（ラウンド間で打ち切り判定）
+PARALLEL_ROUND_SIZE = 5
+# 一括評価する候補数
+SCORING_BATCH_SIZE = 20
+# reassign_rooms で改善移動を探す最大ラウンド数
+REPAIR_ROUNDS = 20
 
 
 def assign_rooms(
@@ -19,34 +41,346 @@ def assign_rooms(
     single_time: int,
     twin_time: int,
     eco_time: int,
-    bath_time: int
+    bath_time: int,
+    workers: int = 1,
+    engine: str = 'heuristic',
+    seed: Optional[int] = None,
+    profile: bool = False
 ) -> Dict[int, int]:
-    allocator = _RoomAllocator(
+    """
+    割り当て { room: HK番号 } だけを返す。
+    profile=True の場合はフェーズ別計測を 'django' ロガーへ出力する（計測値の dict が必要なら
+    assign_rooms_with_stats の stats['profile'] を使う）
+    """
+    result, _ = assign_rooms_with_stats(
+        rooms, eco_rooms, eco_out_rooms, twin_rooms, bath_rooms, housekeepers,
+        single_time, twin_time, eco_time, bath_time, workers=workers, engine=engine, seed=seed, profile=profile
+    )
+    return result
+
+
+def assign_rooms_with_stats(
+    rooms: Dict[int, Any],
+    eco_rooms: List[int],
+    eco_out_rooms: List[int],
+    twin_rooms: List[int],
+    bath_rooms: List[int],
+    housekeepers: List[Dict],
+    single_time: int,
+    twin_time: int,
+    eco_time: int,
+    bath_time: int,
+    workers: int = 1,
+    max_attempts: int = ATTEMPTS,
+    time_limit: Optional[float] = None,
+    target_score: Optional[float] = None,
+    stop_on_zero_errors: bool = False,
+    local_search_iterations: int = 0,
+    engine: str = 'heuristic',
+    exact_time_limit: float = 10.0,
+    seed: Optional[int] = None,
+    profile: bool = False,
+    on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    cancel: Optional[Any] = None
+) -> Tuple[Dict[int, int], Dict[str, Any]]:
+    """
+    予算付きで部屋割り当てを探索し、最良の割り当てと統計を返す。
+    
+    - time_limit: 探索の制限時間（秒）。超過後は新しい試行を始めない（最低1試行は実行）
+    - target_score: このスコア以上の解が見つかった時点で終了
+    - stop_on_zero_errors: evaluate_solution のエラー数が0の解が見つかった時点で終了
+    - local_search_iterations: 最良の貪欲解に対する局所探索（焼きなまし）の反復回数。0なら実行しない
+    - engine: 'heuristic'（既定）または 'exact'。'exact' はヒューリスティックの解をヒントに
+      CP-SAT（sidewind_exact）で exact_time_limit 秒まで解き、スコアの良い方を採用する。
+      ortools が無い・時間内に解が出ない場合はヒューリスティックの解を使う
+    - seed: 乱数の基準シード。未指定なら各試行のシードは戦略番号（従来と同じ結果）
+    - profile: True ならフェーズ別の所要時間・呼び出し回数、試行ごとの内訳、_can_swap / _can_add_floor の
+      評価回数を stats['profile'] に入れ、'django' ロガーへ1行の JSON として出力する
+    - on_progress: 評価バッチ（並列時はラウンド）ごとに {attempts, max_attempts, best_score, best_errors} を渡して呼ぶ。
+      最良解が更新されたバッチでは allocation（{room: HK番号}、最終結果と同じ番号付け）も入る
+    - cancel: is_set() を持つオブジェクト（threading.Event など）。セットされた時点で残りの試行を打ち切り、
+      その時点の最良解を返す（stopped_by='cancelled'。局所探索・厳密解は実行しない）
+    
+    統計: attempts（実行した試行数）, best_attempt, best_score, best_errors, elapsed（秒）, stopped_by, engine,
+          local_search（局所探索を実行した場合のみ: iterations, score_before, score_after）,
+          exact_status（engine='exact' の場合のみ）, seed, best_seed（最良試行のシード。
+          _RoomAllocator.allocate(best_attempt, best_seed) で再現できる）, hk_id_map（[入力HK id, 出力番号] のリスト）
+    """
+    started = time.time()
+    deadline = started + time_limit if time_limit is not None else None
+    allocator_args = (
         list(rooms.keys()),
         eco_rooms,
         eco_out_rooms,
         twin_rooms,
         housekeepers
     )
+    strategies = list(range(max_attempts))
+    stop = (deadline, target_score, stop_on_zero_errors)
+    profiler = _PhaseProfiler() if profile else None
+    if on_progress is not None:
+        on_progress = _renumbering_progress(on_progress, housekeepers)
     
-    best_result = None
-    best_score = float('-inf')
+    outcome = None
+    if workers > 1:
+        try:
+            outcome = _run_parallel(allocator_args, strategies, workers, stop, seed, profiler, on_progress, cancel)
+        except (BrokenProcessPool, OSError):
+            # プロセスを起動できない環境では逐次実行にフォールバック
+            outcome = None
+            profiler = _PhaseProfiler() if profile else None
+    if outcome is None:
+        allocator = _RoomAllocator(*allocator_args)
+        allocator.profiler = profiler
+        outcome = _run_strategies(allocator, strategies, stop, seed, on_progress, cancel)
     
-    for attempt in range(200):
-        hk_to_rooms = allocator.allocate(strategy=attempt)
-        score, errors = allocator.evaluate_solution(hk_to_rooms)
-        
+    best, attempts, stopped_by = outcome
+    best_score, best_attempt, best_result, best_errors = best
+    best_seed = _attempt_seed(seed, best_attempt)
+    stats = {
+        'attempts': attempts,
+        'best_attempt': best_attempt,
+        'seed': seed,
+        'best_seed': best_seed,
+        'best_score': best_score,
+        'best_errors': best_errors,
+        'stopped_by': stopped_by,
+        'engine': 'heuristic',
+    }
+    
+    if local_search_iterations > 0 and stopped_by != 'cancelled':
+        allocator = _RoomAllocator(*allocator_args)
+        phase_started = time.perf_counter()
+        improved, score, errors = allocator.improve(best_result, local_search_iterations, seed=best_seed)
+        if profiler is not None:
+            profiler.add('improve', time.perf_counter() - phase_started)
+        stats['local_search'] = {
+            'iterations': local_search_iterations,
+            'score_before': best_score,
+            'score_after': max(score, best_score),
+        }
         if score > best_score:
-            best_score = score
-            best_result = hk_to_rooms
-        
-        allocator.allocation = {h: [] for h in allocator.hk_ids}
+            best_result = improved
+            stats['best_score'] = score
+            stats['best_errors'] = errors
+    
+    if engine == 'exact' and stopped_by != 'cancelled':
+        from .sidewind_exact import solve_exact
+        allocator = _RoomAllocator(*allocator_args)
+        phase_started = time.perf_counter()
+        exact_result, exact_status = solve_exact(allocator, exact_time_limit, hint=best_result, workers=workers)
+        if profiler is not None:
+            profiler.add('solve_exact', time.perf_counter() - phase_started)
+        stats['exact_status'] = exact_status
+        if exact_result is not None:
+            score, errors = allocator.evaluate_solution(exact_result)
+            if score >= stats['best_score']:
+                best_result = exact_result
+                stats['best_score'] = score
+                stats['best_errors'] = errors
+                stats['engine'] = 'exact'
     
+    stats['elapsed'] = time.time() - started
+    if profiler is not None:
+        stats['profile'] = profiler.as_dict()
+        logger.info('sidewind_profile %s', json.dumps(
+            dict(stats['profile'], elapsed=round(stats['elapsed'], 4), best_attempt=best_attempt),
+            separators=(',', ':')))
+    # 入力HK id → 出力番号 の対応（reassign_rooms で前回の番号を引き継ぐために使う）
+    stats['hk_id_map'] = sorted(_renumber_map(best_result, housekeepers).items())
     result = _renumber_hks(best_result, housekeepers)
-    return result
+    return result, stats
 
 
-def _renumber_hks(hk_to_rooms, housekeepers):
+def reassign_rooms(
+    previous_allocation: Dict[int, Any],
+    added_rooms: List[int],
+    removed_rooms: List[int],
+    changed_housekeepers: List[int],
+    eco_rooms: List[int],
+    eco_out_rooms: List[int],
+    twin_rooms: List[int],
+    housekeepers: List[Dict],
+    repair_rounds: int = REPAIR_ROUNDS
+) -> Tuple[Dict[int, int], Dict[str, Any]]:
+    """
+    前回の割り当てを起点に、変わった部屋・HKの分だけを少ない移動で修復する（全体の再計算はしない）。
+    
+    - previous_allocation: 前回の結果 { room: hk_id }（セッションの allocation。HK番号以外の値は無視）
+    - added_rooms / removed_rooms: 前回から清掃対象に追加・除外された部屋
+    - changed_housekeepers: quota・ツイン指定・大浴場担当が変わったHKの id
+    - eco_rooms / eco_out_rooms / twin_rooms / housekeepers: 変更後の入力。HK id は previous_allocation の番号に合わせる
+    
+    HK番号は振り直さない（配布済みの指示書の番号を維持する）。
+    統計: kept（前回のまま残した部屋数）, placed（新たに配置した部屋数）, moved（前回から担当が変わった部屋数）,
+          score, errors, elapsed
+    """
+    started = time.time()
+    removed = set(int(r) for r in removed_rooms)
+    previous = {
+        int(r): h for r, h in previous_allocation.items()
+        if isinstance(h, int) and not isinstance(h, bool) and int(r) not in removed
+    }
+    eco_set = set(eco_rooms) | set(eco_out_rooms)
+    rooms = (set(previous) | set(int(r) for r in added_rooms) | eco_set) - removed
+    
+    allocator = _RoomAllocator(sorted(rooms - eco_set), eco_rooms, eco_out_rooms, twin_rooms, housekeepers)
+    hk_to_rooms, stats = allocator.repair(previous, changed_housekeepers, repair_rounds)
+    stats['elapsed'] = time.time() - started
+    
+    result = {}
+    for hk_id, hk_rooms in hk_to_rooms.items():
+        for room in hk_rooms:
+            result[room] = hk_id
+    return result, stats
+
+
+def _attempt_seed(base_seed, strategy):
+    """試行ごとの乱数シード（base_seed 未指定なら戦略番号）"""
+    if base_seed is None:
+        return strategy
+    return base_seed * 1000003 + strategy
+
+
+def _run_strategies(allocator, strategies, stop=(None, None, False), base_seed=None, on_progress=None, cancel=None):
+    """
+    各戦略を順に実行し、(best, 実行数, 終了理由) を返す。
+    best は (score, strategy, hk_to_rooms, errors) で、同点は若い戦略を優先する。
+    候補は SCORING_BATCH_SIZE 件ごとに owner 行列へまとめて一括評価する（on_progress もバッチごと）。
+    """
+    deadline, target_score, stop_on_zero_errors = stop
+    best = None
+    attempts = 0
+    for start in range(0, len(strategies), SCORING_BATCH_SIZE):
+        batch = []
+        owners = []
+        interrupted = None
+        for attempt in strategies[start:start + SCORING_BATCH_SIZE]:
+            if best is not None or batch:
+                interrupted = _interrupted(deadline, cancel)
+                if interrupted:
+                    break
+            batch.append((attempt, allocator.allocate(strategy=attempt, seed=_attempt_seed(base_seed, attempt))))
+            owners.append(allocator.owner.copy())
+        if not batch:
+            return best, attempts, interrupted
+        
+        previous = best
+        scores, errors = allocator.evaluate_solution(np.stack(owners))
+        for (attempt, hk_to_rooms), score, error in zip(batch, scores.tolist(), errors.tolist()):
+            # 目標に達した候補より後ろはバッチ内でも試行数に数えない
+            attempts += 1
+            if best is None or _is_better(score, attempt, best):
+                best = (score, attempt, hk_to_rooms, error)
+            if _target_reached(best, target_score, stop_on_zero_errors):
+                _report_progress(on_progress, attempts, len(strategies), best, best is not previous)
+                return best, attempts, 'target'
+        _report_progress(on_progress, attempts, len(strategies), best, best is not previous)
+        
+        if interrupted:
+            return best, attempts, interrupted
+    return best, attempts, 'exhausted'
+
+
+def _is_better(score, attempt, best):
+    best_score, best_attempt = best[0], best[1]
+    return score > best_score or (score == best_score and attempt < best_attempt)
+
+
+def _interrupted(deadline, cancel):
+    """打ち切る理由（'cancelled' / 'time_limit'）。続ける場合は None"""
+    if cancel is not None and cancel.is_set():
+        return 'cancelled'
+    if deadline is not None and time.time() >= deadline:
+        return 'time_limit'
+    return None
+
+
+def _report_progress(on_progress, attempts, max_attempts, best, improved):
+    if on_progress is None or best is None:
+        return
+    progress = {'attempts': attempts, 'max_attempts': max_attempts, 'best_score': best[0], 'best_errors': best[3]}
+    if improved:
+        progress['hk_to_rooms'] = best[2]
+    on_progress(progress)
+
+
+def _renumbering_progress(on_progress, housekeepers):
+    """進捗の hk_to_rooms を最終結果と同じ番号付けの allocation（{room: HK番号}）に変換して渡す"""
+    def report(progress):
+        if 'hk_to_rooms' in progress:
+            progress['allocation'] = _renumber_hks(progress.pop('hk_to_rooms'), housekeepers)
+        on_progress(progress)
+    return report
+
+
+def _target_reached(best, target_score, stop_on_zero_errors):
+    if target_score is not None and best[0] >= target_score:
+        return True
+    return stop_on_zero_errors and best[3] == 0
+
+
+# ワーカープロセスごとに1つだけ構築する読み取り専用の割り当て器
+_worker_allocator = None
+
+
+def _init_worker(allocator_args, profile=False):
+    global _worker_allocator
+    _worker_allocator = _RoomAllocator(*allocator_args)
+    if profile:
+        _worker_allocator.profiler = _PhaseProfiler()
+
+
+def _run_worker_chunk(strategies, stop, base_seed):
+    """(best, 実行数, 終了理由, このチャンクの計測 dict または None)"""
+    outcome = _run_strategies(_worker_allocator, strategies, stop, base_seed)
+    profiler = _worker_allocator.profiler
+    if profiler is None:
+        return outcome + (None,)
+    _worker_allocator.profiler = _PhaseProfiler()
+    return outcome + (profiler.as_dict(),)
+
+
+def _run_parallel(allocator_args, strategies, workers, stop, base_seed=None, profiler=None, on_progress=None, cancel=None):
+    """
+    戦略をプロセスプールに分散し、スコア最大・戦略番号最小の結果を返す。
+    打ち切り条件（cancel を含む）はラウンド（workers × PARALLEL_ROUND_SIZE 戦略）ごとに判定する。
+    """
+    deadline, target_score, stop_on_zero_errors = stop
+    workers = min(workers, len(strategies))
+    round_size = workers * PARALLEL_ROUND_SIZE
+    
+    best = None
+    attempts = 0
+    stopped_by = 'exhausted'
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(allocator_args, profiler is not None)) as executor:
+        for start in range(0, len(strategies), round_size):
+            batch = strategies[start:start + round_size]
+            chunks = [batch[i::workers] for i in range(workers) if batch[i::workers]]
+            previous = best
+            for chunk_best, chunk_attempts, chunk_stopped_by, chunk_profile in executor.map(
+                    _run_worker_chunk, chunks, [stop] * len(chunks), [base_seed] * len(chunks)):
+                attempts += chunk_attempts
+                if profiler is not None and chunk_profile is not None:
+                    profiler.merge(chunk_profile)
+                if chunk_best is not None and (best is None or _is_better(chunk_best[0], chunk_best[1], best)):
+                    best = chunk_best
+                if chunk_stopped_by == 'time_limit':
+                    stopped_by = 'time_limit'
+            _report_progress(on_progress, attempts, len(strategies), best, best is not previous)
+            
+            if _target_reached(best, target_score, stop_on_zero_errors):
+                stopped_by = 'target'
+            else:
+                stopped_by = _interrupted(deadline, cancel) or stopped_by
+            if stopped_by != 'exhausted':
+                break
+    return best, attempts, stopped_by
+
+
+def _renumber_map(hk_to_rooms, housekeepers):
+    """入力HK id → 出力HK番号（大浴場担当を先頭に、最小フロア順）"""
     hk_info = []
     has_bath_map = {hk['id']: hk.get('has_bath', False) for hk in housekeepers}
     
@@ -60,7 +394,11 @@ def _renumber_hks(hk_to_rooms, housekeepers):
     old_to_new = {}
     for new_id, (old_id, _, _) in enumerate(hk_info, 1):
         old_to_new[old_id] = new_id
-    
+    return old_to_new
+
+
+def _renumber_hks(hk_to_rooms, housekeepers):
+    old_to_new = _renumber_map(hk_to_rooms, housekeepers)
     result = {}
     for hk_id, rooms in hk_to_rooms.items():
         new_hk_id = old_to_new[hk_id]
@@ -74,8 +412,171 @@ def _fl(room):
     return room // 100
 
 
+class _PhaseProfiler:
+    """
+    フェーズ別の所要時間・呼び出し回数と、判定関数の評価回数を記録する（profile=True のときのみ使う）
+    - phases: { フェーズ名: [呼び出し回数, 秒] }
+    - attempts: 試行ごとの [戦略番号, 各 PHASES の秒...]
+    """
+    PHASES = ('_allocate_hk', '_fallback_allocation', '_flow_twin_floors', '_adjust_twin_balance',
+              '_allocate_eco_rooms', '_flow_eco_rooms')
+    
+    def __init__(self):
+        self.phases = {}
+        self.counts = defaultdict(int)
+        self.attempts = []
+        self._current = None
+    
+    def start_attempt(self, strategy):
+        self._current = [strategy] + [0.0] * len(self.PHASES)
+        self.attempts.append(self._current)
+    
+    def add(self, name, seconds):
+        entry = self.phases.setdefault(name, [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+        if self._current is not None and name in self.PHASES:
+            self._current[1 + self.PHASES.index(name)] += seconds
+    
+    def count(self, name):
+        self.counts[name] += 1
+    
+    def merge(self, data):
+        """as_dict() の結果（ワーカープロセスの計測）を加算する"""
+        for name, phase in data['phases'].items():
+            entry = self.phases.setdefault(name, [0, 0.0])
+            entry[0] += phase['calls']
+            entry[1] += phase['seconds']
+        for name, count in data['counts'].items():
+            self.counts[name] += count
+        self.attempts.extend(list(row) for row in data['attempts'])
+    
+    def as_dict(self):
+        return {
+            'phases': {name: {'calls': calls, 'seconds': round(seconds, 6)}
+                       for name, (calls, seconds) in self.phases.items()},
+            'counts': dict(self.counts),
+            'attempt_columns': ['strategy'] + list(self.PHASES),
+            'attempts': [[row[0]] + [round(t, 6) for t in row[1:]] for row in sorted(self.attempts)],
+        }
+
+
+class _RoomModel:
+    """
+    部屋を 0..N-1 のインデックスで扱う配列ベースのモデル
+    - floor / floor_idx / is_twin / is_eco / is_eco_out: 部屋ごとのベクトル
+    - owner: 部屋ごとの担当HKインデックス（未割り当ては -1）
+    evaluate(owner) は evaluate_solution と同じ (score, errors) をベクトル演算で計算する
+    """
+    
+    def __init__(self, allocator):
+        self.max_hk_per_floor = allocator.MAX_HK_PER_FLOOR
+        self.rooms = sorted(set(allocator.normal_rooms) | allocator.eco_rooms)
+        self.room_index = {r: i for i, r in enumerate(self.rooms)}
+        self.hk_ids = list(allocator.hk_ids)
+        self.hk_index = {h: i for i, h in enumerate(self.hk_ids)}
+        
+        rooms = np.array(self.rooms, dtype=np.int64)
+        self.floor = rooms // 100
+        self.floors, self.floor_idx = np.unique(self.floor, return_inverse=True)
+        self.is_eco = np.array([r in allocator.eco_rooms for r in self.rooms], dtype=bool)
+        self.is_eco_out = np.array([r in allocator.eco_out_rooms for r in self.rooms], dtype=bool)
+        self.is_twin = np.array([r in allocator.twin_rooms for r in self.rooms], dtype=bool)
+        self.is_normal_twin = self.is_twin & ~self.is_eco
+        
+        self.room_quotas = np.array([allocator.room_quotas[h] for h in self.hk_ids], dtype=np.int64)
+        self.twin_quotas = np.array([allocator.twin_quotas[h] for h in self.hk_ids], dtype=np.int64)
+        self.twin_quota_specified = np.array(
+            [allocator.twin_quota_specified.get(h, False) for h in self.hk_ids], dtype=bool)
+    
+    def empty_owner(self):
+        return np.full(len(self.rooms), -1, dtype=np.int64)
+    
+    def owner_vector(self, hk_to_rooms):
+        """{hk_id: [room, ...]} → owner ベクトル"""
+        owner = self.empty_owner()
+        for hk_id, rooms in hk_to_rooms.items():
+            if rooms:
+                owner[[self.room_index[r] for r in rooms]] = self.hk_index[hk_id]
+        return owner
+    
+    def evaluate(self, owner):
+        """1候補の owner ベクトルを評価して (score, errors) を返す"""
+        scores, errors = self.evaluate_batch(owner[np.newaxis, :])
+        return int(scores[0]), int(errors[0])
+    
+    def evaluate_batch(self, owners):
+        """
+        候補 × 部屋 の owner 行列をまとめて評価し、(scores, errors) の配列を返す
+        - 候補ごとの部屋数・ツイン数・エコ数は候補インデックスでずらした bincount で一括計算
+        - 2フロア・MAX_HK_PER_FLOOR の判定は 候補 × HK × フロア の担当有無行列から計算
+        """
+        n_candidates = owners.shape[0]
+        n_hks = len(self.hk_ids)
+        n_floors = len(self.floors)
+        if n_hks == 0 or n_candidates == 0:
+            zeros = np.zeros(n_candidates, dtype=np.int64)
+            return zeros, zeros.copy()
+        
+        assigned = owners >= 0
+        normal = assigned & ~self.is_eco
+        eco = assigned & self.is_eco
+        normal_twin = normal & self.is_twin
+        
+        # (候補, HK) を1次元のビンに展開
+        slot = owners + np.arange(n_candidates)[:, np.newaxis] * n_hks
+        size = n_candidates * n_hks
+        
+        def counts(mask):
+            return np.bincount(slot[mask], minlength=size).reshape(n_candidates, n_hks)
+        
+        normal_counts = counts(normal)
+        twin_counts = counts(normal_twin)
+        eco_counts = counts(eco)
+        
+        # 候補 × HK × フロア の担当有無
+        cell = slot * n_floors + self.floor_idx
+        occupied = np.zeros(size * n_floors, dtype=bool)
+        occupied[cell[assigned]] = True
+        occupied = occupied.reshape(n_candidates, n_hks, n_floors)
+        occupied_normal = np.zeros(size * n_floors, dtype=bool)
+        occupied_normal[cell[normal]] = True
+        occupied_normal = occupied_normal.reshape(n_candidates, n_hks, n_floors)
+        n_all_floors = occupied.sum(axis=2)
+        n_normal_floors = occupied_normal.sum(axis=2)
+        
+        room_diff = np.abs(normal_counts - self.room_quotas).sum(axis=1)
+        floor_excess = np.maximum(n_normal_floors - 2, 0).sum(axis=1)
+        all_excess = np.maximum(n_all_floors - 3, 0).sum(axis=1)
+        three_floor_count = (n_all_floors == 3).sum(axis=1)
+        twin_quota_diff = np.abs(twin_counts - self.twin_quotas)
+        crowd_excess = np.maximum(occupied.sum(axis=1) - self.max_hk_per_floor, 0).sum(axis=1)
+        
+        scores = -(room_diff * 10000
+                   + floor_excess * 5000
+                   + all_excess * 3000
+                   + three_floor_count * 2000
+                   + twin_quota_diff.sum(axis=1) * 100)
+        errors = (room_diff + floor_excess + all_excess
+                  + twin_quota_diff[:, self.twin_quota_specified].sum(axis=1))
+        
+        scores -= (eco_counts.max(axis=1) - eco_counts.min(axis=1)) * 500
+        twin_diff = twin_counts.max(axis=1) - twin_counts.min(axis=1)
+        scores -= twin_diff * 800
+        scores -= np.maximum(twin_diff - 2, 0) * 1500
+        
+        scores -= crowd_excess * 800
+        errors += crowd_excess
+        
+        return scores, errors
+
+
 class _RoomAllocator:
     MAX_HK_PER_FLOOR = 3
+    # ツイン平等化で1回に連鎖させる交換の最大数
+    MAX_TWIN_CHAIN = 3
+    # 最小費用流でのツイン指定数との差の費用（1室あたり）
+    TWIN_FLOW_OVER_COST = 100
     
     def __init__(self, rooms, eco_rooms, eco_out_rooms, twin_rooms, housekeepers):
         self.eco_rooms = set(eco_rooms) | set(eco_out_rooms)
@@ -99,7 +600,10 @@ class _RoomAllocator:
         self.bath_hks = [h for h in self.hk_ids if self.has_bath[h]]
         self.normal_hks = [h for h in self.hk_ids if not self.has_bath[h]]
         
-        self.allocation = {h: [] for h in self.hk_ids}
+        self.model = _RoomModel(self)
+        self._reset_allocation()
+        # 計測用（_PhaseProfiler）。None なら計測しない
+        self.profiler = None
         
         self.eco_floor_counts = defaultdict(int)
         for r in self.eco_rooms:
@@ -131,33 +635,87 @@ class _RoomAllocator:
             for hk in auto:
                 self.twin_quotas[hk['id']] = 0
     
+    def _reset_allocation(self):
+        """割り当てと増分カウンタを初期化"""
+        self.allocation = {h: [] for h in self.hk_ids}
+        self.normal_counts = {h: 0 for h in self.hk_ids}
+        self.twin_counts = {h: 0 for h in self.hk_ids}
+        self.eco_counts = {h: 0 for h in self.hk_ids}
+        # HKごとのフロア別部屋数（通常部屋のみ / 全部屋）
+        self.hk_normal_floors = {h: {} for h in self.hk_ids}
+        self.hk_all_floors = {h: {} for h in self.hk_ids}
+        # フロアごとの担当HK
+        self.floor_hks = defaultdict(set)
+        # 部屋インデックス → HKインデックス（未割り当ては -1）
+        self.owner = self.model.empty_owner()
+    
+    def _add_room(self, hk_id, room):
+        """部屋を追加し、カウンタを更新"""
+        self.allocation[hk_id].append(room)
+        self.owner[self.model.room_index[room]] = self.model.hk_index[hk_id]
+        floor = _fl(room)
+        all_floors = self.hk_all_floors[hk_id]
+        all_floors[floor] = all_floors.get(floor, 0) + 1
+        self.floor_hks[floor].add(hk_id)
+        
+        if room in self.eco_rooms:
+            self.eco_counts[hk_id] += 1
+            return
+        
+        self.normal_counts[hk_id] += 1
+        normal_floors = self.hk_normal_floors[hk_id]
+        normal_floors[floor] = normal_floors.get(floor, 0) + 1
+        if room in self.twin_rooms:
+            self.twin_counts[hk_id] += 1
+    
+    def _remove_room(self, hk_id, room):
+        """部屋を外し、カウンタを更新"""
+        self.allocation[hk_id].remove(room)
+        self.owner[self.model.room_index[room]] = -1
+        floor = _fl(room)
+        all_floors = self.hk_all_floors[hk_id]
+        all_floors[floor] -= 1
+        if all_floors[floor] == 0:
+            del all_floors[floor]
+            self.floor_hks[floor].discard(hk_id)
+        
+        if room in self.eco_rooms:
+            self.eco_counts[hk_id] -= 1
+            return
+        
+        self.normal_counts[hk_id] -= 1
+        normal_floors = self.hk_normal_floors[hk_id]
+        normal_floors[floor] -= 1
+        if normal_floors[floor] == 0:
+            del normal_floors[floor]
+        if room in self.twin_rooms:
+            self.twin_counts[hk_id] -= 1
+    
     def _count_normal(self, hk_id):
-        return len([r for r in self.allocation[hk_id] if r not in self.eco_rooms])
+        return self.normal_counts[hk_id]
     
     def _count_twins(self, hk_id):
-        return sum(1 for r in self.allocation[hk_id] if r in self.twin_rooms and r not in self.eco_rooms)
+        return self.twin_counts[hk_id]
     
     def _count_eco(self, hk_id):
-        return sum(1 for r in self.allocation[hk_id] if r in self.eco_rooms)
+        return self.eco_counts[hk_id]
     
     def _get_floors(self, hk_id):
-        return set(_fl(r) for r in self.allocation[hk_id] if r not in self.eco_rooms)
+        return self.hk_normal_floors[hk_id].keys()
     
     def _get_all_floors(self, hk_id):
-        return set(_fl(r) for r in self.allocation[hk_id])
+        return self.hk_all_floors[hk_id].keys()
     
     def _remaining_quota(self, hk_id):
         return self.room_quotas[hk_id] - self._count_normal(hk_id)
     
     def _count_hks_on_floor(self, floor):
-        count = 0
-        for h in self.hk_ids:
-            if floor in self._get_all_floors(h):
-                count += 1
-        return count
+        return len(self.floor_hks[floor])
     
     def _can_add_floor(self, hk_id, new_floor):
         """通常部屋のフロア追加可否（2フロア以内 + フロア間距離2以内）"""
+        if self.profiler is not None:
+            self.profiler.count('_can_add_floor')
         if self.has_bath[hk_id] and new_floor > 4:
             return False
         
@@ -209,73 +767,22 @@ class _RoomAllocator:
         return False
     
     def evaluate_solution(self, hk_to_rooms):
-        score = 0
-        total_errors = 0
-        
-        floor_hk_count = defaultdict(set)
-        for hk_id in self.hk_ids:
-            rooms = hk_to_rooms[hk_id]
-            for r in rooms:
-                floor_hk_count[_fl(r)].add(hk_id)
-        
-        three_floor_count = 0
-        
-        for hk_id in self.hk_ids:
-            rooms = hk_to_rooms[hk_id]
-            normal = [r for r in rooms if r not in self.eco_rooms]
-            
-            room_diff = abs(len(normal) - self.room_quotas[hk_id])
-            score -= room_diff * 10000
-            total_errors += room_diff
-            
-            # 通常部屋のフロアは2以内
-            floors = set(_fl(r) for r in normal)
-            floor_excess = max(0, len(floors) - 2)
-            score -= floor_excess * 5000
-            total_errors += floor_excess
-            
-            # 全フロアは3以内
-            all_floors = set(_fl(r) for r in rooms)
-            if len(all_floors) > 3:
-                score -= (len(all_floors) - 3) * 3000
-                total_errors += len(all_floors) - 3
-            
-            # 3フロアには大きなペナルティ（最小限にする）
-            if len(all_floors) == 3:
-                three_floor_count += 1
-                score -= 2000  # 3フロアへの大きなペナルティ
-            
-            # ツイン偏りペナルティ
-            twins = sum(1 for r in normal if r in self.twin_rooms)
-            twin_diff = abs(twins - self.twin_quotas[hk_id])
-            score -= twin_diff * 100
-            if self.twin_quota_specified.get(hk_id, False):
-                total_errors += twin_diff
-        
-        # エコの偏りペナルティ
-        eco_counts = [sum(1 for r in hk_to_rooms[h] if r in self.eco_rooms) for h in self.hk_ids]
-        if eco_counts:
-            eco_diff = max(eco_counts) - min(eco_counts)
-            score -= eco_diff * 500
-        
-        # ツインの偏りペナルティ（全体）- 強化
-        twin_counts = [sum(1 for r in hk_to_rooms[h] if r in self.twin_rooms and r not in self.eco_rooms) for h in self.hk_ids]
-        if twin_counts:
-            twin_diff = max(twin_counts) - min(twin_counts)
-            score -= twin_diff * 800  # ペナルティ強化
-            if twin_diff > 2:
-                score -= (twin_diff - 2) * 1500  # 差が2を超えると追加ペナルティ
-        
-        for floor, hks in floor_hk_count.items():
-            if len(hks) > self.MAX_HK_PER_FLOOR:
-                excess = len(hks) - self.MAX_HK_PER_FLOOR
-                score -= excess * 800
-                total_errors += excess
-        
-        return score, total_errors
-    
-    def allocate(self, strategy=0):
-        self.allocation = {h: [] for h in self.hk_ids}
+        """
+        割り当てを評価して (score, errors) を返す。
+        候補 × 部屋 の owner 行列（np.ndarray, 2次元）を渡した場合は (scores, errors) の配列を返す
+        """
+        if isinstance(hk_to_rooms, np.ndarray):
+            if hk_to_rooms.ndim == 2:
+                return self.model.evaluate_batch(hk_to_rooms)
+            return self.model.evaluate(hk_to_rooms)
+        return self.model.evaluate(self.model.owner_vector(hk_to_rooms))
+    
+    def allocate(self, strategy=0, seed=None):
+        """
+        戦略 strategy で1回分の割り当てを作る。
+        seed はシャッフル戦略の乱数シード（未指定なら戦略番号）。同じ (strategy, seed) なら結果は常に同じ
+        """
+        self._reset_allocation()
         used = set()
         
         strategy_type = strategy % 20
@@ -293,22 +800,36 @@ class _RoomAllocator:
         elif strategy_type == 5:
             hk_queue = list(self.bath_hks) + list(reversed(self.normal_hks))
         else:
+            # 試行ごとに独立した乱数（グローバルな random の状態は変更しない）
             normal_shuffled = list(self.normal_hks)
-            random.seed(strategy)
-            random.shuffle(normal_shuffled)
+            random.Random(strategy if seed is None else seed).shuffle(normal_shuffled)
             hk_queue = list(self.bath_hks) + normal_shuffled
         
         reverse_floors = (strategy // 20) % 2 == 1
+        if self.profiler is not None:
+            self.profiler.start_attempt(strategy)
         
         for hk_id in hk_queue:
-            self._allocate_hk(hk_id, used, reverse_floors)
+            self._timed('_allocate_hk', self._allocate_hk, hk_id, used, reverse_floors)
         
-        self._fallback_allocation(used)
-        self._adjust_twin_balance()
-        self._allocate_eco_rooms()
+        self._timed('_fallback_allocation', self._fallback_allocation, used)
+        self._timed('_flow_twin_floors', self._flow_twin_floors)
+        self._timed('_adjust_twin_balance', self._adjust_twin_balance)
+        self._timed('_allocate_eco_rooms', self._allocate_eco_rooms)
+        self._timed('_flow_eco_rooms', self._flow_eco_rooms)
         
         return {h: sorted(self.allocation[h]) for h in self.hk_ids}
     
+    def _timed(self, name, func, *args):
+        """計測が有効なら func の所要時間を name として記録"""
+        if self.profiler is None:
+            return func(*args)
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.profiler.add(name, time.perf_counter() - started)
+    
     def _allocate_hk(self, hk_id, used, reverse_floors=False):
         quota = self.room_quotas[hk_id]
         twin_quota = self.twin_quotas[hk_id]
@@ -344,7 +865,7 @@ class _RoomAllocator:
         for room in twins_here[:twins_needed]:
             if assigned >= quota:
                 break
-            self.allocation[hk_id].append(room)
+            self._add_room(hk_id, room)
             used.add(room)
             assigned += 1
             twins_assigned += 1
@@ -352,14 +873,14 @@ class _RoomAllocator:
         for room in singles_here:
             if assigned >= quota:
                 break
-            self.allocation[hk_id].append(room)
+            self._add_room(hk_id, room)
             used.add(room)
             assigned += 1
         
         for room in twins_here[twins_needed:]:
             if room in used or assigned >= quota:
                 continue
-            self.allocation[hk_id].append(room)
+            self._add_room(hk_id, room)
             used.add(room)
             assigned += 1
             twins_assigned += 1
@@ -385,7 +906,7 @@ class _RoomAllocator:
             for room in twins_here[:twins_needed]:
                 if assigned >= quota:
                     break
-                self.allocation[hk_id].append(room)
+                self._add_room(hk_id, room)
                 used.add(room)
                 assigned += 1
                 twins_assigned += 1
@@ -393,14 +914,14 @@ class _RoomAllocator:
             for room in singles_here:
                 if assigned >= quota:
                     break
-                self.allocation[hk_id].append(room)
+                self._add_room(hk_id, room)
                 used.add(room)
                 assigned += 1
             
             for room in twins_here[twins_needed:]:
                 if room in used or assigned >= quota:
                     continue
-                self.allocation[hk_id].append(room)
+                self._add_room(hk_id, room)
                 used.add(room)
                 assigned += 1
                 twins_assigned += 1
@@ -444,144 +965,215 @@ class _RoomAllocator:
                 return s
             
             hk_id = max(candidates, key=score)
-            self.allocation[hk_id].append(room)
+            self._add_room(hk_id, room)
             used.add(room)
     
     def _adjust_twin_balance(self):
-        """ツイン平等化（チェーンスワップ対応）"""
+        """
+        ツイン平等化（索引 + 最短経路の連鎖交換）
+        - HK×フロアごとのツイン/シングルの索引から「ツインを渡してシングルを受け取る」交換を辺として列挙
+        - 余剰側のHKから不足側のHKまでの最短経路でツインを1室ずつ移す（途中のHKのツイン数は変わらない）
+        """
+        index = self._build_twin_index()
+        
         # 指定されたtwin_quotaを優先
         for _ in range(50):
             changed = False
-            
             for hk_id in self.hk_ids:
                 if not self.twin_quota_specified.get(hk_id, False):
                     continue
-                
-                current = self._count_twins(hk_id)
-                target = self.twin_quotas[hk_id]
-                
-                if current >= target:
+                if self._count_twins(hk_id) >= self.twin_quotas[hk_id]:
                     continue
-                
-                my_singles = [r for r in self.allocation[hk_id] 
-                             if r not in self.twin_rooms and r not in self.eco_rooms]
-                
-                for other in self.hk_ids:
-                    if other == hk_id or self._count_twins(hk_id) >= target:
-                        break
-                    
-                    if self.twin_quota_specified.get(other, False):
-                        if self._count_twins(other) <= self.twin_quotas[other]:
-                            continue
-                    
-                    other_twins = [r for r in self.allocation[other] 
-                                  if r in self.twin_rooms and r not in self.eco_rooms]
-                    
-                    for my_single in list(my_singles):
-                        if self._count_twins(hk_id) >= target:
-                            break
-                        for other_twin in list(other_twins):
-                            if self._can_swap(hk_id, other, my_single, other_twin):
-                                self._do_swap(hk_id, other, my_single, other_twin)
-                                my_singles.remove(my_single)
-                                changed = True
-                                break
-            
+                sources = [h for h in self.hk_ids if h != hk_id and (
+                    not self.twin_quota_specified.get(h, False) or self._count_twins(h) > self.twin_quotas[h])]
+                if self._transfer_twin(index, sources, {hk_id}):
+                    changed = True
             if not changed:
                 break
         
-        # 全体の均等化（直接交換 + チェーンスワップ）
+        # 全体の均等化（最多のHKから最少のHKへ）
         for _ in range(150):
             twin_counts = {h: self._count_twins(h) for h in self.hk_ids}
             max_twin = max(twin_counts.values())
             min_twin = min(twin_counts.values())
-            
             if max_twin - min_twin <= 1:
                 break
-            
-            changed = False
             max_hks = [h for h in self.hk_ids if twin_counts[h] == max_twin]
-            min_hks = [h for h in self.hk_ids if twin_counts[h] == min_twin]
-            
-            # 直接交換を試す
-            for max_hk in max_hks:
-                if changed:
-                    break
-                my_twins = [r for r in self.allocation[max_hk] 
-                           if r in self.twin_rooms and r not in self.eco_rooms]
-                
-                for min_hk in min_hks:
-                    if max_hk == min_hk:
-                        continue
-                    other_singles = [r for r in self.allocation[min_hk] 
-                                   if r not in self.twin_rooms and r not in self.eco_rooms]
-                    
-                    for my_twin in my_twins:
-                        for other_single in other_singles:
-                            if self._can_swap(max_hk, min_hk, my_twin, other_single):
-                                self._do_swap(max_hk, min_hk, my_twin, other_single)
-                                changed = True
-                                break
-                        if changed:
-                            break
-                    if changed:
-                        break
-            
-            # 直接交換できない場合、チェーンスワップ
-            if not changed:
-                for max_hk in max_hks:
-                    if changed:
-                        break
-                    my_twins = [r for r in self.allocation[max_hk] 
-                               if r in self.twin_rooms and r not in self.eco_rooms]
-                    
-                    for min_hk in min_hks:
-                        if changed:
-                            break
-                        if max_hk == min_hk:
-                            continue
-                        
-                        other_singles = [r for r in self.allocation[min_hk] 
-                                       if r not in self.twin_rooms and r not in self.eco_rooms]
-                        
-                        # 中間HKを経由
-                        for mid_hk in self.hk_ids:
-                            if mid_hk in [max_hk, min_hk]:
-                                continue
-                            
-                            mid_singles = [r for r in self.allocation[mid_hk] 
-                                          if r not in self.twin_rooms and r not in self.eco_rooms]
-                            mid_twins = [r for r in self.allocation[mid_hk] 
-                                        if r in self.twin_rooms and r not in self.eco_rooms]
-                            
-                            # max_hk -> mid_hk: ツイン→シングル
-                            for my_twin in my_twins:
-                                if changed:
-                                    break
-                                for mid_single in mid_singles:
-                                    if not self._can_swap(max_hk, mid_hk, my_twin, mid_single):
-                                        continue
-                                    
-                                    # mid_hk -> min_hk: ツイン→シングル
-                                    for mid_twin in mid_twins:
-                                        for other_single in other_singles:
-                                            if self._can_swap(mid_hk, min_hk, mid_twin, other_single):
-                                                # 両方の交換を実行
-                                                self._do_swap(max_hk, mid_hk, my_twin, mid_single)
-                                                self._do_swap(mid_hk, min_hk, mid_twin, other_single)
-                                                changed = True
-                                                break
-                                        if changed:
-                                            break
-                                    if changed:
-                                        break
-                            if changed:
-                                break
-            
-            if not changed:
+            min_hks = {h for h in self.hk_ids if twin_counts[h] == min_twin}
+            if not self._transfer_twin(index, max_hks, min_hks):
                 break
     
+    def _flow_twin_floors(self):
+        """
+        フロア内のツイン/シングルの持ち分を最小費用流（sidewind_flow.rebalance_units）で配分し直す
+        - 単位はツイン。HKがフロアで受け取れる数 = そのフロアに持つシングル数（交換なのでフロア別部屋数は変わらない）
+        - 費用はツイン指定数との差（指定ありは重く）+ 偏りを抑える二乗項
+        フロアをまたぐ移動は _adjust_twin_balance が担当する
+        """
+        if len(self.hk_ids) < 2:
+            return
+        twins_on = {h: defaultdict(list) for h in self.hk_ids}
+        singles_on = {h: defaultdict(list) for h in self.hk_ids}
+        for h in self.hk_ids:
+            for room in sorted(self.allocation[h]):
+                if room not in self.eco_rooms:
+                    (twins_on if room in self.twin_rooms else singles_on)[h][_fl(room)].append(room)
+        
+        def cost(h, k):
+            weight = self.TWIN_FLOW_OVER_COST * (10 if self.twin_quota_specified.get(h, False) else 1)
+            return weight * abs(k - self.twin_quotas[h]) + k * k
+        
+        moves = rebalance_units(
+            {h: {f: len(rooms) for f, rooms in twins_on[h].items()} for h in self.hk_ids},
+            {h: {f: len(rooms) for f, rooms in singles_on[h].items()} for h in self.hk_ids},
+            cost,
+        )
+        for giver, receiver, floor in moves:
+            twin_room = twins_on[giver][floor].pop()
+            single_room = singles_on[receiver][floor].pop()
+            self._do_swap(giver, receiver, twin_room, single_room)
+            singles_on[giver][floor].append(single_room)
+            twins_on[receiver][floor].append(twin_room)
+    
+    def _flow_eco_rooms(self):
+        """
+        エコ部屋（エコ外以外）の持ち分を、既に担当しているフロアの中で最小費用流により平準化する
+        - 単位はエコ部屋。受け取れるのは既に担当しているフロアのみ（フロアは増えない）
+        - 費用はエコ数の二乗（偏りを抑える）
+        """
+        if len(self.hk_ids) < 2:
+            return
+        eco_on = {h: defaultdict(list) for h in self.hk_ids}
+        for h in self.hk_ids:
+            for room in sorted(self.allocation[h]):
+                if room in self.eco_rooms and room not in self.eco_out_rooms:
+                    eco_on[h][_fl(room)].append(room)
+        
+        def cost(h, k):
+            return k * k
+        
+        # 保有数は「動かせるエコ」、費用の基準はエコ外を含むエコ総数
+        fixed = {h: self._count_eco(h) - sum(len(rooms) for rooms in eco_on[h].values()) for h in self.hk_ids}
+        moves = rebalance_units(
+            {h: {f: len(rooms) for f, rooms in eco_on[h].items()} for h in self.hk_ids},
+            {h: {f: len(self.eco_rooms) for f in self._get_all_floors(h)} for h in self.hk_ids},
+            lambda h, k: cost(h, k + fixed[h]),
+        )
+        for giver, receiver, floor in moves:
+            room = eco_on[giver][floor].pop()
+            self._remove_room(giver, room)
+            self._add_room(receiver, room)
+            eco_on[receiver][floor].append(room)
+    
+    def _build_twin_index(self):
+        """
+        ツイン平等化用の索引
+        - twins / singles: HK → フロア → 通常部屋
+        - single_holders: フロア → そのフロアにシングルを持つHK
+        """
+        twins = {h: defaultdict(list) for h in self.hk_ids}
+        singles = {h: defaultdict(list) for h in self.hk_ids}
+        single_holders = defaultdict(set)
+        for hk_id in self.hk_ids:
+            for room in sorted(self.allocation[hk_id]):
+                if room in self.eco_rooms:
+                    continue
+                if room in self.twin_rooms:
+                    twins[hk_id][_fl(room)].append(room)
+                else:
+                    singles[hk_id][_fl(room)].append(room)
+                    single_holders[_fl(room)].add(hk_id)
+        return twins, singles, single_holders
+    
+    def _twin_swap_edges(self, index, giver):
+        """giver がツインを渡し、シングルを受け取れる交換 (受け取るHK, ツインのフロア, シングルのフロア) を列挙"""
+        twins, singles, single_holders = index
+        for twin_floor in sorted(twins[giver]):
+            twin_room = twins[giver][twin_floor][0]
+            for single_floor in sorted(single_holders):
+                if self.has_bath[giver] and single_floor > 4:
+                    continue
+                if not self._valid_floor_set(self._floors_after_swap(giver, twin_room, single_floor)):
+                    continue
+                for receiver in sorted(single_holders[single_floor]):
+                    if receiver != giver and self._can_swap(giver, receiver, twin_room,
+                                                           singles[receiver][single_floor][0]):
+                        yield receiver, twin_floor, single_floor
+    
+    @staticmethod
+    def _valid_floor_set(floors):
+        """通常部屋のフロアが2フロア以内・フロア間距離2以内か"""
+        return len(floors) <= 1 or (len(floors) == 2 and max(floors) - min(floors) <= 2)
+    
+    def _transfer_twin(self, index, sources, sinks):
+        """
+        sources のいずれかから sinks のいずれかへ、ツインを1室移す最短の連鎖交換を探して実行する
+        （幅優先、最大 MAX_TWIN_CHAIN 回の交換）。実行できたら True
+        """
+        parent = {h: None for h in sources}
+        depth = {h: 0 for h in sources}
+        queue = deque(sources)
+        while queue:
+            giver = queue.popleft()
+            if depth[giver] >= self.MAX_TWIN_CHAIN:
+                continue
+            for receiver, twin_floor, single_floor in self._twin_swap_edges(index, giver):
+                if receiver in parent:
+                    continue
+                parent[receiver] = (giver, twin_floor, single_floor)
+                depth[receiver] = depth[giver] + 1
+                if receiver in sinks:
+                    return self._apply_twin_chain(index, parent, receiver)
+                queue.append(receiver)
+        return False
+    
+    def _apply_twin_chain(self, index, parent, sink):
+        """経路を sink 側から順に交換する。途中で交換できなくなった場合は適用済みの交換を戻して False"""
+        twins, singles, single_holders = index
+        hk_id = sink
+        applied = []
+        while parent[hk_id] is not None:
+            giver, twin_floor, single_floor = parent[hk_id]
+            if not twins[giver].get(twin_floor) or not singles[hk_id].get(single_floor):
+                self._undo_twin_chain(index, applied)
+                return False
+            twin_room = twins[giver][twin_floor][0]
+            single_room = singles[hk_id][single_floor][0]
+            if not self._can_swap(giver, hk_id, twin_room, single_room):
+                self._undo_twin_chain(index, applied)
+                return False
+            self._do_swap(giver, hk_id, twin_room, single_room)
+            self._move_indexed(twins, giver, hk_id, twin_room)
+            self._move_indexed(singles, hk_id, giver, single_room)
+            if not singles[hk_id].get(single_floor):
+                single_holders[single_floor].discard(hk_id)
+            single_holders[single_floor].add(giver)
+            applied.append((giver, hk_id, twin_room, single_room))
+            hk_id = giver
+        return bool(applied)
+    
+    def _undo_twin_chain(self, index, applied):
+        """_apply_twin_chain で適用した交換を逆順に戻す（索引も元に戻す）"""
+        twins, singles, single_holders = index
+        for giver, receiver, twin_room, single_room in reversed(applied):
+            self._do_swap(giver, receiver, single_room, twin_room)
+            self._move_indexed(twins, receiver, giver, twin_room)
+            self._move_indexed(singles, giver, receiver, single_room)
+            floor = _fl(single_room)
+            single_holders[floor] = {h for h in self.hk_ids if singles[h].get(floor)}
+    
+    @staticmethod
+    def _move_indexed(rooms_by_hk, from_hk, to_hk, room):
+        floor = _fl(room)
+        rooms_by_hk[from_hk][floor].remove(room)
+        if not rooms_by_hk[from_hk][floor]:
+            del rooms_by_hk[from_hk][floor]
+        rooms_by_hk[to_hk][floor].append(room)
+        rooms_by_hk[to_hk][floor].sort()
+    
     def _can_swap(self, hk1, hk2, room1, room2):
+        if self.profiler is not None:
+            self.profiler.count('_can_swap')
         f1, f2 = _fl(room1), _fl(room2)
         
         if self.has_bath[hk1] and f2 > 4:
@@ -590,11 +1182,7 @@ class _RoomAllocator:
             return False
         
         # hk1のスワップ後フロア
-        floors1_after = set()
-        for r in self.allocation[hk1]:
-            if r != room1 and r not in self.eco_rooms:
-                floors1_after.add(_fl(r))
-        floors1_after.add(f2)
+        floors1_after = self._floors_after_swap(hk1, room1, f2)
         
         if len(floors1_after) > 2:
             return False
@@ -604,11 +1192,7 @@ class _RoomAllocator:
                 return False
         
         # hk2のスワップ後フロア
-        floors2_after = set()
-        for r in self.allocation[hk2]:
-            if r != room2 and r not in self.eco_rooms:
-                floors2_after.add(_fl(r))
-        floors2_after.add(f1)
+        floors2_after = self._floors_after_swap(hk2, room2, f1)
         
         if len(floors2_after) > 2:
             return False
@@ -619,11 +1203,21 @@ class _RoomAllocator:
         
         return True
     
+    def _floors_after_swap(self, hk_id, out_room, in_floor):
+        """out_roomを手放しin_floorの部屋を受け取った後の通常部屋フロア"""
+        normal_floors = self.hk_normal_floors[hk_id]
+        floors = set(normal_floors)
+        out_floor = _fl(out_room)
+        if out_room not in self.eco_rooms and normal_floors.get(out_floor) == 1:
+            floors.discard(out_floor)
+        floors.add(in_floor)
+        return floors
+    
     def _do_swap(self, hk1, hk2, room1, room2):
-        self.allocation[hk1].remove(room1)
-        self.allocation[hk2].remove(room2)
-        self.allocation[hk1].append(room2)
-        self.allocation[hk2].append(room1)
+        self._remove_room(hk1, room1)
+        self._remove_room(hk2, room2)
+        self._add_room(hk1, room2)
+        self._add_room(hk2, room1)
     
     def _allocate_eco_rooms(self):
         """エコ部屋をバランス良く配分（2フロア優先、やむを得ない場合のみ3フロア）"""
@@ -637,7 +1231,7 @@ class _RoomAllocator:
             
             if candidates:
                 hk_id = min(candidates, key=lambda h: (self._count_eco(h), h))
-                self.allocation[hk_id].append(room)
+                self._add_room(hk_id, room)
             else:
                 available = [h for h in self.hk_ids 
                             if len(self._get_all_floors(h)) < 2 
@@ -645,7 +1239,7 @@ class _RoomAllocator:
                             and not (self.has_bath[h] and floor > 4)]
                 if available:
                     hk_id = min(available, key=lambda h: (self._count_eco(h), h))
-                    self.allocation[hk_id].append(room)
+                    self._add_room(hk_id, room)
         
         # その他のエコ部屋（エコが多いフロアから処理してバランスを取る）
         eco_only = sorted(self.eco_rooms - self.eco_out_rooms, 
@@ -695,4 +1289,516 @@ class _RoomAllocator:
             
             # エコが最も少ないHKを選択
             hk_id = min(candidates, key=lambda h: (eco_counts[h], len(self._get_all_floors(h)), h))
-            self.allocation[hk_id].append(room)
\ No newline at end of file
+            self._add_room(hk_id, room)
+    
+    def _load_allocation(self, hk_to_rooms):
+        """既存の割り当てを読み込み、増分カウンタを再構築"""
+        self._reset_allocation()
+        for hk_id in self.hk_ids:
+            for room in hk_to_rooms[hk_id]:
+                self._add_room(hk_id, room)
+    
+    def improve(self, hk_to_rooms, iterations=3000, seed=0):
+        """
+        焼きなまし法による局所探索（貪欲解の改善）
+        - 近傍: 通常部屋の交換（_can_swap）、通常部屋の移動（_can_add_floor）、エコ部屋の移動（_can_add_eco_floor）
+        - 評価は _IncrementalScorer による差分評価
+        戻り値: (hk_to_rooms, score, errors) … 探索中に見つかった最良解
+        """
+        if len(self.hk_ids) < 2:
+            score, errors = self.evaluate_solution(hk_to_rooms)
+            return hk_to_rooms, score, errors
+        
+        rng = random.Random(seed)
+        self._load_allocation(hk_to_rooms)
+        scorer = _IncrementalScorer(self, hk_to_rooms)
+        owner = {r: h for h in self.hk_ids for r in self.allocation[h]}
+        normal_assigned = [r for r in owner if r not in self.eco_rooms]
+        eco_assigned = [r for r in owner if r in self.eco_rooms]
+        
+        current = scorer.score()[0]
+        best_score, best_errors = scorer.score()
+        best_result = {h: sorted(self.allocation[h]) for h in self.hk_ids}
+        
+        temp_start, temp_end = 300.0, 5.0
+        cooling = (temp_end / temp_start) ** (1.0 / max(iterations, 1))
+        temp = temp_start
+        
+        for _ in range(iterations):
+            temp *= cooling
+            move = self._propose_move(rng, owner, normal_assigned, eco_assigned)
+            if move is None:
+                continue
+            hk1, hk2, room1, room2 = move
+            
+            if room2 is None:
+                new_score, new_errors = scorer.score_if_move(room1, hk1, hk2)
+            else:
+                new_score, new_errors = scorer.score_if_swap(room1, hk1, room2, hk2)
+            delta = new_score - current
+            
+            if delta >= 0 or rng.random() < math.exp(delta / temp):
+                self._apply_move(move)
+                if room2 is None:
+                    scorer.apply_move(room1, hk1, hk2)
+                else:
+                    scorer.apply_swap(room1, hk1, room2, hk2)
+                current = new_score
+                for room, hk_id in self._moved_rooms(move):
+                    owner[room] = hk_id
+                if current > best_score:
+                    best_score, best_errors = new_score, new_errors
+                    best_result = {h: sorted(self.allocation[h]) for h in self.hk_ids}
+        
+        return best_result, best_score, best_errors
+    
+    def repair(self, previous, changed_hks=(), rounds=20):
+        """
+        前回の割り当て { room: hk_id } を読み込み、崩れた所だけを直す
+        1. 残っている部屋は前回のHKに戻す（大浴場担当の5F以上・quota超過分は外す）
+        2. 外した部屋・新しい部屋を _can_add_floor / _can_add_eco_floor を満たすHKへ配置
+        3. 変更のあったHKが関わる移動・交換のうち、スコアが上がるものだけを rounds 回まで適用
+        戻り値: (hk_to_rooms, stats)
+        """
+        self._reset_allocation()
+        all_rooms = set(self.normal_rooms) | self.eco_rooms
+        touched = set(h for h in changed_hks if h in self.room_quotas)
+        pending = []
+        
+        for room in sorted(all_rooms):
+            hk_id = previous.get(room)
+            if hk_id not in self.room_quotas or (self.has_bath[hk_id] and _fl(room) > 4):
+                pending.append(room)
+                if hk_id in self.room_quotas:
+                    touched.add(hk_id)
+            else:
+                self._add_room(hk_id, room)
+        
+        for hk_id in self.hk_ids:
+            while self._remaining_quota(hk_id) < 0:
+                pending.append(self._release_candidate(hk_id))
+                touched.add(hk_id)
+        
+        kept = len(all_rooms) - len(pending)
+        for room in sorted(pending, key=lambda r: (r in self.eco_rooms, r)):
+            hk_id = self._repair_target(room)
+            if room not in self.eco_rooms and (self._remaining_quota(hk_id) <= 0
+                                               or not self._can_add_floor(hk_id, _fl(room))):
+                # 空きのあるHKがこのフロアを持てない場合は、フロアを持つHKから空きのあるHKまで部屋を押し出す
+                chain = self._repair_chain(room)
+                if chain is not None:
+                    hk_id, steps = chain
+                    for pushed, from_hk, to_hk in steps:
+                        self._remove_room(from_hk, pushed)
+                        self._add_room(to_hk, pushed)
+                        touched.update((from_hk, to_hk))
+            self._add_room(hk_id, room)
+            touched.add(hk_id)
+        
+        hk_to_rooms = {h: sorted(self.allocation[h]) for h in self.hk_ids}
+        scorer = _IncrementalScorer(self, hk_to_rooms)
+        for _ in range(rounds):
+            move = self._best_repair_move(scorer, touched)
+            if move is None:
+                break
+            hk1, hk2, room1, room2 = move
+            self._apply_move(move)
+            if room2 is None:
+                scorer.apply_move(room1, hk1, hk2)
+            else:
+                scorer.apply_swap(room1, hk1, room2, hk2)
+        
+        hk_to_rooms = {h: sorted(self.allocation[h]) for h in self.hk_ids}
+        score, errors = scorer.score()
+        moved = sum(1 for h in self.hk_ids for r in self.allocation[h] if r in previous and previous[r] != h)
+        return hk_to_rooms, {
+            'kept': kept,
+            'placed': len(pending),
+            'moved': moved,
+            'score': score,
+            'errors': errors,
+        }
+    
+    def _release_candidate(self, hk_id):
+        """quota超過のHKから外す通常部屋（担当の少ないフロア、ツイン超過ならツインを優先）"""
+        normal_floors = self.hk_normal_floors[hk_id]
+        twin_surplus = self._count_twins(hk_id) > self.twin_quotas[hk_id]
+        room = min(
+            (r for r in self.allocation[hk_id] if r not in self.eco_rooms),
+            key=lambda r: (normal_floors[_fl(r)], (r in self.twin_rooms) != twin_surplus, -r)
+        )
+        self._remove_room(hk_id, room)
+        return room
+    
+    def _repair_target(self, room):
+        """外した・新しい部屋の配置先HK（フロア制約を満たし、残りquotaとツイン指定に合うHKを優先）"""
+        floor = _fl(room)
+        allowed = [h for h in self.hk_ids if not (self.has_bath[h] and floor > 4)] or list(self.hk_ids)
+        
+        if room in self.eco_rooms:
+            return min(allowed, key=lambda h: (
+                not self._can_add_eco_floor(h, floor),
+                floor not in self._get_all_floors(h),
+                self._count_eco(h),
+                h,
+            ))
+        
+        is_twin = room in self.twin_rooms
+        
+        def need(h):
+            twin_need = self.twin_quotas[h] - self._count_twins(h)
+            return twin_need if is_twin else self._remaining_quota(h) - twin_need
+        
+        return min(allowed, key=lambda h: (
+            self._remaining_quota(h) <= 0,
+            not self._can_add_floor(h, floor),
+            floor not in self._get_all_floors(h),
+            -need(h),
+            h,
+        ))
+    
+    def _repair_chain(self, room):
+        """
+        room のフロアを持てるHKから、空きのあるHKまで通常部屋を1つずつ押し出す最短の連鎖（幅優先）
+        戻り値: (room を受け取るHK, [(押し出す部屋, 渡し元, 渡し先), ...]) または None
+        """
+        floor = _fl(room)
+        parent = {h: None for h in self.hk_ids if self._can_add_floor(h, floor)}
+        queue = deque(parent)
+        while queue:
+            giver = queue.popleft()
+            for pushed in sorted(self.allocation[giver]):
+                if pushed in self.eco_rooms:
+                    continue
+                for receiver in self.hk_ids:
+                    if receiver in parent or not self._can_add_floor(receiver, _fl(pushed)):
+                        continue
+                    parent[receiver] = (pushed, giver)
+                    if self._remaining_quota(receiver) > 0:
+                        steps = []
+                        hk_id = receiver
+                        while parent[hk_id] is not None:
+                            pushed_room, from_hk = parent[hk_id]
+                            steps.append((pushed_room, from_hk, hk_id))
+                            hk_id = from_hk
+                        return hk_id, steps
+                    queue.append(receiver)
+        return None
+    
+    def _best_repair_move(self, scorer, touched):
+        """touched のHKが関わる移動・交換のうち、スコアを最も上げるもの（無ければNone）"""
+        current = scorer.score()[0]
+        best_score, best_move = current, None
+        for hk1 in sorted(touched):
+            for room1 in list(self.allocation[hk1]):
+                is_eco = room1 in self.eco_rooms
+                for hk2 in self.hk_ids:
+                    if hk2 == hk1:
+                        continue
+                    can_move = (self._can_add_eco_floor(hk2, _fl(room1)) if is_eco
+                                else self._can_add_floor(hk2, _fl(room1)))
+                    if can_move:
+                        score = scorer.score_if_move(room1, hk1, hk2)[0]
+                        if score > best_score:
+                            best_score, best_move = score, (hk1, hk2, room1, None)
+                    if is_eco:
+                        continue
+                    for room2 in self.allocation[hk2]:
+                        if room2 in self.eco_rooms:
+                            continue
+                        if (room1 in self.twin_rooms) == (room2 in self.twin_rooms) and _fl(room1) == _fl(room2):
+                            continue
+                        if not (self._can_swap(hk1, hk2, room1, room2) or self._swap_keeps_floors(hk1, hk2, room1, room2)):
+                            continue
+                        score = scorer.score_if_swap(room1, hk1, room2, hk2)[0]
+                        if score > best_score:
+                            best_score, best_move = score, (hk1, hk2, room1, room2)
+        return best_move
+    
+    def _propose_move(self, rng, owner, normal_assigned, eco_assigned):
+        """実行可能な近傍を1つ提案（見つからなければNone）"""
+        kind = rng.random()
+        
+        if eco_assigned and (kind < 0.2 or not normal_assigned):
+            # エコ部屋の移動（通常部屋が無い日はエコ部屋の移動だけ）
+            room = rng.choice(eco_assigned)
+            hk1 = owner[room]
+            hk2 = rng.choice(self.hk_ids)
+            if hk2 == hk1 or not self._can_add_eco_floor(hk2, _fl(room)):
+                return None
+            return (hk1, hk2, room, None)
+        
+        if not normal_assigned:
+            return None
+        room1 = rng.choice(normal_assigned)
+        hk1 = owner[room1]
+        hk2 = rng.choice(self.hk_ids)
+        if hk2 == hk1:
+            return None
+        
+        if kind < 0.35:
+            # 通常部屋の移動
+            if not self._can_add_floor(hk2, _fl(room1)):
+                return None
+            return (hk1, hk2, room1, None)
+        
+        # 通常部屋の交換
+        candidates = [r for r in self.allocation[hk2] if r not in self.eco_rooms]
+        if not candidates:
+            return None
+        room2 = rng.choice(candidates)
+        if (room1 in self.twin_rooms) == (room2 in self.twin_rooms) and _fl(room1) == _fl(room2):
+            return None
+        if not (self._can_swap(hk1, hk2, room1, room2) or self._swap_keeps_floors(hk1, hk2, room1, room2)):
+            return None
+        return (hk1, hk2, room1, room2)
+    
+    def _swap_keeps_floors(self, hk1, hk2, room1, room2):
+        """交換後も双方の通常部屋フロアが増えない（既存フロア内に収まる）か"""
+        return (self._floors_after_swap(hk1, room1, _fl(room2)) <= self.hk_normal_floors[hk1].keys()
+                and self._floors_after_swap(hk2, room2, _fl(room1)) <= self.hk_normal_floors[hk2].keys())
+    
+    def _apply_move(self, move):
+        hk1, hk2, room1, room2 = move
+        if room2 is None:
+            self._remove_room(hk1, room1)
+            self._add_room(hk2, room1)
+        else:
+            self._do_swap(hk1, hk2, room1, room2)
+    
+    def _moved_rooms(self, move):
+        hk1, hk2, room1, room2 = move
+        if room2 is None:
+            return [(room1, hk2)]
+        return [(room1, hk2), (room2, hk1)]
+
+
+class _IncrementalScorer:
+    """
+    evaluate_solution と同じスコアを差分で保持する評価器
+    - HK単位の項（部屋数差・フロア超過・3フロア・ツイン指定差）はHKごとに保持
+    - エコ数・ツイン数の偏りは「値 → 人数」のヒストグラムで最大・最小を求める
+    - フロア混雑はフロアごとの担当HK数から保持
+    score_if_move / score_if_swap は状態を変更せずに変更後の (score, errors) を返す
+    """
+    
+    def __init__(self, allocator, hk_to_rooms):
+        self.allocator = allocator
+        self.eco_rooms = allocator.eco_rooms
+        self.twin_rooms = allocator.twin_rooms
+        self.max_hk_per_floor = allocator.MAX_HK_PER_FLOOR
+        
+        self.normal_counts = {}
+        self.twin_counts = {}
+        self.eco_counts = {}
+        self.normal_floors = {}
+        self.all_floors = {}
+        self.floor_hk_count = defaultdict(int)
+        
+        for hk_id in allocator.hk_ids:
+            rooms = hk_to_rooms[hk_id]
+            normal = [r for r in rooms if r not in self.eco_rooms]
+            self.normal_counts[hk_id] = len(normal)
+            self.twin_counts[hk_id] = sum(1 for r in normal if r in self.twin_rooms)
+            self.eco_counts[hk_id] = len(rooms) - len(normal)
+            self.normal_floors[hk_id] = defaultdict(int)
+            self.all_floors[hk_id] = defaultdict(int)
+            for r in normal:
+                self.normal_floors[hk_id][_fl(r)] += 1
+            for r in rooms:
+                self.all_floors[hk_id][_fl(r)] += 1
+            for floor in self.all_floors[hk_id]:
+                self.floor_hk_count[floor] += 1
+        
+        self.hk_terms = {h: self._hk_terms(h, self.normal_counts[h], self.twin_counts[h],
+                                           len(self.normal_floors[h]), len(self.all_floors[h]))
+                         for h in allocator.hk_ids}
+        self.hk_score = sum(t[0] for t in self.hk_terms.values())
+        self.hk_errors = sum(t[1] for t in self.hk_terms.values())
+        
+        self.eco_hist = defaultdict(int)
+        self.twin_hist = defaultdict(int)
+        for h in allocator.hk_ids:
+            self.eco_hist[self.eco_counts[h]] += 1
+            self.twin_hist[self.twin_counts[h]] += 1
+        
+        self.crowd_score = 0
+        self.crowd_errors = 0
+        for count in self.floor_hk_count.values():
+            s, e = self._crowd_terms(count)
+            self.crowd_score += s
+            self.crowd_errors += e
+    
+    def score(self):
+        """現在の (score, errors)"""
+        return (self.hk_score + self._spread_score(self.eco_hist, self.twin_hist, {}, {}) + self.crowd_score,
+                self.hk_errors + self.crowd_errors)
+    
+    def score_if_move(self, room, from_hk, to_hk):
+        """room を from_hk から to_hk へ移した場合の (score, errors)"""
+        return self._score_if([(room, from_hk, to_hk)])
+    
+    def score_if_swap(self, room1, hk1, room2, hk2):
+        """hk1 の room1 と hk2 の room2 を交換した場合の (score, errors)"""
+        return self._score_if([(room1, hk1, hk2), (room2, hk2, hk1)])
+    
+    def apply_move(self, room, from_hk, to_hk):
+        self._apply([(room, from_hk, to_hk)])
+    
+    def apply_swap(self, room1, hk1, room2, hk2):
+        self._apply([(room1, hk1, hk2), (room2, hk2, hk1)])
+    
+    def _hk_terms(self, hk_id, n_normal, n_twin, n_normal_floors, n_all_floors):
+        """evaluate_solution のHK単位の項 (score, errors)"""
+        allocator = self.allocator
+        score = 0
+        errors = 0
+        
+        room_diff = abs(n_normal - allocator.room_quotas[hk_id])
+        score -= room_diff * 10000
+        errors += room_diff
+        
+        floor_excess = max(0, n_normal_floors - 2)
+        score -= floor_excess * 5000
+        errors += floor_excess
+        
+        if n_all_floors > 3:
+            score -= (n_all_floors - 3) * 3000
+            errors += n_all_floors - 3
+        if n_all_floors == 3:
+            score -= 2000
+        
+        twin_diff = abs(n_twin - allocator.twin_quotas[hk_id])
+        score -= twin_diff * 100
+        if allocator.twin_quota_specified.get(hk_id, False):
+            errors += twin_diff
+        
+        return score, errors
+    
+    def _crowd_terms(self, count):
+        if count > self.max_hk_per_floor:
+            excess = count - self.max_hk_per_floor
+            return -excess * 800, excess
+        return 0, 0
+    
+    @staticmethod
+    def _hist_range(hist, changes):
+        """ヒストグラムに changes（値 → 人数の増減）を反映した場合の最大 - 最小"""
+        values = [v for v in set(hist) | set(changes) if hist.get(v, 0) + changes.get(v, 0) > 0]
+        return max(values) - min(values) if values else 0
+    
+    def _spread_score(self, eco_hist, twin_hist, eco_changes, twin_changes):
+        score = -self._hist_range(eco_hist, eco_changes) * 500
+        twin_diff = self._hist_range(twin_hist, twin_changes)
+        score -= twin_diff * 800
+        if twin_diff > 2:
+            score -= (twin_diff - 2) * 1500
+        return score
+    
+    def _diff(self, changes):
+        """
+        changes（(room, from_hk, to_hk) のリスト）による変化量を集計
+        戻り値: HKごとの (通常数, ツイン数, エコ数, 通常フロア増減, 全フロア増減)
+        """
+        diff = {}
+        for room, from_hk, to_hk in changes:
+            floor = _fl(room)
+            is_eco = room in self.eco_rooms
+            is_twin = not is_eco and room in self.twin_rooms
+            for hk_id, sign in ((from_hk, -1), (to_hk, 1)):
+                d = diff.setdefault(hk_id, [0, 0, 0, defaultdict(int), defaultdict(int)])
+                if is_eco:
+                    d[2] += sign
+                else:
+                    d[0] += sign
+                    d[3][floor] += sign
+                    if is_twin:
+                        d[1] += sign
+                d[4][floor] += sign
+        return diff
+    
+    def _evaluate_diff(self, diff):
+        """差分を反映した場合の新しいHK項・フロア数・ヒストグラム変化を計算"""
+        hk_terms = {}
+        floor_changes = defaultdict(int)
+        eco_changes = defaultdict(int)
+        twin_changes = defaultdict(int)
+        
+        for hk_id, (dn, dt, de, d_normal_floors, d_all_floors) in diff.items():
+            n_normal_floors = len(self.normal_floors[hk_id])
+            for floor, delta in d_normal_floors.items():
+                before = self.normal_floors[hk_id].get(floor, 0)
+                n_normal_floors += (before + delta > 0) - (before > 0)
+            n_all_floors = len(self.all_floors[hk_id])
+            for floor, delta in d_all_floors.items():
+                before = self.all_floors[hk_id].get(floor, 0)
+                change = (before + delta > 0) - (before > 0)
+                n_all_floors += change
+                floor_changes[floor] += change
+            
+            n_twin = self.twin_counts[hk_id] + dt
+            n_eco = self.eco_counts[hk_id] + de
+            hk_terms[hk_id] = self._hk_terms(hk_id, self.normal_counts[hk_id] + dn, n_twin,
+                                             n_normal_floors, n_all_floors)
+            
+            eco_changes[self.eco_counts[hk_id]] -= 1
+            eco_changes[n_eco] += 1
+            twin_changes[self.twin_counts[hk_id]] -= 1
+            twin_changes[n_twin] += 1
+        
+        return hk_terms, floor_changes, eco_changes, twin_changes
+    
+    def _score_if(self, changes):
+        hk_terms, floor_changes, eco_changes, twin_changes = self._evaluate_diff(self._diff(changes))
+        
+        score = self.hk_score
+        errors = self.hk_errors
+        for hk_id, (s, e) in hk_terms.items():
+            score += s - self.hk_terms[hk_id][0]
+            errors += e - self.hk_terms[hk_id][1]
+        
+        score += self.crowd_score
+        errors += self.crowd_errors
+        for floor, change in floor_changes.items():
+            if change:
+                old_s, old_e = self._crowd_terms(self.floor_hk_count.get(floor, 0))
+                new_s, new_e = self._crowd_terms(self.floor_hk_count.get(floor, 0) + change)
+                score += new_s - old_s
+                errors += new_e - old_e
+        
+        score += self._spread_score(self.eco_hist, self.twin_hist, eco_changes, twin_changes)
+        return score, errors
+    
+    def _apply(self, changes):
+        diff = self._diff(changes)
+        hk_terms, floor_changes, eco_changes, twin_changes = self._evaluate_diff(diff)
+        
+        for hk_id, (dn, dt, de, d_normal_floors, d_all_floors) in diff.items():
+            self.normal_counts[hk_id] += dn
+            self.twin_counts[hk_id] += dt
+            self.eco_counts[hk_id] += de
+            for floors, deltas in ((self.normal_floors[hk_id], d_normal_floors),
+                                   (self.all_floors[hk_id], d_all_floors)):
+                for floor, delta in deltas.items():
+                    floors[floor] += delta
+                    if floors[floor] == 0:
+                        del floors[floor]
+            
+            s, e = hk_terms[hk_id]
+            self.hk_score += s - self.hk_terms[hk_id][0]
+            self.hk_errors += e - self.hk_terms[hk_id][1]
+            self.hk_terms[hk_id] = (s, e)
+        
+        for floor, change in floor_changes.items():
+            if change:
+                old_s, old_e = self._crowd_terms(self.floor_hk_count[floor])
+                self.floor_hk_count[floor] += change
+                new_s, new_e = self._crowd_terms(self.floor_hk_count[floor])
+                self.crowd_score += new_s - old_s
+                self.crowd_errors += new_e - old_e
+        
+        for hist, hist_changes in ((self.eco_hist, eco_changes), (self.twin_hist, twin_changes)):
+            for value, change in hist_changes.items():
+                hist[value] += change
+                if hist[value] == 0:
+                    del hist[value]
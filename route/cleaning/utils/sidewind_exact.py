@@ -0,0 +1,167 @@
+"""
+Sidewind 厳密解モード（OR-Tools CP-SAT）
+- evaluate_solution と同じペナルティを目的関数として整数計画で最適化
+- 2フロア間距離2以内・大浴場担当は4F以下はハード制約
+- ortools が無い・時間内に解が出ない場合は None を返し、呼び出し側でヒューリスティックにフォールバック
+"""
+
+from collections import defaultdict
+
+
+def solve_exact(allocator, time_limit=10.0, hint=None, workers=1):
+    """
+    allocator（_RoomAllocator）の入力をCP-SATで解く。
+
+    Parameters
+    ----------
+    allocator : _RoomAllocator
+        部屋・HK・クォータ設定（状態は変更しない）
+    time_limit : float
+        ソルバーの制限時間（秒）
+    hint : dict or None
+        初期解のヒント { hk_id: [room, ...] }（ヒューリスティックの最良解など）
+    workers : int
+        ソルバーの探索スレッド数
+
+    Returns
+    -------
+    (hk_to_rooms, status) または ortools が無い・解が無い場合は (None, status)
+    status は 'optimal' / 'feasible' / 'infeasible' / 'unknown' / 'unavailable'
+    """
+    try:
+        from ortools.sat.python import cp_model
+    except ImportError:
+        return None, 'unavailable'
+
+    from .sidewind_core import _fl
+
+    hk_ids = allocator.hk_ids
+    eco_rooms = allocator.eco_rooms
+    all_rooms = sorted(set(allocator.normal_rooms) | eco_rooms)
+    normal_rooms = [r for r in all_rooms if r not in eco_rooms]
+    floors = sorted(set(_fl(r) for r in all_rooms))
+    rooms_on_floor = defaultdict(list)
+    for r in all_rooms:
+        rooms_on_floor[_fl(r)].append(r)
+    n_rooms = len(all_rooms)
+    n_hks = len(hk_ids)
+
+    model = cp_model.CpModel()
+
+    # x[r, h]: 部屋rをHK hに割り当てる
+    x = {}
+    for r in all_rooms:
+        for h in hk_ids:
+            if allocator.has_bath[h] and _fl(r) > 4:
+                continue
+            x[r, h] = model.NewBoolVar(f'x_{r}_{h}')
+        model.AddExactlyOne(x[r, h] for h in hk_ids if (r, h) in x)
+
+    # y[h, f]: HK hがフロアfを担当（全部屋） / z[h, f]: 通常部屋で担当
+    y = {}
+    z = {}
+    for h in hk_ids:
+        for f in floors:
+            all_vars = [x[r, h] for r in rooms_on_floor[f] if (r, h) in x]
+            normal_vars = [x[r, h] for r in rooms_on_floor[f] if (r, h) in x and r not in eco_rooms]
+            y[h, f] = model.NewBoolVar(f'y_{h}_{f}')
+            z[h, f] = model.NewBoolVar(f'z_{h}_{f}')
+            for v in all_vars:
+                model.AddImplication(v, y[h, f])
+            model.Add(sum(all_vars) >= y[h, f])
+            for v in normal_vars:
+                model.AddImplication(v, z[h, f])
+            model.Add(sum(normal_vars) >= z[h, f])
+
+        # 通常部屋のフロア間距離は2以内
+        for i, f1 in enumerate(floors):
+            for f2 in floors[i + 1:]:
+                if f2 - f1 > 2:
+                    model.AddBoolOr([z[h, f1].Not(), z[h, f2].Not()])
+
+    penalties = []
+    eco_counts = []
+    twin_counts = []
+    for h in hk_ids:
+        normal_count = sum(x[r, h] for r in normal_rooms if (r, h) in x)
+        twin_count = sum(x[r, h] for r in normal_rooms if (r, h) in x and r in allocator.twin_rooms)
+        eco_count = sum(x[r, h] for r in all_rooms if (r, h) in x and r in eco_rooms)
+
+        # 部屋数差
+        room_diff = model.NewIntVar(0, n_rooms, f'room_diff_{h}')
+        model.AddAbsEquality(room_diff, normal_count - allocator.room_quotas[h])
+        penalties.append(10000 * room_diff)
+
+        # 通常部屋のフロア超過（2フロアまで）
+        floor_excess = model.NewIntVar(0, len(floors), f'floor_excess_{h}')
+        model.Add(floor_excess >= sum(z[h, f] for f in floors) - 2)
+        penalties.append(5000 * floor_excess)
+
+        # 全フロア数: 4以上は超過ペナルティ、ちょうど3は2000
+        n_all = sum(y[h, f] for f in floors)
+        all_excess = model.NewIntVar(0, len(floors), f'all_excess_{h}')
+        model.Add(all_excess >= n_all - 3)
+        penalties.append(3000 * all_excess)
+        is_three = model.NewBoolVar(f'is_three_{h}')
+        model.Add(n_all != 3).OnlyEnforceIf(is_three.Not())
+        penalties.append(2000 * is_three)
+
+        # ツイン指定数との差
+        twin_diff = model.NewIntVar(0, n_rooms, f'twin_diff_{h}')
+        model.AddAbsEquality(twin_diff, twin_count - allocator.twin_quotas[h])
+        penalties.append(100 * twin_diff)
+
+        eco_var = model.NewIntVar(0, n_rooms, f'eco_{h}')
+        model.Add(eco_var == eco_count)
+        eco_counts.append(eco_var)
+        twin_var = model.NewIntVar(0, n_rooms, f'twin_{h}')
+        model.Add(twin_var == twin_count)
+        twin_counts.append(twin_var)
+
+    # エコ・ツインの偏り
+    if n_hks:
+        eco_max = model.NewIntVar(0, n_rooms, 'eco_max')
+        eco_min = model.NewIntVar(0, n_rooms, 'eco_min')
+        model.AddMaxEquality(eco_max, eco_counts)
+        model.AddMinEquality(eco_min, eco_counts)
+        penalties.append(500 * (eco_max - eco_min))
+
+        twin_max = model.NewIntVar(0, n_rooms, 'twin_max')
+        twin_min = model.NewIntVar(0, n_rooms, 'twin_min')
+        model.AddMaxEquality(twin_max, twin_counts)
+        model.AddMinEquality(twin_min, twin_counts)
+        twin_spread_excess = model.NewIntVar(0, n_rooms, 'twin_spread_excess')
+        model.Add(twin_spread_excess >= twin_max - twin_min - 2)
+        penalties.append(800 * (twin_max - twin_min) + 1500 * twin_spread_excess)
+
+    # フロアあたりの担当HK数
+    for f in floors:
+        crowd_excess = model.NewIntVar(0, n_hks, f'crowd_excess_{f}')
+        model.Add(crowd_excess >= sum(y[h, f] for h in hk_ids) - allocator.MAX_HK_PER_FLOOR)
+        penalties.append(800 * crowd_excess)
+
+    model.Minimize(sum(penalties))
+
+    if hint:
+        owner = {r: h for h, rooms in hint.items() for r in rooms}
+        for (r, h), var in x.items():
+            model.AddHint(var, 1 if owner.get(r) == h else 0)
+
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = float(time_limit)
+    solver.parameters.num_workers = max(1, int(workers))
+    status = solver.Solve(model)
+
+    status_name = {
+        cp_model.OPTIMAL: 'optimal',
+        cp_model.FEASIBLE: 'feasible',
+        cp_model.INFEASIBLE: 'infeasible',
+    }.get(status, 'unknown')
+    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return None, status_name
+
+    hk_to_rooms = {h: [] for h in hk_ids}
+    for (r, h), var in x.items():
+        if solver.Value(var):
+            hk_to_rooms[h].append(r)
+    return {h: sorted(rooms) for h, rooms in hk_to_rooms.items()}, status_name
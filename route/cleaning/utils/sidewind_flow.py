@@ -0,0 +1,97 @@
+"""
+Sidewind 最小費用流（フロア → ハウスキーパー）
+- ツイン・エコ部屋のように「どのフロアの単位を誰が持つか」だけが問題になる配分を、
+  フロア → HK の2部ネットワーク上の最小費用流として解く
+- HKごとの費用は保有数について凸（例: 指定数との差 + 偏り）。現在の配分を初期流とし、
+  残余ネットワーク上の負閉路（= 費用が下がる 余剰HK → … → 不足HK の受け渡し経路）を
+  無くなるまで消去する。凸費用なので負閉路が無ければ最適
+- ノード数は フロア数 + HK数 程度なので外部ライブラリは使わない
+"""
+
+from collections import deque
+
+
+def rebalance_units(holdings, capacity, cost, max_rounds=500):
+    """
+    単位（ツイン・エコ部屋など）の受け渡し手順を最小費用流で求める。
+
+    Parameters
+    ----------
+    holdings : dict
+        { hk_id: { floor: 個数 } } 各HKがフロアごとに持つ単位数（渡せる数）
+    capacity : dict
+        { hk_id: { floor: 個数 } } 各HKがフロアごとに受け取れる単位数
+    cost : callable
+        cost(hk_id, k) … 単位を k 個持つときの費用（k について凸）
+    max_rounds : int
+        受け渡し経路を適用する最大回数
+
+    Returns
+    -------
+    list[tuple]
+        適用順の受け渡し [(渡すHK, 受け取るHK, floor), ...]。holdings / capacity は更新される
+    """
+    hk_ids = sorted(holdings)
+    totals = {h: sum(holdings[h].values()) for h in hk_ids}
+    # フロア → そのフロアで受け取れるHK
+    receivers = {}
+    for h in hk_ids:
+        for floor, n in capacity[h].items():
+            if n > 0:
+                receivers.setdefault(floor, set()).add(h)
+    moves = []
+
+    for _ in range(max_rounds):
+        def add_cost(h):
+            return cost(h, totals[h] + 1) - cost(h, totals[h])
+
+        cheapest_add = min(add_cost(h) for h in hk_ids)
+        path = None
+        # 1個減らしたときに費用が最も下がるHKから探す（どのHKに渡しても下がらないHKは対象外）
+        for source in sorted(hk_ids, key=lambda h: (cost(h, totals[h] - 1) - cost(h, totals[h]), h)):
+            if totals[source] == 0:
+                continue
+            saving = cost(source, totals[source]) - cost(source, totals[source] - 1)
+            if saving <= cheapest_add:
+                break
+            path = _shortest_path(source, saving, holdings, receivers, add_cost)
+            if path is not None:
+                break
+        if path is None:
+            break
+
+        for giver, receiver, floor in path:
+            holdings[giver][floor] -= 1
+            holdings[receiver][floor] = holdings[receiver].get(floor, 0) + 1
+            capacity[receiver][floor] -= 1
+            if capacity[receiver][floor] <= 0:
+                receivers[floor].discard(receiver)
+            capacity[giver][floor] = capacity[giver].get(floor, 0) + 1
+            receivers.setdefault(floor, set()).add(giver)
+        totals[path[0][0]] -= 1
+        totals[path[-1][1]] += 1
+        moves.extend(path)
+    return moves
+
+
+def _shortest_path(source, saving, holdings, receivers, add_cost):
+    """source から、1個増やす費用が saving 未満のHKまでの最短の受け渡し経路（幅優先）"""
+    parent = {source: None}
+    queue = deque([source])
+    while queue:
+        giver = queue.popleft()
+        for floor in sorted(f for f, n in holdings[giver].items() if n > 0):
+            for receiver in sorted(receivers.get(floor, ())):
+                if receiver in parent:
+                    continue
+                parent[receiver] = (giver, floor)
+                if add_cost(receiver) < saving:
+                    path = []
+                    hk_id = receiver
+                    while parent[hk_id] is not None:
+                        prev, prev_floor = parent[hk_id]
+                        path.append((prev, hk_id, prev_floor))
+                        hk_id = prev
+                    return list(reversed(path))
+                queue.append(receiver)
+    return None
@@ -0,0 +1,203 @@
+"""
+Sidewind バックグラウンドジョブ
+- 割り当て探索をリクエストのスレッドから切り離し、スレッドプールで実行する
+- ジョブIDは入力のキャッシュキー（make_cache_key）。同じ入力の二重送信は実行中のジョブに合流する
+- 進捗（試行数・暫定の最良スコア）と最終結果は JobRegistry.get で参照する。stream で最良解の更新を順に受け取れる
+- cancel（画面の「採用」）で残りの試行を打ち切り、その時点の最良解で終了する
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from .sidewind_cache import assign_rooms_cached, make_cache_key, result_options
+
+
+# 状態: queued → running → done / failed
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+
+
+class SidewindJob:
+    """1回分の割り当て探索の状態（スレッド間で共有）"""
+
+    def __init__(self, job_id):
+        self.id = job_id
+        self.status = QUEUED
+        self.progress = {}
+        self.allocation = None
+        self.stats = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        # 暫定の最良解（探索中に更新される）と、状態が変わるたびに増える版番号
+        self.best_allocation = None
+        self.best_version = 0
+        self.version = 0
+        self.cancel_event = threading.Event()
+        self._lock = threading.RLock()
+        self._changed = threading.Condition(self._lock)
+
+    def update_progress(self, progress):
+        with self._lock:
+            progress = dict(progress)
+            allocation = progress.pop('allocation', None)
+            if allocation is not None:
+                self.best_allocation = allocation
+                self.best_version += 1
+            self.progress = progress
+            self._touch()
+
+    def reusable(self):
+        """同じ入力の送信を合流させてよいか（失敗・途中で採用したジョブは使い回さない）"""
+        return self.status != FAILED and not self.cancel_event.is_set()
+
+    def stream(self, keepalive=15):
+        """
+        状態が変わるたびに (イベント名, dict) を返すジェネレータ。
+        最良解が更新されると 'allocation'、それ以外は 'progress'、終了時に 'done' / 'failed' を返して止まる。
+        keepalive 秒変化が無ければ None を返す（接続維持用）
+        """
+        version = None
+        best_version = 0
+        while True:
+            with self._changed:
+                self._changed.wait_for(lambda: self.version != version, timeout=keepalive)
+                if self.version == version:
+                    changed = False
+                else:
+                    changed = True
+                    version = self.version
+                    allocation = self.best_allocation if self.best_version != best_version else None
+                    best_version = self.best_version
+                    data = self.as_dict()
+            if not changed:
+                yield None
+                continue
+            if allocation is not None and data['status'] != DONE:
+                yield 'allocation', {
+                    'best_score': data['progress'].get('best_score'),
+                    'allocation': {str(r): hk for r, hk in sorted(allocation.items())},
+                }
+            if data['status'] in (DONE, FAILED):
+                yield data['status'], data
+                return
+            yield 'progress', data
+
+    def as_dict(self, include_result=True):
+        """JSON 応答用。部屋番号のキーは文字列にする"""
+        with self._lock:
+            data = {
+                'job_id': self.id,
+                'status': self.status,
+                'progress': dict(self.progress),
+                'elapsed': (self.finished or time.time()) - self.created,
+                'cancelled': self.cancel_event.is_set(),
+            }
+            if self.error is not None:
+                data['error'] = self.error
+            if include_result and self.status == DONE:
+                data['best_score'] = self.stats.get('best_score')
+                data['best_errors'] = self.stats.get('best_errors')
+                data['allocation'] = {str(r): hk for r, hk in sorted(self.allocation.items())}
+            return data
+
+    def _set(self, **fields):
+        with self._lock:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self._touch()
+
+    def _touch(self):
+        self.version += 1
+        self._changed.notify_all()
+
+
+class JobRegistry:
+    """ジョブの登録・実行・参照。終了したジョブは ttl 秒、最大 max_jobs 件まで保持する"""
+
+    def __init__(self, max_workers=1, ttl=600, max_jobs=32):
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='sidewind-job')
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, job_id, func, *args, **kwargs):
+        """
+        func(*args, on_progress=..., cancel=..., **kwargs) を (allocation, stats) を返す探索として実行する。
+        同じ job_id のジョブが実行中・保持中ならそれを返す（戻り値は (job, 新規かどうか)）
+        """
+        with self._lock:
+            self._prune()
+            job = self._jobs.get(job_id)
+            if job is not None and job.reusable():
+                return job, False
+            job = SidewindJob(job_id)
+            self._jobs[job_id] = job
+        self._executor.submit(self._run, job, func, args, kwargs)
+        return job, True
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """残りの試行を打ち切る（その時点の最良解で done になる）。ジョブが無ければ None"""
+        job = self.get(job_id)
+        if job is not None:
+            job.cancel_event.set()
+        return job
+
+    def _run(self, job, func, args, kwargs):
+        job._set(status=RUNNING)
+        try:
+            allocation, stats = func(*args, on_progress=job.update_progress, cancel=job.cancel_event, **kwargs)
+        except Exception as e:
+            job._set(status=FAILED, error=str(e), finished=time.time())
+            return
+        job._set(status=DONE, allocation=allocation, stats=stats, finished=time.time())
+
+    def _prune(self):
+        now = time.time()
+        for job_id, job in list(self._jobs.items()):
+            if job.finished is not None and now - job.finished > self.ttl:
+                del self._jobs[job_id]
+        # 上限を超えた分は古い終了済みジョブから捨てる（実行中のものは残す）
+        for job_id, job in list(self._jobs.items()):
+            if len(self._jobs) <= self.max_jobs:
+                break
+            if job.finished is not None:
+                del self._jobs[job_id]
+
+
+_default_registry = None
+_default_registry_lock = threading.Lock()
+
+
+def get_default_registry():
+    """settings（SIDEWIND_JOB_WORKERS / SIDEWIND_JOB_TTL）から共有レジストリを1度だけ作る"""
+    global _default_registry
+    with _default_registry_lock:
+        if _default_registry is None:
+            from django.conf import settings
+            _default_registry = JobRegistry(
+                max_workers=getattr(settings, 'SIDEWIND_JOB_WORKERS', 1),
+                ttl=getattr(settings, 'SIDEWIND_JOB_TTL', 600),
+            )
+        return _default_registry
+
+
+def submit_allocation(rooms, eco_rooms, eco_out_rooms, twin_rooms, bath_rooms, housekeepers,
+                      single_time, twin_time, eco_time, bath_time, registry=None, **options):
+    """
+    assign_rooms_cached をバックグラウンドで実行し (job, 新規かどうか) を返す。
+    ジョブIDは結果に影響する入力のキャッシュキー
+    """
+    registry = registry if registry is not None else get_default_registry()
+    job_id = make_cache_key(rooms, eco_rooms, eco_out_rooms, twin_rooms, housekeepers, **result_options(options))
+    return registry.submit(
+        job_id, assign_rooms_cached,
+        rooms, eco_rooms, eco_out_rooms, twin_rooms, bath_rooms, housekeepers,
+        single_time, twin_time, eco_time, bath_time, **options
+    )
@@ -0,0 +1,99 @@
+"""
+翻訳の接続状態（サーキットブレーカー）
+- 接続確認と翻訳エンジン（googletrans / deep_translator / cloud）ごとに状態を持ち、スレッド間で共有する
+- 成功した接続確認は ttl 秒使い回す（文字列ごとに確認しない）
+- 失敗したら backoff 秒（連続失敗ごとに倍、最大 max_backoff 秒）は試さずに即座に失敗扱いにする
+- 待ち時間が過ぎたら1スレッドだけ再試行させ（他のスレッドは待たずに失敗扱い）、成功すれば自動で復帰する
+"""
+
+import threading
+import time
+
+
+class _State:
+    def __init__(self):
+        self.failures = 0
+        self.open_until = 0.0
+        self.ok_at = None
+
+
+class CircuitBreaker:
+    """名前（接続確認・翻訳エンジン）ごとの成功・失敗の記録と、試してよいかの判定"""
+
+    def __init__(self, ttl=60, backoff=5, max_backoff=300, clock=time.monotonic):
+        self.ttl = ttl
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.clock = clock
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def _state(self, name):
+        state = self._states.get(name)
+        if state is None:
+            state = self._states[name] = _State()
+        return state
+
+    def recently_ok(self, name):
+        """ttl 秒以内に成功していれば True（確認を省略してよい）"""
+        with self._lock:
+            state = self._state(name)
+            return state.ok_at is not None and self.clock() - state.ok_at < self.ttl
+
+    def allow(self, name):
+        """
+        試してよいか。失敗後の待ち時間中は False。
+        待ち時間が過ぎた最初の呼び出しだけ True を返す。その試行の結果が記録されるまで、他の呼び出しは
+        待たずにすぐ False を受け取る（呼び出し側は次の翻訳エンジン・未翻訳の文字列に進む）
+        """
+        with self._lock:
+            state = self._state(name)
+            now = self.clock()
+            if now < state.open_until:
+                return False
+            if state.failures:
+                # 再試行中（半開）。結果の記録までは他のスレッドには即座に False を返す
+                state.open_until = now + self._delay(state.failures)
+            return True
+
+    def success(self, name):
+        with self._lock:
+            state = self._state(name)
+            state.failures = 0
+            state.open_until = 0.0
+            state.ok_at = self.clock()
+
+    def failure(self, name):
+        with self._lock:
+            state = self._state(name)
+            state.failures += 1
+            state.ok_at = None
+            state.open_until = self.clock() + self._delay(state.failures)
+
+    def status(self):
+        """{名前: {'failures', 'retry_in'}}（ログ・画面表示用）"""
+        with self._lock:
+            now = self.clock()
+            return {name: {'failures': state.failures, 'retry_in': max(0.0, state.open_until - now)}
+                    for name, state in self._states.items()}
+
+    def _delay(self, failures):
+        return min(self.backoff * 2 ** (failures - 1), self.max_backoff)
+
+
+_default_breaker = None
+_default_breaker_lock = threading.Lock()
+
+
+def get_default_breaker():
+    """settings（TRANSLATION_HEALTH_TTL / TRANSLATION_BACKOFF / TRANSLATION_MAX_BACKOFF）から共有のブレーカーを1度だけ作る"""
+    global _default_breaker
+    with _default_breaker_lock:
+        if _default_breaker is None:
+            from django.conf import settings
+            _default_breaker = CircuitBreaker(
+                ttl=getattr(settings, 'TRANSLATION_HEALTH_TTL', 60),
+                backoff=getattr(settings, 'TRANSLATION_BACKOFF', 5),
+                max_backoff=getattr(settings, 'TRANSLATION_MAX_BACKOFF', 300),
+            )
+        return _default_breaker
@@ -0,0 +1,121 @@
+"""
+翻訳メモリ
+- (原文, 翻訳元言語, 翻訳先言語, 翻訳エンジン) をキーに翻訳結果を保存する
+- メモリ上のLRUと、任意でSQLiteファイルの2段構成（毎日同じ備考・週次作業の翻訳を再利用する）
+- 翻訳に失敗した（原文のまま返った）結果は保存しない
+"""
+
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+
+class TranslationMemory:
+    """LRU（メモリ）+ 任意のSQLite層を持つ翻訳メモリ"""
+
+    def __init__(self, path=None, max_entries=1024):
+        self.path = Path(path) if path else None
+        self.max_entries = max_entries
+        # (原文, src, dest) → (backend, 訳文)。エンジンを問わない検索用
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db_ready = False
+
+    def lookup(self, text, src, dest):
+        """保存済みの訳文を返す（どのエンジンの結果でもよい）。無ければ None"""
+        key = (text, src, dest)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key][1]
+
+        row = self._load(text, src, dest)
+        if row is None:
+            return None
+        backend, result = row
+        self._remember(key, backend, result)
+        return result
+
+    def store(self, text, src, dest, backend, result):
+        if not text or not result or result == text:
+            return
+        self._remember((text, src, dest), backend, result)
+        self._save(text, src, dest, backend, result)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _remember(self, key, backend, result):
+        with self._lock:
+            self._entries[key] = (backend, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=5)
+        if not self._db_ready:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS translations ('
+                ' source TEXT NOT NULL, src TEXT NOT NULL, dest TEXT NOT NULL, backend TEXT NOT NULL,'
+                ' result TEXT NOT NULL, created REAL NOT NULL,'
+                ' PRIMARY KEY (source, src, dest, backend))'
+            )
+            self._db_ready = True
+        return connection
+
+    def _load(self, text, src, dest):
+        if self.path is None:
+            return None
+        try:
+            with self._lock:
+                connection = self._connect()
+                try:
+                    return connection.execute(
+                        'SELECT backend, result FROM translations WHERE source = ? AND src = ? AND dest = ?'
+                        ' ORDER BY created DESC LIMIT 1',
+                        (text, src, dest),
+                    ).fetchone()
+                finally:
+                    connection.close()
+        except sqlite3.Error:
+            return None
+
+    def _save(self, text, src, dest, backend, result):
+        if self.path is None:
+            return
+        try:
+            with self._lock:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                connection = self._connect()
+                try:
+                    with connection:
+                        connection.execute(
+                            'INSERT OR REPLACE INTO translations (source, src, dest, backend, result, created)'
+                            ' VALUES (?, ?, ?, ?, ?, ?)',
+                            (text, src, dest, backend, result, time.time()),
+                        )
+                finally:
+                    connection.close()
+        except (OSError, sqlite3.Error):
+            pass  # 書けなくてもメモリ層は有効
+
+
+_default_memory = None
+_default_memory_lock = threading.Lock()
+
+
+def get_default_memory():
+    """settings（TRANSLATION_MEMORY_SIZE / TRANSLATION_MEMORY_PATH）から共有の翻訳メモリを1度だけ作る"""
+    global _default_memory
+    with _default_memory_lock:
+        if _default_memory is None:
+            from django.conf import settings
+            _default_memory = TranslationMemory(
+                path=getattr(settings, 'TRANSLATION_MEMORY_PATH', None),
+                max_entries=getattr(settings, 'TRANSLATION_MEMORY_SIZE', 1024),
+            )
+        return _default_memory
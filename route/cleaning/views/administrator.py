@@ -15,6 +15,8 @@ from django.utils.decorators import method_decorator
 from django.views.generic import TemplateView
 from functools import wraps
 
+from ..utils.master_data import invalidate_master_data
+
 
 MASTER_DIR = Path(settings.BASE_DIR) / "static" / "csv"
 LOG_DIR = Path(settings.BASE_DIR) / "logs"
@@ -186,6 +188,7 @@ class administratorView(TemplateView):
             target = MASTER_DIR / name
             target.write_text(body, encoding="utf-8")
             message = "マスタデータを作成しました。"
+            invalidate_master_data()
 
         elif action == "update_master":
             master_id = request.POST.get("master_id")
@@ -200,6 +203,7 @@ class administratorView(TemplateView):
                 if src.name != dst.name:
                     src.rename(dst)
                 message = "マスタデータを更新しました。"
+                invalidate_master_data()
 
         elif action == "delete_master":
             master_id = request.POST.get("master_id")
@@ -207,6 +211,7 @@ class administratorView(TemplateView):
             if target.exists():
                 target.unlink()
                 message = "マスタデータを削除しました。"
+                invalidate_master_data()
 
         elif action == "delete_logs":
             removed = 0
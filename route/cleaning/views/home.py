@@ -5,7 +5,9 @@ import datetime
 import json
 from django.http import JsonResponse
 from urllib.parse import urlparse
-from ..utils.home_util import read_csv, processing_list, dist_room, room_person, room_char, parse_room_types, dist_room_by_type
+from ..utils.home_util import room_person, room_char
+from ..utils.master_data import get_master_data
+from .sidewind_front import collect_sidewind_job
 import logging
 from django.http import HttpResponse
 
@@ -22,6 +24,8 @@ class homeView(TemplateView):
     
     def get(self, request, *args, **kwargs):
         method = 'GET'
+        # バックグラウンドのSidewindジョブが終わっていれば結果を取り込む
+        collect_sidewind_job(request)
         sidewind_flag = request.session.get('sidewind_flag')
         if sidewind_flag is True:
             request.session['sidewind_flag'] = False
@@ -49,17 +53,18 @@ class homeView(TemplateView):
             bath_person = request.session.get('bath_person', [])
 
             #csv読み込み
-            room_info_data, times_by_time_data, master_key_data = read_csv()
+            master = get_master_data()
+            master_key_data = master.master_key_data
         
             #部屋を階別に二次元配列へ加工
-            room_num_table = processing_list(room_info_data)
+            room_num_table = master.room_num_table
             
             #部屋をタイプ別に一次元配列に加工
-            single_room_list, twin_room_list = dist_room(room_info_data)
+            single_room_list, twin_room_list = master.single_rooms, master.twin_rooms
 
             #動的ルームタイプ
-            room_types, default_bath_time, default_eco_time = parse_room_types(times_by_time_data)
-            rooms_by_type = dist_room_by_type(room_info_data)
+            room_types, default_bath_time, default_eco_time = master.room_type_list(), master.bath_time, master.eco_time
+            rooms_by_type = master.rooms_by_type
             # sidewind戻り: session の single_time/twin_time で room_types を上書き
             for rt in room_types:
                 if rt['code'] == 'S':
@@ -163,17 +168,18 @@ class homeView(TemplateView):
 
         #初回アクセス時
         #csv読み込み
-        room_info_data, times_by_time_data, master_key_data = read_csv()
+        master = get_master_data()
+        master_key_data = master.master_key_data
         
         #部屋を階別に二次元配列へ加工
-        room_num_table = processing_list(room_info_data)
+        room_num_table = master.room_num_table
         
         #部屋をタイプ別に一次元配列に加工
-        single_room_list, twin_room_list = dist_room(room_info_data)
+        single_room_list, twin_room_list = master.single_rooms, master.twin_rooms
 
         #動的ルームタイプ
-        room_types, default_bath_time, default_eco_time = parse_room_types(times_by_time_data)
-        rooms_by_type = dist_room_by_type(room_info_data)
+        room_types, default_bath_time, default_eco_time = master.room_type_list(), master.bath_time, master.eco_time
+        rooms_by_type = master.rooms_by_type
 
         combined_rooms = []
         for i in range(len(room_num_table)):
@@ -253,13 +259,14 @@ class homeView(TemplateView):
             unuse_rooms = [r for r in unuse_room_list.split(',') if r]
             guest_counts_json = request.POST.get('guest_counts_json', '{}')
             
-            room_info_data, times_by_time_data, master_key_data = read_csv()
-            room_num_table = processing_list(room_info_data)
-            single_room_list, twin_room_list = dist_room(room_info_data)
+            master = get_master_data()
+            master_key_data = master.master_key_data
+            room_num_table = master.room_num_table
+            single_room_list, twin_room_list = master.single_rooms, master.twin_rooms
 
             #動的ルームタイプ
-            room_types, default_bath_time, default_eco_time = parse_room_types(times_by_time_data)
-            rooms_by_type = dist_room_by_type(room_info_data)
+            room_types, default_bath_time, default_eco_time = master.room_type_list(), master.bath_time, master.eco_time
+            rooms_by_type = master.rooms_by_type
 
             combined_rooms = []
             for floor in room_num_table:
@@ -328,17 +335,18 @@ class homeView(TemplateView):
             return JsonResponse({'error': 'json file not provided'}, status=400)
 
         #csv読み込み
-        room_info_data, times_by_time_data, master_key_data = read_csv()
+        master = get_master_data()
+        master_key_data = master.master_key_data
         
         #部屋を階別に二次元配列へ加工
-        room_num_table = processing_list(room_info_data)
+        room_num_table = master.room_num_table
         
         #部屋をタイプ別に一次元配列に加工
-        single_room_list, twin_room_list = dist_room(room_info_data)
+        single_room_list, twin_room_list = master.single_rooms, master.twin_rooms
 
         #動的ルームタイプ
-        room_types, default_bath_time, default_eco_time = parse_room_types(times_by_time_data)
-        rooms_by_type = dist_room_by_type(room_info_data)
+        room_types, default_bath_time, default_eco_time = master.room_type_list(), master.bath_time, master.eco_time
+        rooms_by_type = master.rooms_by_type
 
         #編集情報の取得
         editor_name = data['editor_name']
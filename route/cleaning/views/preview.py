@@ -3,8 +3,9 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.views.generic import TemplateView
 
 import json
-from ..utils.preview_util import catch_post, is_bath, weekly_cleaning,calc_room, calc_end_time, changeDate, search_bath_person, search_remarks_name_list, get_cover, select_person_from_room_change, add_rc, split_contact_textarea, calc_room_type_count, calc_DD_list, calc_cover_remarks, special_clean, multiple_night, language, get_room_type_times, get_csv_preview_labels
-from ..utils.home_util import read_csv, parse_room_types, dist_room_by_type
+from ..utils.preview_util import catch_post, is_bath, weekly_cleaning,calc_room, RoomIndex, bucket_rooms_by_person, translate_all, translation_texts, calc_end_time, changeDate, search_bath_person, search_remarks_name_list, get_cover, select_person_from_room_change, add_rc, split_contact_textarea, calc_room_type_count, calc_DD_list, calc_cover_remarks, special_clean, multiple_night, language, get_room_type_times, get_csv_preview_labels
+from ..utils.master_data import get_master_data
+from ..utils.label_catalog import get_label_catalog
 
 # Create your views here.
 
@@ -28,9 +29,9 @@ class previewView(TemplateView):
 
         #動的ルームタイプデータ
         room_type_times = get_room_type_times(request)
-        room_info_data, times_by_time_data, _ = read_csv()
-        room_types_list, _, _ = parse_room_types(times_by_time_data)
-        rooms_by_type = dist_room_by_type(room_info_data)
+        master = get_master_data()
+        room_types_list = master.room_type_list()
+        rooms_by_type = master.rooms_by_type
 
         #連泊入力の受け取り
         try:
@@ -80,11 +81,15 @@ class previewView(TemplateView):
             if i != '':
                 add_bath.append(i)
         
+        #部屋属性の索引・パーソン別の部屋（全ページ共通、1度だけ作る）
+        room_index = RoomIndex(eco_rooms, duvet_rooms, ame_rooms, remarks, single_rooms, twin_rooms, multiple_rooms, outins, spots, rooms_by_type=rooms_by_type, soto_ame_rooms=soto_ame_rooms)
+        room_buckets = bucket_rooms_by_person(room_inputs)
+        label_catalog = get_label_catalog()
+        #英語ページで使う備考・スポット・連絡事項をまとめて先に翻訳する
+        en_persons = [i+1 for i in range(pages) if house_data[i][4] == True]
+        translations = translate_all(translation_texts(en_persons, contacts, room_index, room_buckets)) if en_persons else {}
+
         #DDリストの作成
-        rooms = []
-        for i in range(pages):
-            room, floor = calc_room(room_inputs, eco_rooms, duvet_rooms, ame_rooms, remarks, i+1, single_rooms, twin_rooms, multiple_rooms,outins, spots, 'ja', rooms_by_type=rooms_by_type, soto_ame_rooms=soto_ame_rooms)
-            rooms.append(room)
         DD_list = calc_DD_list(house_data)
 
         total_data = []
@@ -104,7 +109,7 @@ class previewView(TemplateView):
             key = house_data[i][2]
             bath = is_bath(bath_person, i+1)
             weekly = weekly_cleaning(date)
-            room, floor = calc_room(room_inputs, eco_rooms, duvet_rooms, ame_rooms, remarks, i+1, single_rooms, twin_rooms,multiple_rooms,outins,spots, lang, rooms_by_type=rooms_by_type, soto_ame_rooms=soto_ame_rooms)
+            room, floor = calc_room(room_inputs, eco_rooms, duvet_rooms, ame_rooms, remarks, i+1, single_rooms, twin_rooms,multiple_rooms,outins,spots, lang, rooms_by_type=rooms_by_type, soto_ame_rooms=soto_ame_rooms, index=room_index, buckets=room_buckets, translations=translations)
             #宿泊人数を連泊中の部屋のみに追加
             for r in room:
                 if r.get('multiple'):
@@ -122,7 +127,7 @@ class previewView(TemplateView):
                     contact = item['contact']
                     break
             if lang == 'en':
-                contact = language(None,lang,contact)
+                contact = translations[contact] if contact in translations else language(None,lang,contact)
             if contact != '':
                 contact_1, contact_2, contact_3, contact_4 = split_contact_textarea(contact)
             else:
@@ -133,6 +138,8 @@ class previewView(TemplateView):
             
             #部屋タイプ別カウント
             room_type_count_str = calc_room_type_count(room, room_types=room_types_list)
+            #ページ共通のラベル（言語ごとに1度だけ組み立てたもの）
+            page_labels = label_catalog.page_labels(lang)
             
             persons_cleaning_data = {
                 'name':name,
@@ -156,37 +163,7 @@ class previewView(TemplateView):
                 'contact_4':contact_4,
                 'room_type_count_str':room_type_count_str,
                 'DD_list':DD_list[i],
-                'charge':language('charge',lang,None),
-                'title':language('title',lang,None),
-                'consecutive_nights':language('consecutive_nights',lang,None),
-                'eco':language('eco',lang,None),
-                'duvet':language('duvet',lang,None),
-                'remark':language('remark',lang,None),
-                'cleaned':language('cleaned',lang,None),
-                'inspection':language('inspection',lang,None),
-                'public_bath_cleaning':language('public_bath_cleaning',lang,None),
-                'public_bath_cleaning_please':language('public_bath_cleaning_please',lang,None),
-                'master_key_number':language('master_key_number',lang,None),
-                'target_completion_time_for_cleaning':language('target_completion_time_for_cleaning',lang,None),
-                'cleaning_completion_time':language('cleaning_completion_time',lang,None),
-                'spot_cleaning':language('spot_cleaning',lang,None),
-                'meating':language('meating',lang,None),
-                'author':language('author',lang,None),
-                'early_shift':language('early_shift',lang,None),
-                'inspection_charge':language('inspection_charge',lang,None),
-                'sign':language('sign',lang,None),
-                'notice':language('notice',lang,None),
-                'special_cleaning':language('special_cleaning',lang,None),
-                'line_first':language('line_first',lang,None),
-                'airconditioner_filter_cleaning':language('airconditioner_filter_cleaning',lang,None),
-                'units':language('units',lang,None),
-                'line_second':language('line_second',lang,None),
-                'line_third':language('line_third',lang,None),
-                'room_number':language('room_number',lang,None),
-                'forget':language('forget',lang,None),
-                'hotel_name':language('hotel_name',lang,None),
-                'declaration':language('declaration',lang,None),
-                'signature':language('signature',lang,None)
+                **page_labels,
             }
             total_data.append(persons_cleaning_data)
         #大浴場清掃担当者の名前リスト化
@@ -1,7 +1,8 @@
 from django.shortcuts import render
 from django.shortcuts import render, redirect, get_object_or_404
 from django.views.generic import TemplateView
-from ..utils.home_util import read_csv, processing_list, dist_room, room_person, room_char
+from ..utils.home_util import room_person, room_char
+from ..utils.master_data import get_master_data
 
 import io
 import re
@@ -40,8 +41,9 @@ class roomingListView(TemplateView):
         #csv読み込み
         today_data = read_csv_from_wincal(today_csv)
         tomorrow_data = read_csv_from_wincal(tomorrow_csv)
-        room_info_data, times_by_time_data, master_key_data = read_csv()
-        room_number_list = rooms = [x[0] for x in room_info_data]
+        master = get_master_data()
+        master_key_data = master.master_key_data
+        room_number_list = rooms = [x[0] for x in master.room_info_data]
         
         #翌日CSVから宿泊人数取得
         guest_counts = {}
@@ -70,13 +72,14 @@ class roomingListView(TemplateView):
         #home遷移用
         from_report = False  
         #csv読み込み
-        room_info_data, times_by_time_data, master_key_data = read_csv()
+        master = get_master_data()
+        master_key_data = master.master_key_data
         
         #部屋を階別に二次元配列へ加工
-        room_num_table = processing_list(room_info_data)
+        room_num_table = master.room_num_table
         
         #部屋をタイプ別に一次元配列に加工
-        single_room_list, twin_room_list = dist_room(room_info_data)
+        single_room_list, twin_room_list = master.single_rooms, master.twin_rooms
         combined_rooms = []
         for i in range(len(room_num_table)):
             floor_data = []
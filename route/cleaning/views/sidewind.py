@@ -4,9 +4,11 @@ from django.views.generic import TemplateView
 import datetime
 import json
 from django.http import JsonResponse
+from django.conf import settings
 from urllib.parse import urlparse
 from ..utils.preview_util import catch_post, multiple_night, multiple_night_cleans, get_cover
-from ..utils.home_util import read_csv, processing_list, dist_room, room_person, room_char
+from ..utils.home_util import room_person, room_char
+from ..utils.master_data import get_master_data
 import os
 import traceback
 # Create your views here.
@@ -45,11 +47,12 @@ class sidewindView(TemplateView):
             others = ''
 
         #csv読み込み
-        room_info_data, times_by_time_data, master_key_data = read_csv()
+        master = get_master_data()
+        master_key_data = master.master_key_data
         #部屋を階別に二次元配列へ加工
-        room_num_table = processing_list(room_info_data)
+        room_num_table = master.room_num_table
         #部屋をタイプ別に一次元配列に加工
-        single_room_list, twin_room_list = dist_room(room_info_data)
+        single_room_list, twin_room_list = master.single_rooms, master.twin_rooms
         
         #部屋情報の表示用リスト作成
         combined_rooms = room_person(room_num_table, room_inputs)
@@ -92,6 +95,7 @@ class sidewindView(TemplateView):
             'must_cleans':must_cleans,
             'others':others,
             'guest_counts_json':request.POST.get('guest_counts_json', '{}'),
+            'sidewind_async':getattr(settings, 'SIDEWIND_ASYNC', False),
         }
         return render(self.request, self.template_name, context)
     
\ No newline at end of file
@@ -1,10 +1,18 @@
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import redirect
 from django.urls import reverse
-from ..utils.sidewind_core import assign_rooms
-from ..utils.home_util import read_csv
+from ..utils.sidewind_cache import assign_rooms_cached
+from ..utils.sidewind_core import reassign_rooms
+from ..utils.sidewind_jobs import get_default_registry, submit_allocation, DONE, FAILED
+from ..utils.master_data import get_master_data
 from ..utils.preview_util import multiple_night, multiple_night_cleans, get_cover, catch_post
 import datetime
 from collections import Counter, defaultdict, OrderedDict
+import json
+import logging
+
+logger = logging.getLogger('django')
 
 def verify_quota_match(rooms, eco_rooms, eco_out_rooms, housekeepers, twin_rooms):
     """
@@ -62,95 +70,388 @@ def verify_quota_match(rooms, eco_rooms, eco_out_rooms, housekeepers, twin_rooms
     total_twin_quota = sum(h.get("twin_quota", 0) for h in housekeepers)
 
 
+def reassign_from_session(request, rooms, eco_rooms, eco_out_rooms, twin_rooms, housekeepers):
+    """
+    セッションに残っている前回のSidewind結果を起点に、変わった部屋・HKだけを再配置する。
+
+    Returns
+    -------
+    (allocation, stats)
+        前回の結果が無い、またはHKの人数が変わった場合は (None, None)（全体を再計算する）
+    """
+    previous = request.session.get('allocation')
+    hk_id_map = dict(request.session.get('sidewind_hk_id_map') or [])
+    if not previous or sorted(hk_id_map) != sorted(h['id'] for h in housekeepers):
+        return None, None
+
+    # 前回の指示書の番号に合わせてHKを読み替え、設定の変わったHKを抽出
+    labeled = [dict(h, id=hk_id_map[h['id']]) for h in housekeepers]
+    previous_housekeepers = {h['id']: h for h in request.session.get('sidewind_housekeepers') or []}
+    changed = [h['id'] for h in labeled if previous_housekeepers.get(h['id']) != h]
+
+    previous = {int(r): h for r, h in previous.items() if isinstance(h, int)}
+    current = set(rooms) | set(eco_rooms) | set(eco_out_rooms)
+    added = sorted(current - set(previous))
+    removed = sorted(set(previous) - current)
+
+    allocation, stats = reassign_rooms(previous, added, removed, changed, eco_rooms, eco_out_rooms, twin_rooms, labeled)
+    stats['hk_id_map'] = sorted(hk_id_map.items())
+    return allocation, stats
+
+
+def _parse_post(request):
+    """sidewind画面のPOSTを探索の入力とセッション用の値にまとめる（セッションに保存できる型のみ）"""
+    #POSTデータ受け取り
+    name = request.POST.get('editor_name')
+    date = request.POST.get('date')
+    single_time = int(request.POST.get('single_time'))
+    twin_time = int(request.POST.get('twin_time'))
+    bath_time = int(request.POST.get('bath_time'))
+
+    #quota関連処理
+    post_quota = []
+    for i in range(1, 21):
+        room_num = request.POST.get(f'room_num_{i}')
+        house_person = request.POST.get(f'house_person_{i}')
+        twin_room = request.POST.get(f'twin_room_{i}')
+        public_bath = request.POST.get(f'public_bath_{i}')
+        if public_bath == 'on':
+            public_bath = True
+        else:
+            public_bath = False
+
+        if any(x != None for x in (room_num, house_person)):
+            if len(room_num) != 0 and len(house_person) != 0:
+                post_quota.append([room_num, house_person, twin_room if twin_room and len(twin_room) > 0 else '-1', public_bath])
+    housekeepers = []
+    id = 1
+    for i in post_quota:
+        for j in range(int(i[1])):
+            housekeepers.append({'id':id, 'room_quota':int(i[0]), 'twin_quota':int(i[2]), 'has_bath':i[3]})
+            id += 1
+
+    #部屋処理
+    eco_rooms = [int(x) for x in request.POST.getlist('eco_room') if x != '']
+    eco_out_rooms = [int(x) for x in request.POST.getlist('amenity') if x != '']
+    soto_ame_rooms = [int(x) for x in request.POST.getlist('soto_ame') if x != '']
+    duvet_rooms = [int(x) for x in request.POST.getlist('duvet') if x != '']
+    # アルゴリズム用：エコ外と外アメを結合
+    all_eco_out_rooms = eco_out_rooms + soto_ame_rooms
+
+    #連泊入力の受け取り
+    try:
+        multiple_rooms = multiple_night(request)
+    except Exception as e:
+        multiple_rooms = []
+
+    #連泊清掃入力の受け取り
+    try:
+        multiple_night_cleans_list = multiple_night_cleans(request)
+    except Exception as e:
+        multiple_night_cleans_list = []
+
+    #カバー情報の受け取り（ルームチェンジ、アウトイン、要清掃、その他備考）
+    try:
+        room_changes, outins, must_cleans, others, _ = get_cover(request)
+    except Exception as e:
+        room_changes = []
+        outins = []
+        must_cleans = []
+        others = ''
+
+    #その他の情報を取得
+    try:
+        _, _, _, _, _, bath_person, remarks, house_data, _, _, _, _, _, _, contacts, spots, _ = catch_post(request)
+    except Exception as e:
+        bath_person = []
+        remarks = []
+        house_data = []
+        contacts = []
+        spots = []
+
+    master = get_master_data()
+    twin_rooms = [int(r) for r in master.twin_rooms]
+    room_inputs = {}  # { room_number: value }
+    for key, value in request.POST.items():
+        if key.startswith("room_"):
+            room_number = key.replace("room_", "")
+            if len(room_number) < 5:
+                room_inputs[room_number] = value.strip()
+    full_clean_rooms = []
+    for room, status in room_inputs.items():
+        if status != '0' and room not in all_eco_out_rooms and room not in eco_rooms :
+            full_clean_rooms.append(int(room))
+    full_clean_rooms = sorted(full_clean_rooms,key=int)
+
+    eco_time = master.eco_time
+    all_rooms = list(master.all_rooms)
+
+    no_clean_rooms = [int(r) for r in all_rooms if r not in full_clean_rooms + eco_rooms + all_eco_out_rooms]
+    # 通常清掃部屋（探索には {room: None} の形で渡す）
+    rooms = [r for r in full_clean_rooms if r not in eco_rooms + all_eco_out_rooms]
+
+    return {
+        'name': name,
+        'date': date,
+        'single_time': single_time,
+        'twin_time': twin_time,
+        'bath_time': bath_time,
+        'eco_time': eco_time,
+        'housekeepers': housekeepers,
+        'rooms': rooms,
+        'all_rooms': all_rooms,
+        'no_clean_rooms': no_clean_rooms,
+        'twin_rooms': twin_rooms,
+        'eco_rooms': eco_rooms,
+        'eco_out_rooms': eco_out_rooms,
+        'soto_ame_rooms': soto_ame_rooms,
+        'all_eco_out_rooms': all_eco_out_rooms,
+        'duvet_rooms': duvet_rooms,
+        'room_inputs': room_inputs,
+        'multiple_rooms': multiple_rooms,
+        'multiple_night_cleans': multiple_night_cleans_list,
+        'room_changes': room_changes,
+        'outins': outins,
+        'must_cleans': must_cleans,
+        'others': others,
+        'bath_person': bath_person,
+        'remarks': remarks,
+        'contacts': contacts,
+        'spots': spots,
+        'guest_counts_json': request.POST.get('guest_counts_json', '{}'),
+    }
+
+
+def _search_options():
+    """settings から探索オプションを組み立てる"""
+    return {
+        'workers': getattr(settings, 'SIDEWIND_WORKERS', 1),
+        'time_limit': getattr(settings, 'SIDEWIND_TIME_LIMIT', None),
+        'local_search_iterations': getattr(settings, 'SIDEWIND_LOCAL_SEARCH_ITERATIONS', 0),
+        'engine': getattr(settings, 'SIDEWIND_ENGINE', 'heuristic'),
+        'exact_time_limit': getattr(settings, 'SIDEWIND_EXACT_TIME_LIMIT', 10),
+        'profile': getattr(settings, 'SIDEWIND_PROFILE', False),
+    }
+
+
+def _is_async(request):
+    """バックグラウンドジョブで実行するか（設定が有効で、画面のJSからの送信の場合のみ）"""
+    return (getattr(settings, 'SIDEWIND_ASYNC', False)
+            and request.headers.get('X-Requested-With') == 'XMLHttpRequest')
+
+
+def _store_result(request, form, allocation, search_stats):
+    """割り当て結果を集計表示し、home 画面用にセッションへ保存する"""
+    logger.info('sidewind search attempts=%s best_score=%s best_errors=%s stopped_by=%s engine=%s cache=%s',
+                search_stats.get('attempts'), search_stats.get('best_score'), search_stats.get('best_errors'),
+                search_stats.get('stopped_by'), search_stats.get('engine'), search_stats.get('cache'))
+    hk_id_map = dict(search_stats['hk_id_map'])
+    housekeepers = form['housekeepers']
+    all_rooms = form['all_rooms']
+    eco_rooms = form['eco_rooms']
+    eco_out_rooms = form['eco_out_rooms']
+    soto_ame_rooms = form['soto_ame_rooms']
+    all_eco_out_rooms = form['all_eco_out_rooms']
+    twin_rooms = form['twin_rooms']
+    room_inputs = form['room_inputs']
+    rooms = form['rooms']
+
+    all_allocation = allocation
+
+    # ============================================================
+    #  出力
+    # ============================================================
+    print(f"\n全室数: {len(all_rooms)}室")
+    print(f"清掃不要部屋: {len(form['no_clean_rooms'])}室")
+    print(f"通常清掃部屋: {len(rooms)}室")
+    print(f"エコ部屋: {len(eco_rooms)}室 / エコ外: {len(eco_out_rooms)}室 / 外アメ: {len(soto_ame_rooms)}室")
+
+    #print("\n=== 自動割り当て結果（全室・上位表示） ===")
+    for r in sorted(all_allocation.keys()):
+        tag = ""
+        if r in eco_rooms:
+            tag = "（エコ）"
+        elif r in eco_out_rooms:
+            tag = "（エコ外）"
+        elif r in soto_ame_rooms:
+            tag = "（外アメ）"
+        elif r in twin_rooms:
+            tag = "（ツイン）"
+        #print(f"部屋 {r:4} → ハウス {all_allocation[r]} {tag}")
+
+    # ---------- ハウス別集計 ----------
+    print("\n=== ハウス別担当数 ===")
+    eco_set = set(eco_rooms + all_eco_out_rooms)
+    normal_set = set(rooms)  # 通常部屋のみ
+
+    normal_count = {}
+    eco_count = {}
+    total_count = {}
+
+    for h in housekeepers:
+        hid = h["id"]
+
+        # ←ここを修正：「通常部屋集合」のみ対象にする
+        normal = sum(1 for r in normal_set if all_allocation.get(r) == hid)
+
+        # eco部屋は別集合でカウント
+        eco = sum(1 for r in eco_set if all_allocation.get(r) == hid)
+
+        total = normal + eco
+        normal_count[hid] = normal
+        eco_count[hid] = eco
+        total_count[hid] = total
+
+        print(f"ハウス{hid:2}: 通常={normal:2d} / エコ={eco:2d} / 合計={total:2d} ")
+
+    print(f"\n合計: 通常={sum(normal_count.values())} / エコ={sum(eco_count.values())} / 全体={sum(total_count.values())}")
+
+    # ---------- ツイン数分布 ----------
+    print("\n=== ハウス別ツイン数 ===")
+    for h in housekeepers:
+        hid = h["id"]
+        twins = sum(1 for r in twin_rooms if all_allocation.get(r) == hid)
+        print(f"ハウス{hid:2}: ツイン={twins}")
+
+    # ---------- ハウス別担当階 ----------
+    print("\n=== ハウス別担当階 ===")
+    floors_by_house = defaultdict(set)
+    for r, hid in all_allocation.items():
+        floors_by_house[hid].add(r // 100)
+
+    for h in housekeepers:
+        hid = h["id"]
+        floors = sorted(floors_by_house[hid])
+        floor_str = ", ".join(f"{f}F" for f in floors) if floors else "なし"
+        print(f"ハウス{hid:2}: {floor_str}")
+
+    # ---------- 接続用 ----------
+    sorted_allocation = OrderedDict()
+
+    # 全部屋番号を昇順にソートしてループ
+    for r in sorted(all_rooms):
+        if r in all_allocation:
+            sorted_allocation[r] = all_allocation[r]
+        else:
+            # 元の入力値を確認：'0'が入力されていた場合は'0'、それ以外は空文字列
+            sorted_allocation[r] = room_inputs.get(str(r), '')
+
+    # 出力（人間可読 / JSON両対応）
+    #print("\n=== 接続用データ配列（全室・未割当=0） ===")
+    #print(sorted_allocation)
+
+    print('eco_rooms:', eco_rooms)
+    print('eco_out_rooms:', eco_out_rooms)
+    print('soto_ame_rooms:', soto_ame_rooms)
+    print('allocation:', sorted_allocation)
+
+    #セッション
+    request.session['sidewind_flag'] = True
+    request.session['allocation'] = sorted_allocation
+    request.session['sidewind_hk_id_map'] = sorted(hk_id_map.items())
+    request.session['sidewind_housekeepers'] = [dict(h, id=hk_id_map[h['id']]) for h in housekeepers]
+    request.session['editor_name'] = form['name']
+    request.session['date'] = form['date']
+    request.session['single_time'] = form['single_time']
+    request.session['twin_time'] = form['twin_time']
+    request.session['bath_time'] = form['bath_time']
+    request.session['eco_rooms'] = eco_rooms
+    request.session['ame'] = eco_out_rooms
+    request.session['soto_ame'] = soto_ame_rooms
+    request.session['duvet'] = form['duvet_rooms']
+    request.session['multiple_rooms'] = form['multiple_rooms']
+    request.session['multiple_night_cleans'] = form['multiple_night_cleans']
+    request.session['room_changes'] = form['room_changes']
+    request.session['outins'] = form['outins']
+    request.session['must_cleans'] = form['must_cleans']
+    request.session['others'] = form['others']
+    request.session['remarks'] = form['remarks']
+    request.session['contacts'] = form['contacts']
+    request.session['spots'] = form['spots']
+    bath_staff = [h['id'] for h in housekeepers if h['has_bath']]
+    request.session['bath_staff'] = bath_staff
+    request.session['bath_person'] = form['bath_person']
+    request.session['guest_counts_json'] = form['guest_counts_json']
+
+
+def collect_sidewind_job(request):
+    """
+    バックグラウンドで実行したジョブが終わっていれば結果をセッションに取り込む（home 画面の表示前に呼ぶ）。
+
+    Returns
+    -------
+    bool
+        取り込んだ場合 True
+    """
+    pending = request.session.get('sidewind_job')
+    if not pending:
+        return False
+    job = get_default_registry().get(pending['job_id'])
+    if job is None or job.status == FAILED:
+        # 期限切れ・失敗したジョブは破棄（画面側でエラーを表示済み）
+        del request.session['sidewind_job']
+        return False
+    if job.status != DONE:
+        return False
+    del request.session['sidewind_job']
+    _store_result(request, pending['form'], job.allocation, job.stats)
+    return True
+
+
+def sidewind_job_status(request, job_id):
+    """
+    ジョブの進捗（試行数・暫定の最良スコア）と、終了後は最終の割り当てを JSON で返す。
+    このプロセスが知らないジョブ（別プロセスで開始・期限切れ）は status='unknown' の 404 を返し、
+    画面は通常の送信（同期実行）でやり直す
+    """
+    job = get_default_registry().get(job_id)
+    if job is None:
+        return JsonResponse({'job_id': job_id, 'status': 'unknown'}, status=404)
+    return JsonResponse(job.as_dict())
+
+
+def sidewind_job_stream(request, job_id):
+    """
+    ジョブの経過を Server-Sent Events で送る。
+    最良解が更新されるたびに allocation イベント、進捗は progress、終了時に done / failed を送って閉じる
+    """
+    job = get_default_registry().get(job_id)
+    if job is None:
+        return JsonResponse({'job_id': job_id, 'status': 'unknown'}, status=404)
+
+    def events():
+        for event in job.stream(keepalive=getattr(settings, 'SIDEWIND_STREAM_KEEPALIVE', 15)):
+            if event is None:
+                yield ': keepalive\n\n'
+                continue
+            name, data = event
+            yield f'event: {name}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def sidewind_job_accept(request, job_id):
+    """「採用」: 残りの試行を打ち切り、その時点の最良解でジョブを終わらせる"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST only'}, status=405)
+    job = get_default_registry().cancel(job_id)
+    if job is None:
+        return JsonResponse({'job_id': job_id, 'status': 'unknown'}, status=404)
+    logger.info(f'sidewind job {job_id} accepted after {job.progress.get("attempts", 0)} attempts')
+    return JsonResponse({'job_id': job_id, 'status': job.status})
+
+
 def sidewind_front(request):
     if request.method == 'POST': 
-        #POSTデータ受け取り
-        name = request.POST.get('editor_name')
-        date = request.POST.get('date')
-        single_time = int(request.POST.get('single_time'))
-        twin_time = int(request.POST.get('twin_time'))
-        bath_time = int(request.POST.get('bath_time'))
-        
-        #quota関連処理
-        post_quota = []
-        for i in range(1, 21):
-            room_num = request.POST.get(f'room_num_{i}')
-            house_person = request.POST.get(f'house_person_{i}')
-            twin_room = request.POST.get(f'twin_room_{i}')
-            public_bath = request.POST.get(f'public_bath_{i}')
-            if public_bath == 'on':
-                public_bath = True
-            else:
-                public_bath = False
-                
-            if any(x != None for x in (room_num, house_person)):
-                if len(room_num) != 0 and len(house_person) != 0:
-                    post_quota.append([room_num, house_person, twin_room if twin_room and len(twin_room) > 0 else '-1', public_bath])
-        housekeepers = []
-        id = 1
-        for i in post_quota:
-            for j in range(int(i[1])):
-                housekeepers.append({'id':id, 'room_quota':int(i[0]), 'twin_quota':int(i[2]), 'has_bath':i[3]})
-                id += 1
-        
-        #部屋処理
-        eco_rooms = [int(x) for x in request.POST.getlist('eco_room') if x != '']
-        eco_out_rooms = [int(x) for x in request.POST.getlist('amenity') if x != '']
-        soto_ame_rooms = [int(x) for x in request.POST.getlist('soto_ame') if x != '']
-        duvet_rooms = [int(x) for x in request.POST.getlist('duvet') if x != '']
-        # アルゴリズム用：エコ外と外アメを結合
-        all_eco_out_rooms = eco_out_rooms + soto_ame_rooms
-
-        #連泊入力の受け取り
-        try:
-            multiple_rooms = multiple_night(request)
-        except Exception as e:
-            multiple_rooms = []
-
-        #連泊清掃入力の受け取り
-        try:
-            multiple_night_cleans_list = multiple_night_cleans(request)
-        except Exception as e:
-            multiple_night_cleans_list = []
-
-        #カバー情報の受け取り（ルームチェンジ、アウトイン、要清掃、その他備考）
-        try:
-            room_changes, outins, must_cleans, others, _ = get_cover(request)
-        except Exception as e:
-            room_changes = []
-            outins = []
-            must_cleans = []
-            others = ''
-
-        #その他の情報を取得
-        try:
-            _, _, _, _, _, bath_person, remarks, house_data, _, _, _, _, _, _, contacts, spots, _ = catch_post(request)
-        except Exception as e:
-            bath_person = []
-            remarks = []
-            house_data = []
-            contacts = []
-            spots = []
-
-        room_info_data, times_by_time_data, master_key_data = read_csv()
-        twin_rooms = [int(x[0]) for x in room_info_data if x[1] == 'T']
-        room_inputs = {}  # { room_number: value }
-        for key, value in request.POST.items():
-            if key.startswith("room_"):
-                room_number = key.replace("room_", "")
-                if len(room_number) < 5:
-                    room_inputs[room_number] = value.strip()
-        full_clean_rooms = []
-        for room, status in room_inputs.items():
-            if status != '0' and room not in all_eco_out_rooms and room not in eco_rooms :
-                full_clean_rooms.append(int(room))
-        full_clean_rooms = sorted(full_clean_rooms,key=int)
-
-        eco_time = int(times_by_time_data[3][1])
-        all_rooms = [int(x[0]) for x in room_info_data]
-
-        no_clean_rooms = [int(r) for r in all_rooms if r not in full_clean_rooms + eco_rooms + all_eco_out_rooms]
-        rooms = {r: None for r in full_clean_rooms if r not in eco_rooms + all_eco_out_rooms}
+        form = _parse_post(request)
+        rooms = {r: None for r in form['rooms']}
+        eco_rooms = form['eco_rooms']
+        all_eco_out_rooms = form['all_eco_out_rooms']
+        twin_rooms = form['twin_rooms']
+        housekeepers = form['housekeepers']
 
         #清掃部屋数とquotaの整合性確認
         verify_quota_match(rooms, eco_rooms, all_eco_out_rooms, housekeepers, twin_rooms)
@@ -158,125 +459,39 @@ def sidewind_front(request):
         #実行
         # bath_roomsは現時点では空リストとして扱う（将来的には大浴場の部屋番号を指定可能）
         bath_rooms = []
-        print(rooms, eco_rooms, all_eco_out_rooms, twin_rooms, bath_rooms, housekeepers, single_time, twin_time, eco_time, bath_time)
-
-        allocation = assign_rooms(rooms, eco_rooms, all_eco_out_rooms, twin_rooms, bath_rooms, housekeepers, single_time, twin_time, eco_time, bath_time)
-
-        
-        all_allocation = allocation
-
-        # ============================================================
-        #  出力
-        # ============================================================
-        print(f"\n全室数: {len(all_rooms)}室")
-        print(f"清掃不要部屋: {len(no_clean_rooms)}室")
-        print(f"通常清掃部屋: {len(rooms)}室")
-        print(f"エコ部屋: {len(eco_rooms)}室 / エコ外: {len(eco_out_rooms)}室 / 外アメ: {len(soto_ame_rooms)}室")
-
-        #print("\n=== 自動割り当て結果（全室・上位表示） ===")
-        for r in sorted(all_allocation.keys()):
-            tag = ""
-            if r in eco_rooms:
-                tag = "（エコ）"
-            elif r in eco_out_rooms:
-                tag = "（エコ外）"
-            elif r in soto_ame_rooms:
-                tag = "（外アメ）"
-            elif r in twin_rooms:
-                tag = "（ツイン）"
-            #print(f"部屋 {r:4} → ハウス {all_allocation[r]} {tag}")
-
-        # ---------- ハウス別集計 ----------
-        print("\n=== ハウス別担当数 ===")
-        eco_set = set(eco_rooms + all_eco_out_rooms)
-        normal_set = set(rooms.keys())  # 通常部屋のみ
-
-        normal_count = {}
-        eco_count = {}
-        total_count = {}
-
-        for h in housekeepers:
-            hid = h["id"]
-
-            # ←ここを修正：「通常部屋集合」のみ対象にする
-            normal = sum(1 for r in normal_set if all_allocation.get(r) == hid)
-
-            # eco部屋は別集合でカウント
-            eco = sum(1 for r in eco_set if all_allocation.get(r) == hid)
-
-            total = normal + eco
-            normal_count[hid] = normal
-            eco_count[hid] = eco
-            total_count[hid] = total
-
-            print(f"ハウス{hid:2}: 通常={normal:2d} / エコ={eco:2d} / 合計={total:2d} ")
-
-        print(f"\n合計: 通常={sum(normal_count.values())} / エコ={sum(eco_count.values())} / 全体={sum(total_count.values())}")
-
-        # ---------- ツイン数分布 ----------
-        print("\n=== ハウス別ツイン数 ===")
-        for h in housekeepers:
-            hid = h["id"]
-            twins = sum(1 for r in twin_rooms if all_allocation.get(r) == hid)
-            print(f"ハウス{hid:2}: ツイン={twins}")
-
-        # ---------- ハウス別担当階 ----------
-        print("\n=== ハウス別担当階 ===")
-        floors_by_house = defaultdict(set)
-        for r, hid in all_allocation.items():
-            floors_by_house[hid].add(r // 100)
-
-        for h in housekeepers:
-            hid = h["id"]
-            floors = sorted(floors_by_house[hid])
-            floor_str = ", ".join(f"{f}F" for f in floors) if floors else "なし"
-            print(f"ハウス{hid:2}: {floor_str}")
-            
-        # ---------- 接続用 ----------
-        sorted_allocation = OrderedDict()
-
-        # 全部屋番号を昇順にソートしてループ
-        for r in sorted(all_rooms):
-            if r in all_allocation:
-                sorted_allocation[r] = all_allocation[r]
-            else:
-                # 元の入力値を確認：'0'が入力されていた場合は'0'、それ以外は空文字列
-                sorted_allocation[r] = room_inputs.get(str(r), '')
-
-        # 出力（人間可読 / JSON両対応）
-        #print("\n=== 接続用データ配列（全室・未割当=0） ===")
-        #print(sorted_allocation)
-        
-        print('eco_rooms:', eco_rooms)
-        print('eco_out_rooms:', eco_out_rooms)
-        print('soto_ame_rooms:', soto_ame_rooms)
-        print('allocation:', sorted_allocation)
-        
-        #セッション
-        request.session['sidewind_flag'] = True
-        request.session['allocation'] = sorted_allocation
-        request.session['editor_name'] = name
-        request.session['date'] = date
-        request.session['single_time'] = single_time
-        request.session['twin_time'] = twin_time
-        request.session['bath_time'] = bath_time
-        request.session['eco_rooms'] = eco_rooms
-        request.session['ame'] = eco_out_rooms
-        request.session['soto_ame'] = soto_ame_rooms
-        request.session['duvet'] = duvet_rooms
-        request.session['multiple_rooms'] = multiple_rooms
-        request.session['multiple_night_cleans'] = multiple_night_cleans_list
-        request.session['room_changes'] = room_changes
-        request.session['outins'] = outins
-        request.session['must_cleans'] = must_cleans
-        request.session['others'] = others
-        request.session['remarks'] = remarks
-        request.session['contacts'] = contacts
-        request.session['spots'] = spots
-        bath_staff = [h['id'] for h in housekeepers if h['has_bath']]
-        request.session['bath_staff'] = bath_staff
-        request.session['bath_person'] = bath_person
-        request.session['guest_counts_json'] = request.POST.get('guest_counts_json', '{}')
-                
+        print(rooms, eco_rooms, all_eco_out_rooms, twin_rooms, bath_rooms, housekeepers, form['single_time'], form['twin_time'], form['eco_time'], form['bath_time'])
+
+        allocation = None
+        if request.POST.get('keep_previous') == 'on':
+            # 前回の割り当てを維持して差分だけ再配置
+            allocation, search_stats = reassign_from_session(
+                request, rooms, eco_rooms, all_eco_out_rooms, twin_rooms, housekeepers)
+        if allocation is None and _is_async(request):
+            # バックグラウンドで探索し、画面は status_url をポーリングして終了後に home へ移動する
+            job, created = submit_allocation(
+                rooms, eco_rooms, all_eco_out_rooms, twin_rooms, bath_rooms, housekeepers,
+                form['single_time'], form['twin_time'], form['eco_time'], form['bath_time'],
+                **_search_options()
+            )
+            logger.info(f'sidewind job {job.id} {"queued" if created else "attached"}')
+            request.session['sidewind_job'] = {'job_id': job.id, 'form': form}
+            return JsonResponse({
+                'job_id': job.id,
+                'status': job.status,
+                'status_url': reverse('sidewind_job_status', args=[job.id]),
+                'stream_url': reverse('sidewind_job_stream', args=[job.id]),
+                'accept_url': reverse('sidewind_job_accept', args=[job.id]),
+                'home_url': reverse('home'),
+            })
+        if allocation is None:
+            allocation, search_stats = assign_rooms_cached(
+                rooms, eco_rooms, all_eco_out_rooms, twin_rooms, bath_rooms, housekeepers,
+                form['single_time'], form['twin_time'], form['eco_time'], form['bath_time'],
+                **_search_options()
+            )
+        _store_result(request, form, allocation, search_stats)
+        if _is_async(request):
+            # 差分の再配置はその場で終わるため、完了として返す
+            return JsonResponse({'status': DONE, 'home_url': reverse('home')})
         return redirect(reverse('home'))
-    return redirect(reverse('sidewind'))
\ No newline at end of file
+    return redirect(reverse('sidewind'))
@@ -137,6 +137,42 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Application version
 APP_VERSION = '1.5.5_mitsukaido'
 
+# Sidewind (autopilot) worker processes (1 = run in the request process; a pool is started per search)
+SIDEWIND_WORKERS = 1
+# Sidewind search time limit in seconds (None = always run every attempt)
+SIDEWIND_TIME_LIMIT = 10
+# Local search iterations applied to the best Sidewind attempt (0 = disabled)
+SIDEWIND_LOCAL_SEARCH_ITERATIONS = 20000
+# Sidewind engine: 'heuristic' or 'exact' (requires ortools, falls back to heuristic)
+SIDEWIND_ENGINE = 'heuristic'
+SIDEWIND_EXACT_TIME_LIMIT = 10
+# Sidewind result cache (in-memory LRU entries / on-disk tier, None = memory only)
+SIDEWIND_CACHE_SIZE = 32
+SIDEWIND_CACHE_DIR = MEDIA_ROOT / "sidewind_cache"
+# Sidewind per-phase timing (logged as one 'sidewind_profile' line via the django logger; bypasses the cache)
+SIDEWIND_PROFILE = False
+# Run Sidewind as a background job polled by the page (worker threads / seconds a finished job is kept).
+# Jobs live in the memory of the process that started them, so only enable this with a single server
+# process; if a status request reaches a process that does not know the job, the page reruns synchronously.
+SIDEWIND_ASYNC = False
+SIDEWIND_JOB_WORKERS = 1
+SIDEWIND_JOB_TTL = 600
+# Seconds between keep-alive comments on the Sidewind progress stream (server-sent events)
+SIDEWIND_STREAM_KEEPALIVE = 15
+
+# Translation memory for English sheets (in-memory LRU entries / SQLite file, None = memory only)
+TRANSLATION_MEMORY_SIZE = 1024
+TRANSLATION_MEMORY_PATH = MEDIA_ROOT / "translation_memory.sqlite3"
+# Batched translation of one preview print run (overall deadline in seconds / concurrent requests)
+TRANSLATION_DEADLINE = 10
+TRANSLATION_WORKERS = 8
+# Translation connectivity circuit breaker (probe URL / seconds a good probe is reused /
+# first and maximum seconds to stop trying after a failure, doubled per consecutive failure)
+TRANSLATION_PROBE_URL = "https://translate.google.com/"
+TRANSLATION_HEALTH_TTL = 60
+TRANSLATION_BACKOFF = 5
+TRANSLATION_MAX_BACKOFF = 300
+
 #email settings
 if os.path.exists(os.path.join('static/email.json')):
     with open(os.path.join('static/email.json')) as email_file:
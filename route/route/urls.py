@@ -44,6 +44,9 @@ urlpatterns = [
     path('administrator/', admin_view.administratorView.as_view(), name='administrator'),
     path('administrator/get-csv/', admin_view.get_csv_view, name='get_csv'),
     path('sidewind_front/', sidewind_front.sidewind_front, name='sidewind_front'),
+    path('sidewind_front/jobs/<str:job_id>/', sidewind_front.sidewind_job_status, name='sidewind_job_status'),
+    path('sidewind_front/jobs/<str:job_id>/stream/', sidewind_front.sidewind_job_stream, name='sidewind_job_stream'),
+    path('sidewind_front/jobs/<str:job_id>/accept/', sidewind_front.sidewind_job_accept, name='sidewind_job_accept'),
     path('rooming_list/', rooming_list_view.roomingListView.as_view(), name='rooming_list'),
 ]
 
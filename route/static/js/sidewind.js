@@ -1487,8 +1487,135 @@ document.addEventListener('DOMContentLoaded', function () {
                 return false;
             }
         }
+
+        // Sidewindはバックグラウンドジョブとして実行し、進捗をポーリングする
+        if (!event.defaultPrevented && window.sidewind_async && event.submitter
+            && event.submitter.classList.contains('sidewind_entire_btn')) {
+            event.preventDefault();
+            runSidewindJob(form, event.submitter);
+        }
     });
 
+    function runSidewindJob(form, button) {
+        const progress = document.getElementById('sidewind_progress');
+        const acceptButton = document.getElementById('sidewind_accept');
+        const csrfToken = form.querySelector('[name=csrfmiddlewaretoken]').value;
+        button.disabled = true;  // 二重送信防止
+        progress.textContent = '探索を開始しています…';
+
+        function showProgress(job) {
+            const p = job.progress || {};
+            if (p.attempts !== undefined) {
+                progress.textContent = `探索中… ${p.attempts}/${p.max_attempts}回 最良スコア ${p.best_score}`;
+            } else {
+                progress.textContent = '探索待ち…';
+            }
+        }
+
+        // 暫定の割り当てを部屋欄のプレースホルダーに表示（入力値は変えない）
+        function showAllocation(allocation) {
+            Object.entries(allocation).forEach(([room, hk]) => {
+                const input = document.getElementById(`room_${room}`);
+                if (input) {
+                    input.placeholder = hk;
+                }
+            });
+        }
+
+        function clearAllocation() {
+            $('.input_room').attr('placeholder', '');
+        }
+
+        function fail(message) {
+            button.disabled = false;
+            acceptButton.hidden = true;
+            progress.textContent = '';
+            clearAllocation();
+            alert(message);
+        }
+
+        // ジョブを知らないサーバープロセスに当たった場合（複数プロセス構成・期限切れ）は通常の送信でやり直す
+        function runSynchronously() {
+            acceptButton.hidden = true;
+            progress.textContent = '探索中…';
+            form.action = button.formAction;
+            form.submit();  // submit イベントを起こさない（確認ダイアログ・非同期送信を繰り返さない）
+        }
+
+        function poll(statusUrl, homeUrl) {
+            fetch(statusUrl, { headers: { 'X-Requested-With': 'XMLHttpRequest' } })
+                .then(response => response.json())
+                .then(job => {
+                    if (job.status === 'done') {
+                        window.location.href = homeUrl;
+                        return;
+                    }
+                    if (job.status === 'unknown') {
+                        runSynchronously();
+                        return;
+                    }
+                    if (job.status === 'failed') {
+                        fail('自動割り当てに失敗しました' + (job.error ? '\n' + job.error : ''));
+                        return;
+                    }
+                    showProgress(job);
+                    setTimeout(() => poll(statusUrl, homeUrl), 1000);
+                })
+                .catch(() => fail('進捗の取得に失敗しました'));
+        }
+
+        // 最良解が更新されるたびに受け取る（EventSource が無いブラウザはポーリング）
+        function stream(job) {
+            if (!window.EventSource) {
+                poll(job.status_url, job.home_url);
+                return;
+            }
+            const source = new EventSource(job.stream_url);
+            source.addEventListener('allocation', e => showAllocation(JSON.parse(e.data).allocation));
+            source.addEventListener('progress', e => showProgress(JSON.parse(e.data)));
+            source.addEventListener('done', () => {
+                source.close();
+                window.location.href = job.home_url;
+            });
+            source.addEventListener('failed', e => {
+                source.close();
+                const data = JSON.parse(e.data);
+                fail('自動割り当てに失敗しました' + (data.error ? '\n' + data.error : ''));
+            });
+            source.onerror = () => {
+                // 接続が切れた場合はポーリングに切り替える
+                source.close();
+                poll(job.status_url, job.home_url);
+            };
+        }
+
+        fetch(button.formAction, {
+            method: 'POST',
+            body: new FormData(form),
+            headers: { 'X-Requested-With': 'XMLHttpRequest' },
+        })
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error(response.status);
+                }
+                return response.json();
+            })
+            .then(job => {
+                if (job.status === 'done' && !job.status_url) {
+                    window.location.href = job.home_url;
+                    return;
+                }
+                // 「この案で確定」: 残りの試行を打ち切り、表示中の最良解で確定する
+                acceptButton.hidden = false;
+                acceptButton.onclick = () => {
+                    acceptButton.disabled = true;
+                    fetch(job.accept_url, { method: 'POST', headers: { 'X-CSRFToken': csrfToken } });
+                };
+                stream(job);
+            })
+            .catch(() => fail('自動割り当てを開始できませんでした（入力内容を確認してください）'));
+    }
+
     //表移動
     function setupNavigation(inputClass, tdClass) {
         $(document).on("keydown", inputClass, function (e) {